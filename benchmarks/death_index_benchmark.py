@@ -0,0 +1,116 @@
+import time
+from collections.abc import Callable
+from datetime import datetime
+
+import numpy as np
+from polars import DataFrame, Expr, Int64, Utf8, col, when
+
+from common.person_period_template_generator.cpzp_person_period_template_generator import (
+    CpzpBaseColumn,
+    CpzpPersonPeriodTemplateGenerator,
+)
+from common.person_period_template_generator.ozp_person_period_template_generator import (
+    OzpBaseColumn,
+    OzpPersonPeriodTemplateGenerator,
+)
+from common.typings import MAX_TIME_PERIOD_VALUE
+
+# Compares the native death index expressions with the former per-row map_elements implementation
+FROM_DATE = datetime(2020, 1, 1)
+TO_DATE = datetime(2022, 12, 30)
+NUM_OF_ROWS = 3_000_000
+SEED = 42
+
+
+def legacy_compute_death_index(time_periods: list[str]) -> Callable[[str], int]:
+    time_period_indices = {time_period: i for i, time_period in enumerate(time_periods)}
+    min_year = int(time_periods[0][:4])
+    max_year = int(time_periods[-1][:4])
+
+    def compute_death_index(death_period: str) -> int:
+        if not death_period or death_period.strip() in {"", " "}:
+            return MAX_TIME_PERIOD_VALUE
+
+        current_year = int(death_period[:4])
+
+        if current_year < min_year:
+            return -1
+
+        if current_year > max_year:
+            return MAX_TIME_PERIOD_VALUE
+
+        return time_period_indices.get(death_period, -1)
+
+    return compute_death_index
+
+
+def create_cpzp_df(rng: np.random.Generator) -> DataFrame:
+    years = rng.integers(2018, 2025, NUM_OF_ROWS)
+    weeks = rng.integers(1, 54, NUM_OF_ROWS)
+    is_alive = rng.random(NUM_OF_ROWS) < 0.9
+    death_weeks = ["" if alive else f"{year}W{week:02d}" for alive, year, week in zip(is_alive, years, weeks, strict=True)]
+
+    return DataFrame({CpzpBaseColumn.DEATHDATE: death_weeks}, schema={CpzpBaseColumn.DEATHDATE: Utf8})
+
+
+def create_ozp_df(rng: np.random.Generator) -> DataFrame:
+    is_alive = rng.random(NUM_OF_ROWS) < 0.9
+
+    return DataFrame(
+        {
+            OzpBaseColumn.DEATH_YEAR: rng.integers(2018, 2025, NUM_OF_ROWS),
+            OzpBaseColumn.DEATH_MONTH: rng.integers(1, 13, NUM_OF_ROWS),
+            "is_alive": is_alive,
+        }
+    ).select(
+        when(~col("is_alive")).then(col(c)).cast(Int64).alias(c) for c in [OzpBaseColumn.DEATH_YEAR, OzpBaseColumn.DEATH_MONTH]
+    )
+
+
+def benchmark(name: str, df: DataFrame, legacy_expr: Expr, native_expr: Expr) -> None:
+    start_time = time.perf_counter()
+    legacy_result = df.select(legacy_expr).to_series()
+    legacy_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    native_result = df.select(native_expr).to_series()
+    native_time = time.perf_counter() - start_time
+
+    assert legacy_result.equals(native_result), f"{name} native death index differs from the legacy implementation"
+
+    print(
+        f"{name}: {df.height:,} rows, map_elements {legacy_time:.3f}s, native {native_time:.3f}s, "
+        f"speedup {legacy_time / native_time:.1f}x"
+    )
+
+
+def main() -> None:
+    rng = np.random.default_rng(SEED)
+
+    cpzp_generator = CpzpPersonPeriodTemplateGenerator(FROM_DATE, TO_DATE)
+    benchmark(
+        "CPZP",
+        create_cpzp_df(rng),
+        col(CpzpBaseColumn.DEATHDATE).map_elements(legacy_compute_death_index(cpzp_generator.weeks), return_dtype=Int64),
+        cpzp_generator.get_death_index_expr(),
+    )
+
+    ozp_generator = OzpPersonPeriodTemplateGenerator(FROM_DATE, TO_DATE)
+    benchmark(
+        "OZP",
+        create_ozp_df(rng),
+        when(col(OzpBaseColumn.DEATH_YEAR).is_null() | col(OzpBaseColumn.DEATH_MONTH).is_null())
+        .then(MAX_TIME_PERIOD_VALUE)
+        .otherwise(
+            (
+                col(OzpBaseColumn.DEATH_YEAR).cast(Utf8)
+                + col(OzpBaseColumn.DEATH_MONTH).map_elements(lambda x: f"M{str(x).zfill(2)}", return_dtype=Utf8)
+            ).map_elements(legacy_compute_death_index(ozp_generator.months), return_dtype=Int64)
+        )
+        .cast(Int64),
+        ozp_generator.get_death_index_expr(),
+    )
+
+
+if __name__ == "__main__":
+    main()
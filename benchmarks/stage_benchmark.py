@@ -0,0 +1,225 @@
+import json
+import platform
+import subprocess
+from argparse import ArgumentParser
+from collections.abc import Callable, Generator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from multiprocessing import get_context
+from tempfile import TemporaryDirectory
+
+import polars
+import psutil
+from polars import DataFrame, Schema
+
+from benchmarks.synthetic_data import FROM_DATE, TO_DATE, create_cpzp_base_df, create_ozp_base_df
+from common.acm_calculator.acm_calculator import ACMCalculator
+from common.file_storage.dataframe_storage import ArrowPolarsDataframeStorage
+from common.file_storage.file_storage import LocalFileStorage
+from common.person_period_processor.person_period_template_processor import PersonPeriodTemplateProcessor
+from common.person_period_template_generator.cpzp_person_period_template_generator import (
+    CpzpPersonPeriodTemplateGenerator,
+    CpzpUsedDfSchema,
+)
+from common.person_period_template_generator.ozp_person_period_template_generator import (
+    OzpPersonPeriodTemplateGenerator,
+    OzpUsedDfSchema,
+)
+from common.person_period_template_generator.person_period_template_generator import PersonPeriodTemplateGenerator
+from common.raw_data_loader.cached_csv_loader import CachedCsvLoader
+from common.time_tracker import SpanRecorder, TimeTracker
+
+# Times each pipeline stage (CSV ingestion, template generation, processing, storage write/read and ACM) on synthetic
+# CPZP/OZP data and records its peak RSS (sampled by TimeTracker). Every dataset size runs in a fresh process, so the peaks
+# of one size do not carry over to the next and a size that runs out of memory is reported as failed instead of ending
+# the whole run.
+# The JSON report can be compared with the report of another commit:
+#
+#   python -m benchmarks.stage_benchmark --sizes 100000 1000000 --output out/benchmarks/new.json --baseline out/benchmarks/old.json
+NUM_OF_PERSONS = [100_000, 1_000_000, 10_000_000]
+SEED = 42
+REPORT_FILE = "./out/benchmarks/stage_benchmark.json"
+BYTES_IN_MB = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class BenchmarkDataset:
+    name: str
+    create_base_df: Callable[[int, int], DataFrame]
+    used_schema: Schema
+    generator: PersonPeriodTemplateGenerator
+    is_using_months: bool
+
+
+DATASETS = {
+    "CPZP": BenchmarkDataset(
+        "CPZP", create_cpzp_base_df, CpzpUsedDfSchema, CpzpPersonPeriodTemplateGenerator(FROM_DATE, TO_DATE), False
+    ),
+    "OZP": BenchmarkDataset(
+        "OZP", create_ozp_base_df, OzpUsedDfSchema, OzpPersonPeriodTemplateGenerator(FROM_DATE, TO_DATE), True
+    ),
+}
+
+
+@dataclass(frozen=True)
+class StageResult:
+    stage: str
+    seconds: float
+    peak_rss_mb: float
+    rss_increase_mb: float  # peak RSS during the stage minus the RSS before it
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    dataset: str
+    num_of_persons: int
+    stages: list[StageResult]
+    num_of_template_rows: int | None = None
+    num_of_processed_rows: int | None = None
+    error: str | None = None
+
+
+# Each finished stage is appended to a JSON lines file right away, so the stages measured before the process ran out of
+# memory are still reported
+@contextmanager
+def measure_stage(stage_results_path: str, stage: str) -> Generator[None]:
+    with SpanRecorder() as span_recorder, TimeTracker(stage):
+        yield
+
+    span = span_recorder.spans[-1]
+    stage_result = StageResult(
+        stage, round(span.duration_seconds, 4), round(span.peak_rss_mb, 1), round(span.peak_rss_mb - span.start_rss_mb, 1)
+    )
+
+    with open(stage_results_path, "a", encoding="utf-8") as stage_results_file:
+        stage_results_file.write(json.dumps(asdict(stage_result)) + "\n")
+
+
+def read_stage_results(stage_results_path: str) -> list[StageResult]:
+    with open(stage_results_path, encoding="utf-8") as stage_results_file:
+        return [StageResult(**json.loads(line)) for line in stage_results_file]
+
+
+# Returns the number of template and processed rows
+def run_benchmark(dataset_name: str, num_of_persons: int, stage_results_path: str) -> tuple[int, int]:
+    dataset = DATASETS[dataset_name]
+
+    with TemporaryDirectory() as tmp_dir:
+        # Writing the synthetic CSV is only the setup, it is not measured
+        csv_path = f"{tmp_dir}/{dataset.name}.csv"
+        dataset.create_base_df(num_of_persons, SEED).write_csv(csv_path, separator=";")
+        file_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), f"{tmp_dir}/")
+
+        # The inputs of each stage are released right after it, so they do not inflate the RSS of the next stages
+        with measure_stage(stage_results_path, "ingestion"):
+            base_df = CachedCsvLoader(dataset.used_schema).scan(csv_path).collect()
+        with measure_stage(stage_results_path, "generate"):
+            template_df = dataset.generator.generate(base_df)
+        del base_df
+        with measure_stage(stage_results_path, "process"):
+            processed_df = PersonPeriodTemplateProcessor().process(template_df, dataset.is_using_months)
+        num_of_template_rows = template_df.height
+        del template_df
+        with measure_stage(stage_results_path, "write"):
+            file_storage.write(dataset.name, processed_df)
+        del processed_df
+        with measure_stage(stage_results_path, "read"):
+            processed_df = file_storage.read(dataset.name)
+        with measure_stage(stage_results_path, "acm"):
+            ACMCalculator().compute_all(processed_df, dataset.is_using_months)
+
+    return num_of_template_rows, processed_df.height
+
+
+def run_benchmark_in_new_process(dataset_name: str, num_of_persons: int) -> BenchmarkResult:
+    print(f"Benchmarking {dataset_name} with {num_of_persons:,} persons", flush=True)
+
+    with TemporaryDirectory() as tmp_dir, ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+        stage_results_path = f"{tmp_dir}/stage_results.jsonl"
+        LocalFileStorage().write(stage_results_path, b"")
+
+        try:
+            num_of_template_rows, num_of_processed_rows = executor.submit(
+                run_benchmark, dataset_name, num_of_persons, stage_results_path
+            ).result()
+        except BrokenProcessPool:
+            error = "The benchmark process died (most likely out of memory)"
+        except Exception as exception:  # one failing size should not discard the results of the others
+            error = repr(exception)
+        else:
+            return BenchmarkResult(
+                dataset_name, num_of_persons, read_stage_results(stage_results_path), num_of_template_rows, num_of_processed_rows
+            )
+
+        return BenchmarkResult(dataset_name, num_of_persons, read_stage_results(stage_results_path), error=error)
+
+
+def get_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def create_report(results: list[BenchmarkResult]) -> dict[str, object]:
+    return {
+        "commit": get_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python_version": platform.python_version(),
+        "polars_version": polars.__version__,
+        "cpu_count": psutil.cpu_count(),
+        "total_memory_mb": round(psutil.virtual_memory().total / BYTES_IN_MB),
+        "seed": SEED,
+        "results": [asdict(result) for result in results],
+    }
+
+
+# Prints the time and peak RSS of every stage relative to the same stage in the baseline report
+def compare_reports(report: dict[str, object], baseline_report: dict[str, object]) -> None:
+    baseline_stages = {
+        (result["dataset"], result["num_of_persons"], stage["stage"]): stage
+        for result in baseline_report["results"]
+        for stage in result["stages"]
+    }
+    print(f"Compared with {baseline_report['commit']}:")
+
+    for result in report["results"]:
+        for stage in result["stages"]:
+            baseline_stage = baseline_stages.get((result["dataset"], result["num_of_persons"], stage["stage"]))
+            if baseline_stage is None:
+                continue
+
+            print(
+                f"{result['dataset']} {result['num_of_persons']:,} {stage['stage']}: "
+                f"time {stage['seconds'] / max(baseline_stage['seconds'], 1e-9):.2f}x, "
+                f"peak RSS {stage['peak_rss_mb'] / max(baseline_stage['peak_rss_mb'], 1e-9):.2f}x"
+            )
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Times and measures the peak RSS of each pipeline stage on synthetic data")
+    parser.add_argument("--datasets", nargs="+", choices=list(DATASETS), default=list(DATASETS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=NUM_OF_PERSONS, help="numbers of persons")
+    parser.add_argument("--output", default=REPORT_FILE, help="path of the JSON report")
+    parser.add_argument("--baseline", help="JSON report (e.g. of a previous commit) to compare the results with")
+    args = parser.parse_args()
+
+    results = [
+        run_benchmark_in_new_process(dataset_name, num_of_persons)
+        for dataset_name in args.datasets
+        for num_of_persons in args.sizes
+    ]
+    report = create_report(results)
+    LocalFileStorage().write(args.output, json.dumps(report, indent=2).encode())
+    print(f"Report written to {args.output}")
+
+    if args.baseline is not None:
+        with open(args.baseline, encoding="utf-8") as baseline_file:
+            compare_reports(report, json.load(baseline_file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+from datetime import datetime
+
+import numpy as np
+from polars import DataFrame, Expr, Utf8, col, concat_str, lit, when
+
+from common.person_period_template_generator.cpzp_person_period_template_generator import CpzpBaseColumn, CpzpBaseDfSchema
+from common.person_period_template_generator.ozp_person_period_template_generator import OzpBaseColumn, OzpBaseDfSchema
+from common.time_period.time_period_helper import TimePeriodHelper
+
+# Deterministic synthetic deliveries matching the CPZP/OZP CSV schemas, so the pipeline can be measured without the
+# private CSVs. Persons are born 1920-2015, about 70% get a first dose in 2021-2022 (further doses follow with the usual
+# gaps and get rarer) and about 4% die within 2020-2022 (no doses after the death).
+FROM_DATE = datetime(2020, 1, 1)
+TO_DATE = datetime(2022, 12, 30)
+WEEKS = TimePeriodHelper.get_weeks_in_range(FROM_DATE, TO_DATE)
+NUM_OF_MONTHS = 3 * 12
+MIN_BIRTH_YEAR = 1920
+MAX_BIRTH_YEAR = 2015
+VACCINATION_START_WEEK_INDEX = WEEKS.index("2021W01")
+DOSE_PROBABILITIES = [0.7, 0.95, 0.7, 0.3, 0.1, 0.05, 0.02]  # probability of each dose given the previous one
+DOSE_GAP_WEEKS = [(3, 8), (20, 40), (15, 30), (10, 30), (10, 30), (10, 30)]  # (min, max) weeks after the previous dose
+DEATH_PROBABILITY = 0.04
+NUM_OF_VACCINE_CODES = 4
+
+
+def create_cpzp_base_df(num_of_persons: int, seed: int) -> DataFrame:
+    rng = np.random.default_rng(seed)
+    persons_df = create_persons_df(rng, num_of_persons)
+    vaccine_columns = [
+        (CpzpBaseColumn.VACCINE_1_DATE, CpzpBaseColumn.VACCINE_1_CODE),
+        (CpzpBaseColumn.VACCINE_2_DATE, CpzpBaseColumn.VACCINE_2_CODE),
+        (CpzpBaseColumn.VACCINE_3_DATE, CpzpBaseColumn.VACCINE_3_CODE),
+        (CpzpBaseColumn.VACCINE_4_DATE, CpzpBaseColumn.VACCINE_4_CODE),
+        (CpzpBaseColumn.VACCINE_5_DATE, CpzpBaseColumn.VACCINE_5_CODE),
+    ]
+
+    return persons_df.select(
+        concat_str(col("birth_year").cast(Utf8), lit("W"), col("birth_week").cast(Utf8).str.zfill(2)).alias(
+            CpzpBaseColumn.BIRTHDATE
+        ),
+        when(col("gender") == 0).then(lit("M")).otherwise(lit("Z")).alias(CpzpBaseColumn.GENDER),
+        *(
+            expr
+            for i, (date_column, code_column) in enumerate(vaccine_columns)
+            for expr in [
+                get_iso_week_expr(f"dose_{i + 1}_week_index").alias(date_column),
+                when(col(f"dose_{i + 1}_week_index").is_not_null())
+                .then(concat_str(lit("CO0"), col("vaccine_code").cast(Utf8)))
+                .otherwise(lit(""))
+                .alias(code_column),
+            ]
+        ),
+        get_iso_week_expr("death_week_index").alias(CpzpBaseColumn.DEATHDATE),
+    ).cast(dict(CpzpBaseDfSchema))
+
+
+def create_ozp_base_df(num_of_persons: int, seed: int) -> DataFrame:
+    rng = np.random.default_rng(seed)
+    persons_df = create_persons_df(rng, num_of_persons)
+    vaccine_columns = [
+        (OzpBaseColumn.VACCINE_1_CODE, OzpBaseColumn.VACCINE_1_YEAR, OzpBaseColumn.VACCINE_1_MONTH),
+        (OzpBaseColumn.VACCINE_2_CODE, OzpBaseColumn.VACCINE_2_YEAR, OzpBaseColumn.VACCINE_2_MONTH),
+        (OzpBaseColumn.VACCINE_3_CODE, OzpBaseColumn.VACCINE_3_YEAR, OzpBaseColumn.VACCINE_3_MONTH),
+        (OzpBaseColumn.VACCINE_4_CODE, OzpBaseColumn.VACCINE_4_YEAR, OzpBaseColumn.VACCINE_4_MONTH),
+        (OzpBaseColumn.VACCINE_5_CODE, OzpBaseColumn.VACCINE_5_YEAR, OzpBaseColumn.VACCINE_5_MONTH),
+        (OzpBaseColumn.VACCINE_6_CODE, OzpBaseColumn.VACCINE_6_YEAR, OzpBaseColumn.VACCINE_6_MONTH),
+        (OzpBaseColumn.VACCINE_7_CODE, OzpBaseColumn.VACCINE_7_YEAR, OzpBaseColumn.VACCINE_7_MONTH),
+    ]
+
+    return persons_df.select(
+        col("person_index").alias(OzpBaseColumn.ID_POJ),
+        col("gender").alias(OzpBaseColumn.GENDER),
+        col("birth_year").alias(OzpBaseColumn.BIRTH_YEAR),
+        col("birth_month").alias(OzpBaseColumn.BIRTH_MONTH),
+        *get_year_and_month_exprs("death_week_index", OzpBaseColumn.DEATH_YEAR, OzpBaseColumn.DEATH_MONTH),
+        *(
+            expr
+            for i, (code_column, year_column, month_column) in enumerate(vaccine_columns)
+            for expr in [
+                when(col(f"dose_{i + 1}_week_index").is_not_null()).then(col("vaccine_code")).alias(code_column),
+                *get_year_and_month_exprs(f"dose_{i + 1}_week_index", year_column, month_column),
+            ]
+        ),
+    ).cast(dict(OzpBaseDfSchema))
+
+
+# One row per person with the dataset independent attributes, missing doses and deaths are null week indices (into WEEKS)
+def create_persons_df(rng: np.random.Generator, num_of_persons: int) -> DataFrame:
+    death_week_indices = np.where(
+        rng.random(num_of_persons) < DEATH_PROBABILITY, rng.integers(0, len(WEEKS), num_of_persons), len(WEEKS)
+    )
+    dose_week_indices = [
+        np.where(
+            rng.random(num_of_persons) < DOSE_PROBABILITIES[0],
+            rng.integers(VACCINATION_START_WEEK_INDEX, len(WEEKS), num_of_persons),
+            len(WEEKS),
+        )
+    ]
+
+    # Each dose requires the previous one, a dose at or after the end of the range (or the death) is not given
+    for dose_probability, (min_gap, max_gap) in zip(DOSE_PROBABILITIES[1:], DOSE_GAP_WEEKS, strict=True):
+        week_indices = dose_week_indices[-1] + rng.integers(min_gap, max_gap + 1, num_of_persons)
+        dose_week_indices.append(np.where(rng.random(num_of_persons) < dose_probability, week_indices, len(WEEKS)))
+
+    dose_columns = {f"dose_{i + 1}_week_index": week_indices for i, week_indices in enumerate(dose_week_indices)}
+
+    return DataFrame(
+        {
+            "person_index": np.arange(num_of_persons),
+            "birth_year": rng.integers(MIN_BIRTH_YEAR, MAX_BIRTH_YEAR + 1, num_of_persons),
+            "birth_week": rng.integers(1, 53, num_of_persons),
+            "birth_month": rng.integers(1, 13, num_of_persons),
+            "gender": rng.integers(0, 2, num_of_persons),
+            "vaccine_code": rng.integers(1, NUM_OF_VACCINE_CODES + 1, num_of_persons),
+            "death_week_index": death_week_indices,
+            **dose_columns,
+        }
+    ).with_columns(
+        *(when(col(column) < col("death_week_index")).then(col(column)).alias(column) for column in dose_columns),
+        when(col("death_week_index") < len(WEEKS)).then(col("death_week_index")).alias("death_week_index"),
+    )
+
+
+def get_iso_week_expr(week_index_column: str) -> Expr:
+    return col(week_index_column).replace_strict(dict(enumerate(WEEKS)), default=None, return_dtype=Utf8).fill_null("")
+
+
+# Weeks are mapped to the month they fall into, so both datasets share the same distributions
+def get_year_and_month_exprs(week_index_column: str, year_column: str, month_column: str) -> list[Expr]:
+    month_index = col(week_index_column) * NUM_OF_MONTHS // len(WEEKS)
+
+    return [(FROM_DATE.year + month_index // 12).alias(year_column), (month_index % 12 + 1).alias(month_column)]
@@ -0,0 +1,47 @@
+from unittest import TestCase
+
+from polars import col
+
+from benchmarks.synthetic_data import FROM_DATE, TO_DATE, create_cpzp_base_df, create_ozp_base_df
+from common.person_period_template_generator.cpzp_person_period_template_generator import (
+    CpzpBaseDfSchema,
+    CpzpPersonPeriodTemplateGenerator,
+)
+from common.person_period_template_generator.ozp_person_period_template_generator import (
+    OzpBaseDfSchema,
+    OzpPersonPeriodTemplateGenerator,
+)
+from common.person_period_template_generator.person_period_template_generator import TempColumn
+from common.typings import MAX_TIME_PERIOD_VALUE
+
+NUM_OF_PERSONS = 10_000
+
+
+class TestSyntheticData(TestCase):
+    # - When creating synthetic deliveries
+    # -- It should match the base schemas and be the same for the same seed
+    def test_create_base_dfs_match_schema_and_are_deterministic(self) -> None:
+        for create_base_df, schema in [(create_cpzp_base_df, CpzpBaseDfSchema), (create_ozp_base_df, OzpBaseDfSchema)]:
+            with self.subTest(create_base_df=create_base_df.__name__):
+                base_df = create_base_df(NUM_OF_PERSONS, 1)
+
+                self.assertEqual(base_df.schema, schema)
+                self.assertEqual(base_df.height, NUM_OF_PERSONS)
+                self.assertTrue(base_df.equals(create_base_df(NUM_OF_PERSONS, 1)))
+                self.assertFalse(base_df.equals(create_base_df(NUM_OF_PERSONS, 2)))
+
+    # - Given synthetic deliveries
+    # -- When generating the persons from them
+    # --- It should contain vaccinated persons and deaths within the range, without doses after the death
+    def test_generated_persons_are_plausible(self) -> None:
+        for persons_df in [
+            CpzpPersonPeriodTemplateGenerator(FROM_DATE, TO_DATE).generate_persons(create_cpzp_base_df(NUM_OF_PERSONS, 1)),
+            OzpPersonPeriodTemplateGenerator(FROM_DATE, TO_DATE).generate_persons(create_ozp_base_df(NUM_OF_PERSONS, 1)),
+        ]:
+            num_of_vaccinated = persons_df.filter(col(TempColumn.DOSE_1).is_not_null()).height
+            num_of_deaths = persons_df.filter(col(TempColumn.DEATH_INDEX) != MAX_TIME_PERIOD_VALUE).height
+
+            self.assertAlmostEqual(num_of_vaccinated / NUM_OF_PERSONS, 0.7, delta=0.05)
+            self.assertAlmostEqual(num_of_deaths / NUM_OF_PERSONS, 0.04, delta=0.01)
+            self.assertEqual(persons_df.filter(col(TempColumn.DOSE_2) < col(TempColumn.DOSE_1)).height, 0)
+            self.assertEqual(persons_df.filter(col(TempColumn.DOSE_1) > col(TempColumn.DEATH_INDEX)).height, 0)
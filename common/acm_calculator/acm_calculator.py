@@ -1,8 +1,16 @@
 from dataclasses import dataclass
+from enum import StrEnum
 
-from polars import DataFrame, col
+from polars import DataFrame, Expr, Float64, Int64, col, lit, when
+from polars import len as polars_len
 
-from common.typings import AgeStatus, AliveStatus, NewColumn, VaccineStatus
+from common.typings import AgeStatus, AggregatedColumn, AliveStatus, NewColumn, VaccineStatus
+
+
+class ACMColumn(StrEnum):
+    ALIVE_PERSON_PERIODS = "alive_person_periods"
+    TOTAL_DEATHS = "total_deaths"
+    ACM = "acm"
 
 
 @dataclass(frozen=True)
@@ -19,22 +27,72 @@ class ACMCalculator:
         vac_status: VaccineStatus,
         is_using_months: bool,
     ) -> ACMResult:
-        alive_person_weeks = df.filter(
+        alive_person_weeks = self.__count_person_periods(
+            df,
             (col(NewColumn.DEATH_STATUS) == AliveStatus.ALIVE)
             & (col(NewColumn.AGE) == age_status)
-            & (col(NewColumn.VACCINE_STATUS) == vac_status)
-        ).shape[0]
+            & (col(NewColumn.VACCINE_STATUS) == vac_status),
+        )
 
-        total_deaths = df.filter(
+        total_deaths = self.__count_person_periods(
+            df,
             (col(NewColumn.DEATH_STATUS) == AliveStatus.DIED_NOW)
             & (col(NewColumn.AGE) == age_status)
-            & (col(NewColumn.VACCINE_STATUS) == vac_status)
-        ).shape[0]
+            & (col(NewColumn.VACCINE_STATUS) == vac_status),
+        )
 
         if alive_person_weeks == 0:
             return ACMResult(acm=0, total_deaths=total_deaths)
 
-        num_of_time_periods_in_year = 12 if is_using_months else 52
-        acm = (total_deaths / alive_person_weeks) * 100_000 * num_of_time_periods_in_year
+        acm = (total_deaths / alive_person_weeks) * 100_000 * self.__get_num_of_time_periods_in_year(is_using_months)
 
         return ACMResult(acm=acm, total_deaths=total_deaths)
+
+    def compute_all(self, df: DataFrame, is_using_months: bool) -> DataFrame:
+        # Single group_by pass over the (possibly huge) dataframe, the rest works on a few dozen rows
+        person_periods_df = df.group_by(NewColumn.AGE, NewColumn.VACCINE_STATUS, NewColumn.DEATH_STATUS).agg(
+            self.__get_person_periods_expr(df).cast(Int64).alias(AggregatedColumn.PERSON_PERIODS)
+        )
+
+        return (
+            person_periods_df.group_by(NewColumn.AGE, NewColumn.VACCINE_STATUS)
+            .agg(
+                self.__sum_person_periods_with_death_status(AliveStatus.ALIVE).alias(ACMColumn.ALIVE_PERSON_PERIODS),
+                self.__sum_person_periods_with_death_status(AliveStatus.DIED_NOW).alias(ACMColumn.TOTAL_DEATHS),
+            )
+            .with_columns(self.get_acm_expr(is_using_months))
+            .sort(NewColumn.AGE, NewColumn.VACCINE_STATUS)
+        )
+
+    # Deaths per 100,000 person-years from the ALIVE_PERSON_PERIODS and TOTAL_DEATHS columns
+    def get_acm_expr(self, is_using_months: bool) -> Expr:
+        return (
+            when(col(ACMColumn.ALIVE_PERSON_PERIODS) == 0)
+            .then(lit(0, Float64))
+            .otherwise(
+                col(ACMColumn.TOTAL_DEATHS)
+                / col(ACMColumn.ALIVE_PERSON_PERIODS)
+                * 100_000
+                * self.__get_num_of_time_periods_in_year(is_using_months)
+            )
+            .alias(ACMColumn.ACM)
+        )
+
+    def __count_person_periods(self, df: DataFrame, predicate: Expr) -> int:
+        # Aggregated (cube) dataframes carry the number of person-periods per row, row-level ones do not
+        if AggregatedColumn.PERSON_PERIODS in df.columns:
+            return int(df.filter(predicate)[AggregatedColumn.PERSON_PERIODS].sum())
+
+        return df.filter(predicate).shape[0]
+
+    def __get_person_periods_expr(self, df: DataFrame) -> Expr:
+        if AggregatedColumn.PERSON_PERIODS in df.columns:
+            return col(AggregatedColumn.PERSON_PERIODS).sum()
+
+        return polars_len()
+
+    def __sum_person_periods_with_death_status(self, death_status: AliveStatus) -> Expr:
+        return col(AggregatedColumn.PERSON_PERIODS).filter(col(NewColumn.DEATH_STATUS) == death_status).sum()
+
+    def __get_num_of_time_periods_in_year(self, is_using_months: bool) -> int:
+        return 12 if is_using_months else 52
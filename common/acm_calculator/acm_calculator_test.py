@@ -2,8 +2,8 @@ from unittest import TestCase
 
 from polars import DataFrame
 
-from common.acm_calculator.acm_calculator import ACMCalculator
-from common.typings import AgeStatus, AliveStatus, NewColumn, VaccineStatus
+from common.acm_calculator.acm_calculator import ACMCalculator, ACMColumn
+from common.typings import AgeStatus, AggregatedColumn, AliveStatus, NewColumn, VaccineStatus
 
 
 class TestACMCalculator(TestCase):
@@ -110,3 +110,100 @@ class TestACMCalculator(TestCase):
 
         self.assertEqual(result.acm, 0)
         self.assertEqual(result.total_deaths, 0)
+
+    # - Given an aggregated DataFrame with person-period counts
+    # -- When calling compute_person_years_acm method
+    # -- It should weight every row by its amount of person-periods
+    def test_compute_person_years_acm_should_sum_person_periods_of_aggregated_dataframe(self):
+        df = DataFrame(
+            {
+                NewColumn.DEATH_STATUS: [AliveStatus.ALIVE, AliveStatus.ALIVE, AliveStatus.DIED_NOW],
+                NewColumn.AGE: [AgeStatus.LESS_THAN_60, AgeStatus.LESS_THAN_60, AgeStatus.LESS_THAN_60],
+                NewColumn.VACCINE_STATUS: [VaccineStatus.UNVACCINATED] * 3,
+                AggregatedColumn.PERSON_PERIODS: [30, 20, 5],
+            }
+        )
+
+        result = self.acm_calculator.compute_person_years_acm(
+            df, AgeStatus.LESS_THAN_60, VaccineStatus.UNVACCINATED, is_using_months=False
+        )
+
+        expected_acm = (5 / 50) * 100_000 * 52  # (5 deaths, 50 alive person-periods, 52 time periods per year)
+        self.assertEqual(result.acm, expected_acm)
+        self.assertEqual(result.total_deaths, 5)
+
+    # - Given a DataFrame with multiple age groups and vaccine statuses
+    # -- When calling compute_all method
+    # -- It should return the same ACM and deaths as compute_person_years_acm for every stratum
+    def test_compute_all_should_match_compute_person_years_acm_for_every_stratum(self):
+        df = DataFrame(
+            {
+                NewColumn.DEATH_STATUS: [
+                    AliveStatus.ALIVE,
+                    AliveStatus.ALIVE,
+                    AliveStatus.DIED_NOW,
+                    AliveStatus.AFTER_DEATH,
+                    AliveStatus.ALIVE,
+                    AliveStatus.DIED_NOW,
+                    AliveStatus.DIED_NOW,
+                ],
+                NewColumn.AGE: [
+                    AgeStatus.BETWEEN_60_AND_69,
+                    AgeStatus.BETWEEN_60_AND_69,
+                    AgeStatus.BETWEEN_60_AND_69,
+                    AgeStatus.BETWEEN_60_AND_69,
+                    AgeStatus.GREATER_THAN_80,
+                    AgeStatus.GREATER_THAN_80,
+                    AgeStatus.GREATER_THAN_80,
+                ],
+                NewColumn.VACCINE_STATUS: [
+                    VaccineStatus.UNVACCINATED.value,
+                    VaccineStatus.UNVACCINATED.value,
+                    VaccineStatus.UNVACCINATED.value,
+                    VaccineStatus.UNVACCINATED.value,
+                    VaccineStatus.DOSE_4_OR_HIGHER.value,
+                    VaccineStatus.DOSE_4_OR_HIGHER.value,
+                    VaccineStatus.LESS_THAN_4_WEEKS_FROM_DOSE_1.value,
+                ],
+            }
+        )
+
+        result = self.acm_calculator.compute_all(df, is_using_months=True)
+
+        self.assertEqual(result.height, 3)
+        for row in result.iter_rows(named=True):
+            expected = self.acm_calculator.compute_person_years_acm(
+                df, row[NewColumn.AGE], row[NewColumn.VACCINE_STATUS], is_using_months=True
+            )
+            self.assertEqual(row[ACMColumn.ACM], expected.acm)
+            self.assertEqual(row[ACMColumn.TOTAL_DEATHS], expected.total_deaths)
+
+    # - Given an aggregated DataFrame with person-period counts
+    # -- When calling compute_all method
+    # -- It should sum the person-periods instead of counting rows
+    def test_compute_all_should_sum_person_periods_of_aggregated_dataframe(self):
+        df = DataFrame(
+            {
+                NewColumn.DEATH_STATUS: [AliveStatus.ALIVE, AliveStatus.ALIVE, AliveStatus.DIED_NOW],
+                NewColumn.AGE: [AgeStatus.LESS_THAN_60, AgeStatus.LESS_THAN_60, AgeStatus.LESS_THAN_60],
+                NewColumn.VACCINE_STATUS: [VaccineStatus.UNVACCINATED.value] * 3,
+                AggregatedColumn.PERSON_PERIODS: [30, 20, 5],
+            }
+        )
+
+        result = self.acm_calculator.compute_all(df, is_using_months=False)
+
+        self.assertEqual(result[ACMColumn.ALIVE_PERSON_PERIODS].to_list(), [50])
+        self.assertEqual(result[ACMColumn.TOTAL_DEATHS].to_list(), [5])
+        self.assertEqual(result[ACMColumn.ACM].to_list(), [(5 / 50) * 100_000 * 52])
+
+    # - Given an empty DataFrame
+    # -- When calling compute_all method
+    # -- It should return an empty table
+    def test_compute_all_should_handle_empty_dataframe(self):
+        df = DataFrame({NewColumn.DEATH_STATUS: [], NewColumn.AGE: [], NewColumn.VACCINE_STATUS: []})
+
+        result = self.acm_calculator.compute_all(df, is_using_months=False)
+
+        self.assertTrue(result.is_empty())
+        self.assertEqual(result.columns, [NewColumn.AGE, NewColumn.VACCINE_STATUS, *ACMColumn])
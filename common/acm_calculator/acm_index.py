@@ -0,0 +1,142 @@
+from collections.abc import Sequence
+from datetime import datetime
+from enum import StrEnum
+
+from polars import DataFrame, Int64, col
+
+from common.acm_calculator.acm_calculator import ACMCalculator, ACMColumn
+from common.person_period_template_generator.person_period_template_generator import PersonPeriodTemplateExpander, TempColumn
+from common.time_period.time_period_helper import TimePeriodHelper
+from common.typings import AggregatedColumn, AliveStatus, NewColumn
+
+
+class ACMIndexColumn(StrEnum):
+    CUMULATIVE_ALIVE_PERSON_PERIODS = "cumulative_alive_person_periods"
+    CUMULATIVE_DEATHS = "cumulative_deaths"
+
+
+class WindowColumn(StrEnum):
+    WINDOW = "window"
+    FROM_TIME_PERIOD_INDEX = "from_time_period_index"
+    TO_TIME_PERIOD_INDEX = "to_time_period_index"
+
+
+STRATUM_COLUMNS = [NewColumn.AGE, NewColumn.VACCINE_STATUS]
+PREVIOUS_SUFFIX = "_previous"
+
+
+# Alive person-periods and deaths of every stratum (age, vaccine status) summed up to and including each time period
+# index, built once from the person-time cube. The totals of any window [from, to] are then the sums up to `to` minus the
+# sums up to `from - 1`, so many windows are computed from a few rows per stratum instead of scanning the data per window.
+class ACMIndex:
+    def __init__(self, index_df: DataFrame) -> None:
+        self.__index_df = index_df
+        self.__acm_calculator = ACMCalculator()
+
+        time_periods_df = (
+            index_df.select(TempColumn.TIME_PERIOD, TempColumn.TIME_PERIOD_INDEX).unique().sort(TempColumn.TIME_PERIOD_INDEX)
+        )
+        self.__time_period_indices = dict(time_periods_df.iter_rows())
+        self.__is_using_months = all(time_periods_df[TempColumn.TIME_PERIOD].str.contains(r"^\d{4}M\d{2}$"))
+
+    @staticmethod
+    def from_cube(cube_df: DataFrame, time_periods: list[str]) -> "ACMIndex":
+        counts_df = (
+            cube_df.join(PersonPeriodTemplateExpander.get_time_periods_df(time_periods), on=TempColumn.TIME_PERIOD)
+            .group_by(*STRATUM_COLUMNS, TempColumn.TIME_PERIOD_INDEX)
+            .agg(
+                col(AggregatedColumn.PERSON_PERIODS)
+                .filter(col(NewColumn.DEATH_STATUS) == death_status)
+                .sum()
+                .cast(Int64)
+                .alias(cumulative_column)
+                for death_status, cumulative_column in [
+                    (AliveStatus.ALIVE, ACMIndexColumn.CUMULATIVE_ALIVE_PERSON_PERIODS),
+                    (AliveStatus.DIED_NOW, ACMIndexColumn.CUMULATIVE_DEATHS),
+                ]
+            )
+        )
+
+        # Every stratum gets a row for every time period, so the sums up to any index are a single row
+        index_df = (
+            counts_df.select(STRATUM_COLUMNS)
+            .unique()
+            .join(PersonPeriodTemplateExpander.get_time_periods_df(time_periods), how="cross")
+            .join(counts_df, on=[*STRATUM_COLUMNS, TempColumn.TIME_PERIOD_INDEX], how="left")
+            .fill_null(0)
+            .sort(*STRATUM_COLUMNS, TempColumn.TIME_PERIOD_INDEX)
+            .with_columns(col(column).cum_sum().over(STRATUM_COLUMNS) for column in ACMIndexColumn)
+        )
+
+        return ACMIndex(index_df)
+
+    @property
+    def index_df(self) -> DataFrame:
+        return self.__index_df
+
+    # Same result as ACMCalculator.compute_all of the cube within the date window
+    def compute(self, from_date: datetime, to_date: datetime) -> DataFrame:
+        return self.compute_windows([(from_date, to_date)]).drop(WindowColumn.WINDOW)
+
+    # The ACM of each stratum in each (from_date, to_date) window, the WINDOW column is the position of the window
+    def compute_windows(self, windows: Sequence[tuple[datetime, datetime]]) -> DataFrame:
+        windows_df = DataFrame(
+            [
+                (window, *self.__get_time_period_index_range(from_date, to_date))
+                for window, (from_date, to_date) in enumerate(windows)
+            ],
+            schema={
+                WindowColumn.WINDOW: Int64,
+                WindowColumn.FROM_TIME_PERIOD_INDEX: Int64,
+                WindowColumn.TO_TIME_PERIOD_INDEX: Int64,
+            },
+            orient="row",
+        )
+
+        return self.compute_time_period_index_windows(windows_df)
+
+    # Windows given by time period indices (inclusive), empty windows (to < from) have no rows
+    def compute_time_period_index_windows(self, windows_df: DataFrame) -> DataFrame:
+        sums_df = self.__index_df.select(*STRATUM_COLUMNS, TempColumn.TIME_PERIOD_INDEX, *ACMIndexColumn)
+        windows_df = windows_df.filter(col(WindowColumn.TO_TIME_PERIOD_INDEX) >= col(WindowColumn.FROM_TIME_PERIOD_INDEX))
+
+        sums_to_df = windows_df.join(sums_df, left_on=WindowColumn.TO_TIME_PERIOD_INDEX, right_on=TempColumn.TIME_PERIOD_INDEX)
+        # Nothing precedes the first time period, so its previous sums are missing and filled with 0
+        sums_before_df = windows_df.select(
+            WindowColumn.WINDOW, (col(WindowColumn.FROM_TIME_PERIOD_INDEX) - 1).alias(TempColumn.TIME_PERIOD_INDEX)
+        ).join(sums_df, on=TempColumn.TIME_PERIOD_INDEX)
+
+        return (
+            sums_to_df.join(sums_before_df, on=[WindowColumn.WINDOW, *STRATUM_COLUMNS], how="left", suffix=PREVIOUS_SUFFIX)
+            .select(
+                WindowColumn.WINDOW,
+                *STRATUM_COLUMNS,
+                (
+                    col(ACMIndexColumn.CUMULATIVE_ALIVE_PERSON_PERIODS)
+                    - col(f"{ACMIndexColumn.CUMULATIVE_ALIVE_PERSON_PERIODS}{PREVIOUS_SUFFIX}").fill_null(0)
+                ).alias(ACMColumn.ALIVE_PERSON_PERIODS),
+                (
+                    col(ACMIndexColumn.CUMULATIVE_DEATHS)
+                    - col(f"{ACMIndexColumn.CUMULATIVE_DEATHS}{PREVIOUS_SUFFIX}").fill_null(0)
+                ).alias(ACMColumn.TOTAL_DEATHS),
+            )
+            # Like in ACMCalculator.compute_all of a cube, strata without person-time in the window have no row
+            .filter((col(ACMColumn.ALIVE_PERSON_PERIODS) > 0) | (col(ACMColumn.TOTAL_DEATHS) > 0))
+            .with_columns(self.__acm_calculator.get_acm_expr(self.__is_using_months))
+            .sort(WindowColumn.WINDOW, *STRATUM_COLUMNS)
+        )
+
+    # The first and last index of the dataset's time periods within the window (an empty range when there are none)
+    def __get_time_period_index_range(self, from_date: datetime, to_date: datetime) -> tuple[int, int]:
+        window_time_periods = (
+            TimePeriodHelper.get_months_in_range(from_date, to_date)
+            if self.__is_using_months
+            else TimePeriodHelper.get_weeks_in_range(from_date, to_date)
+        )
+        indices = [
+            self.__time_period_indices[time_period]
+            for time_period in window_time_periods
+            if time_period in self.__time_period_indices
+        ]
+
+        return (min(indices), max(indices)) if indices else (0, -1)
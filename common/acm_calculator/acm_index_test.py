@@ -0,0 +1,112 @@
+import random
+from datetime import datetime
+from unittest import TestCase
+
+from polars import DataFrame, col
+
+from common.acm_calculator.acm_calculator import ACMCalculator
+from common.acm_calculator.acm_index import ACMIndex, WindowColumn
+from common.person_period_template_generator.person_period_template_generator import PersonDfSchema, TempColumn
+from common.person_time_engine.interval_person_time_engine import IntervalPersonTimeEngine
+from common.time_period.time_period_helper import TimePeriodHelper
+from common.typings import MAX_TIME_PERIOD_VALUE, NewColumn
+
+DOSE_COLUMNS = [TempColumn.DOSE_1, TempColumn.DOSE_2, TempColumn.DOSE_3, TempColumn.DOSE_4]
+WINDOWS = [
+    (datetime(2020, 1, 1), datetime(2022, 12, 31)),
+    (datetime(2020, 3, 1), datetime(2020, 8, 31)),
+    (datetime(2021, 1, 1), datetime(2021, 12, 31)),
+    (datetime(2019, 1, 1), datetime(2020, 5, 31)),
+    (datetime(2022, 6, 15), datetime(2023, 6, 30)),
+]
+
+
+class TestACMIndex(TestCase):
+    def setUp(self) -> None:
+        self.__acm_calculator = ACMCalculator()
+        self.__weeks = TimePeriodHelper.get_weeks_in_range(datetime(2020, 1, 1), datetime(2022, 12, 31))
+        self.__months = TimePeriodHelper.get_months_in_range(datetime(2020, 1, 1), datetime(2022, 12, 31))
+
+    # - Given an ACM index built from a person-time cube in weeks
+    # -- When computing the ACM of date windows
+    # --- It should match ACMCalculator.compute_all of the cube within each window
+    def test_compute_matches_acm_calculator_for_weeks(self) -> None:
+        self.__assert_matches_acm_calculator(self.__weeks, "W{:02d}", max_sub_period=53, is_using_months=False)
+
+    # - Given an ACM index built from a person-time cube in months
+    # -- When computing the ACM of date windows
+    # --- It should match ACMCalculator.compute_all of the cube within each window
+    def test_compute_matches_acm_calculator_for_months(self) -> None:
+        self.__assert_matches_acm_calculator(self.__months, "M{:02d}", max_sub_period=12, is_using_months=True)
+
+    # - Given several date windows
+    # -- When computing them at once
+    # --- It should return the same rows as computing each window on its own, tagged with the position of the window
+    def test_compute_windows_matches_single_windows(self) -> None:
+        cube_df = self.__create_cube_df(self.__weeks, "W{:02d}", max_sub_period=53, is_using_months=False)
+        acm_index = ACMIndex.from_cube(cube_df, self.__weeks)
+
+        result = acm_index.compute_windows(WINDOWS)
+
+        for window, (from_date, to_date) in enumerate(WINDOWS):
+            self.assertEqual(
+                result.filter(col(WindowColumn.WINDOW) == window).drop(WindowColumn.WINDOW).rows(),
+                acm_index.compute(from_date, to_date).rows(),
+            )
+
+    # - Given a date window without any time period of the dataset
+    # -- When computing its ACM
+    # --- It should return no rows
+    def test_compute_returns_no_rows_for_window_outside_time_periods(self) -> None:
+        cube_df = self.__create_cube_df(self.__months, "M{:02d}", max_sub_period=12, is_using_months=True)
+
+        result = ACMIndex.from_cube(cube_df, self.__months).compute(datetime(2018, 1, 1), datetime(2018, 12, 31))
+
+        self.assertTrue(result.is_empty())
+
+    def __assert_matches_acm_calculator(
+        self, time_periods: list[str], birth_sub_period_format: str, max_sub_period: int, is_using_months: bool
+    ) -> None:
+        cube_df = self.__create_cube_df(time_periods, birth_sub_period_format, max_sub_period, is_using_months)
+        acm_index = ACMIndex.from_cube(cube_df, time_periods)
+
+        for from_date, to_date in WINDOWS:
+            window_time_periods = (
+                TimePeriodHelper.get_months_in_range(from_date, to_date)
+                if is_using_months
+                else TimePeriodHelper.get_weeks_in_range(from_date, to_date)
+            )
+            expected = self.__acm_calculator.compute_all(
+                cube_df.filter(col(NewColumn.TIME_PERIOD).is_in(window_time_periods)), is_using_months
+            )
+
+            result = acm_index.compute(from_date, to_date)
+
+            self.assertEqual(result.rows(), expected.rows())
+
+    def __create_cube_df(
+        self, time_periods: list[str], birth_sub_period_format: str, max_sub_period: int, is_using_months: bool
+    ) -> DataFrame:
+        rng = random.Random(42)
+        num_of_persons = 500
+        num_of_time_periods = len(time_periods)
+
+        def random_dose() -> int | None:
+            return rng.randrange(num_of_time_periods) if rng.random() < 0.7 else None
+
+        persons_df = DataFrame(
+            {
+                TempColumn.PERSON_ID: list(range(1, num_of_persons + 1)),
+                TempColumn.BIRTHDATE: [
+                    f"{rng.randint(1925, 1965)}{birth_sub_period_format.format(rng.randint(1, max_sub_period))}"
+                    for _ in range(num_of_persons)
+                ],
+                **{dose: [random_dose() for _ in range(num_of_persons)] for dose in DOSE_COLUMNS},
+                TempColumn.DEATH_INDEX: [
+                    rng.choice([-1, MAX_TIME_PERIOD_VALUE, rng.randrange(num_of_time_periods)]) for _ in range(num_of_persons)
+                ],
+            },
+            schema=PersonDfSchema,
+        )
+
+        return IntervalPersonTimeEngine().compute(persons_df, time_periods, is_using_months)
@@ -0,0 +1,171 @@
+import ast
+import json
+import sys
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import asdict, dataclass, field
+from hashlib import sha256
+from inspect import getmodule, getsource
+from os import path
+from time import time_ns
+from types import ModuleType
+
+from common.file_storage.file_storage import FileStorage, StoredFile
+
+ARTIFACT_CACHE_DIRECTORY = "./data/.artifact_cache/"
+MAX_ARTIFACT_CACHE_SIZE_BYTES = 20 * 1024**3  # outputs of all pipeline stages in data/ and out/
+MANIFEST_SUFFIX = ".artifact.json"
+FILE_HASH_CHUNK_SIZE = 1 << 20
+PROJECT_DIRECTORY = path.dirname(path.dirname(path.dirname(path.abspath(__file__))))
+
+
+@dataclass(frozen=True)
+class ArtifactManifest:
+    key: str
+    file_paths: list[str]
+    size_bytes: int
+    last_used_ns: int
+    # The (JSON serialized) parameters the output was created with, so a stage can check what its stored output was built with
+    parameters: dict[str, object] = field(default_factory=dict)
+
+
+# Remembers which key (hash of the inputs, parameters and code of a pipeline stage) the stored output of a stage was
+# created with, so a stage only runs again when any of them changed. The outputs stay where the stage writes them,
+# the cache only keeps a manifest per output in its directory. When the outputs of all manifests exceed the size limit,
+# the least recently used ones are deleted.
+class ArtifactCache:
+    def __init__(self, file_storage: FileStorage, directory: str, max_size_bytes: int | None = None) -> None:
+        self.__file_storage = file_storage
+        self.__directory = directory
+        self.__max_size_bytes = max_size_bytes
+
+    # Returns whether the stored output was reused
+    def get_or_create(
+        self,
+        name: str,
+        key: str,
+        create: Callable[[], Sequence[StoredFile]],
+        parameters: Mapping[str, object] | None = None,
+    ) -> bool:
+        manifest = self.get_manifest(name)
+
+        if manifest is not None and manifest.key == key and all(map(self.__file_storage.exists, manifest.file_paths)):
+            self.__write_manifest(
+                name, ArtifactManifest(key, manifest.file_paths, manifest.size_bytes, time_ns(), manifest.parameters)
+            )
+            return True
+
+        file_paths = [stored_file.file_uri for stored_file in create()]
+        size_bytes = sum(self.__file_storage.get_size(file_path) for file_path in file_paths)
+        self.__write_manifest(
+            name, ArtifactManifest(key, file_paths, size_bytes, time_ns(), self.serialize_parameters(parameters or {}))
+        )
+        self.__evict(keep_name=name)
+
+        return False
+
+    def get_manifest(self, name: str) -> ArtifactManifest | None:
+        manifest_path = self.__get_manifest_path(name)
+        if not self.__file_storage.exists(manifest_path):
+            return None
+
+        return ArtifactManifest(**json.loads(self.__file_storage.read(manifest_path)))
+
+    @staticmethod
+    def create_key(stage: str, code_version: str, parameters: Mapping[str, object], input_fingerprints: Sequence[str] = ()) -> str:
+        key_content = json.dumps([stage, code_version, sorted(parameters.items()), list(input_fingerprints)], default=str)
+        return sha256(key_content.encode()).hexdigest()
+
+    # The parameters as they are stored in the manifest (e.g. dates and enums as strings), for comparing them with its ones
+    @staticmethod
+    def serialize_parameters(parameters: Mapping[str, object]) -> dict[str, object]:
+        return json.loads(json.dumps(dict(parameters), default=str))
+
+    # Hash of the file contents (not their modification times), so a copied or re-downloaded identical input is still a hit
+    @staticmethod
+    def get_files_fingerprint(file_storage: FileStorage, file_paths: Sequence[str]) -> str:
+        file_hash = sha256()
+
+        for file_path in sorted(file_paths):
+            file_hash.update(file_path.encode())
+            with file_storage.open_read(file_path) as file:
+                while chunk := file.read(FILE_HASH_CHUNK_SIZE):
+                    file_hash.update(chunk)
+
+        return file_hash.hexdigest()
+
+    # Hash of the source code of the modules defining the classes a stage consists of and of all project modules they
+    # (transitively) import, so changing any code the outputs depend on (e.g. a helper or a column enum) invalidates them
+    @staticmethod
+    def get_code_version(components: Sequence[type]) -> str:
+        modules = ArtifactCache.__collect_project_modules([getmodule(component) for component in components])
+        return sha256(
+            "".join(getsource(module) for module in sorted(modules, key=lambda module: module.__name__)).encode()
+        ).hexdigest()
+
+    # The imports are read from the source (instead of the module attributes), so modules only providing constants count too
+    @staticmethod
+    def __collect_project_modules(modules: Sequence[ModuleType | None]) -> list[ModuleType]:
+        collected: dict[str, ModuleType] = {}
+        pending = [module for module in modules if module is not None]
+
+        while pending:
+            module = pending.pop()
+            if module.__name__ in collected:
+                continue
+            collected[module.__name__] = module
+
+            for node in ast.walk(ast.parse(getsource(module))):
+                if isinstance(node, ast.Import):
+                    module_names = [alias.name for alias in node.names]
+                elif isinstance(node, ast.ImportFrom) and node.module is not None:
+                    # The imported names can be submodules as well
+                    module_names = [node.module, *(f"{node.module}.{alias.name}" for alias in node.names)]
+                else:
+                    continue
+
+                pending.extend(
+                    imported_module
+                    for module_name in module_names
+                    if (imported_module := sys.modules.get(module_name)) is not None
+                    and ArtifactCache.__is_project_module(imported_module)
+                )
+
+        return list(collected.values())
+
+    @staticmethod
+    def __is_project_module(module: ModuleType) -> bool:
+        file_path = getattr(module, "__file__", None)
+        return (
+            file_path is not None
+            and path.abspath(file_path).startswith(PROJECT_DIRECTORY + path.sep)
+            and "site-packages" not in file_path
+        )
+
+    def __evict(self, keep_name: str) -> None:
+        if self.__max_size_bytes is None:
+            return
+
+        manifests = {
+            manifest_path: ArtifactManifest(**json.loads(self.__file_storage.read(manifest_path)))
+            for manifest_path in self.__file_storage.list_files(self.__directory)
+            if manifest_path.endswith(MANIFEST_SUFFIX)
+        }
+        total_size_bytes = sum(manifest.size_bytes for manifest in manifests.values())
+
+        for manifest_path, manifest in sorted(manifests.items(), key=lambda item: item[1].last_used_ns):
+            if total_size_bytes <= self.__max_size_bytes:
+                return
+            if manifest_path == self.__get_manifest_path(keep_name):
+                continue
+
+            for file_path in manifest.file_paths:
+                if self.__file_storage.exists(file_path):
+                    self.__file_storage.delete(file_path)
+            self.__file_storage.delete(manifest_path)
+            total_size_bytes -= manifest.size_bytes
+
+    def __write_manifest(self, name: str, manifest: ArtifactManifest) -> None:
+        self.__file_storage.write(self.__get_manifest_path(name), json.dumps(asdict(manifest)).encode())
+
+    def __get_manifest_path(self, name: str) -> str:
+        return f"{self.__directory}{name}{MANIFEST_SUFFIX}"
@@ -0,0 +1,125 @@
+import inspect
+from datetime import datetime
+from os import path
+from tempfile import TemporaryDirectory
+from types import ModuleType
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import polars
+
+from common import typings
+from common.acm_calculator.acm_index import ACMIndex
+from common.artifact_cache import artifact_cache
+from common.artifact_cache.artifact_cache import ArtifactCache
+from common.file_storage import file_storage
+from common.file_storage.file_storage import LocalFileStorage, StoredFile
+from common.time_period import time_period_helper
+
+
+class TestArtifactCache(TestCase):
+    def setUp(self) -> None:
+        self.__tmp_dir = TemporaryDirectory()
+        self.__directory = f"{self.__tmp_dir.name}/"
+        self.__file_storage = LocalFileStorage()
+        self.__cache = ArtifactCache(self.__file_storage, f"{self.__directory}cache/")
+
+    def tearDown(self) -> None:
+        self.__tmp_dir.cleanup()
+
+    # - Given an output created with a key
+    # -- When requesting it with the same key
+    # --- It should reuse the stored output without creating it again
+    def test_get_or_create_reuses_output_with_same_key(self) -> None:
+        create = Mock(side_effect=lambda: [self.__write_output("output", 10)])
+
+        is_first_reused = self.__cache.get_or_create("output", "key", create)
+        is_second_reused = self.__cache.get_or_create("output", "key", create)
+
+        self.assertFalse(is_first_reused)
+        self.assertTrue(is_second_reused)
+        create.assert_called_once()
+
+    # - Given an output created with a key
+    # -- When requesting it with a different key or after its file was deleted
+    # --- It should create it again
+    def test_get_or_create_recreates_stale_or_missing_output(self) -> None:
+        create = Mock(side_effect=lambda: [self.__write_output("output", 10)])
+        self.__cache.get_or_create("output", "key", create)
+
+        self.assertFalse(self.__cache.get_or_create("output", "other_key", create))
+        self.__file_storage.delete(f"{self.__directory}output")
+        self.assertFalse(self.__cache.get_or_create("output", "other_key", create))
+
+        self.assertEqual(create.call_count, 3)
+
+    # - Given a size limit
+    # -- When the cached outputs exceed it
+    # --- It should delete the least recently used outputs
+    def test_get_or_create_evicts_least_recently_used_outputs(self) -> None:
+        cache = ArtifactCache(self.__file_storage, f"{self.__directory}cache/", max_size_bytes=25)
+        cache.get_or_create("first", "key", lambda: [self.__write_output("first", 10)])
+        cache.get_or_create("second", "key", lambda: [self.__write_output("second", 10)])
+        cache.get_or_create("first", "key", lambda: [])  # makes "second" the least recently used
+
+        cache.get_or_create("third", "key", lambda: [self.__write_output("third", 10)])
+
+        self.assertIsNone(cache.get_manifest("second"))
+        self.assertFalse(path.exists(f"{self.__directory}second"))
+        self.assertTrue(path.exists(f"{self.__directory}first"))
+        self.assertTrue(path.exists(f"{self.__directory}third"))
+
+    # - Given an output created with parameters
+    # -- When it is reused, and when it is recreated without parameters
+    # --- It should keep the serialized parameters of the output it created last
+    def test_manifest_keeps_parameters_of_created_output(self) -> None:
+        parameters = {"from_date": datetime(2020, 1, 1), "is_compact": True}
+
+        self.__cache.get_or_create("output", "key", lambda: [self.__write_output("output", 10)], parameters)
+        self.__cache.get_or_create("output", "key", lambda: [self.__write_output("output", 10)])
+        reused_manifest = self.__cache.get_manifest("output")
+        self.__cache.get_or_create("output", "other key", lambda: [self.__write_output("output", 10)])
+        recreated_manifest = self.__cache.get_manifest("output")
+
+        self.assertEqual(reused_manifest.parameters if reused_manifest else None, ArtifactCache.serialize_parameters(parameters))
+        self.assertEqual(ArtifactCache.serialize_parameters(parameters), {"from_date": "2020-01-01 00:00:00", "is_compact": True})
+        self.assertEqual(recreated_manifest.parameters if recreated_manifest else None, {})
+
+    # - When creating keys and fingerprints
+    # -- It should change with the parameters and with the file contents
+    def test_keys_and_fingerprints_depend_on_content(self) -> None:
+        file_path = self.__write_output("input", 10).file_uri
+        fingerprint = ArtifactCache.get_files_fingerprint(self.__file_storage, [file_path])
+        self.__file_storage.write(file_path, b"y" * 10)
+
+        self.assertNotEqual(ArtifactCache.get_files_fingerprint(self.__file_storage, [file_path]), fingerprint)
+        self.assertEqual(
+            ArtifactCache.create_key("stage", "v1", {"a": 1, "b": 2}), ArtifactCache.create_key("stage", "v1", {"b": 2, "a": 1})
+        )
+        self.assertNotEqual(ArtifactCache.create_key("stage", "v1", {"a": 1}), ArtifactCache.create_key("stage", "v1", {"a": 2}))
+        self.assertNotEqual(ArtifactCache.create_key("stage", "v1", {}), ArtifactCache.create_key("stage", "v2", {}))
+        self.assertEqual(
+            ArtifactCache.get_code_version([ArtifactCache, StoredFile]),
+            ArtifactCache.get_code_version([StoredFile, ArtifactCache]),
+        )
+
+    # - Given the code version of a stage
+    # -- When the source of a project module it (transitively) imports changes
+    # --- It should change as well, but not when a module outside of the project or not imported by the stage changes
+    def test_code_version_depends_on_imported_project_modules(self) -> None:
+        code_version = ArtifactCache.get_code_version([ACMIndex])
+
+        for module, is_dependency in [(time_period_helper, True), (typings, True), (polars, False), (file_storage, False)]:
+            with self.subTest(module=module.__name__):
+
+                def get_changed_source(source_module: ModuleType, changed_module: ModuleType = module) -> str:
+                    source = inspect.getsource(source_module)
+                    return f"{source}\n# changed" if source_module is changed_module else source
+
+                with patch.object(artifact_cache, "getsource", side_effect=get_changed_source):
+                    changed_code_version = ArtifactCache.get_code_version([ACMIndex])
+
+                self.assertEqual(changed_code_version != code_version, is_dependency)
+
+    def __write_output(self, name: str, size_bytes: int) -> StoredFile:
+        return self.__file_storage.write(f"{self.__directory}{name}", b"x" * size_bytes)
@@ -0,0 +1,120 @@
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, replace
+from itertools import repeat
+from multiprocessing import get_context
+from typing import Any
+
+from polars import DataFrame, UInt32, col, concat
+
+from common.cohort_simulator.cohort_simulator import CohortSimulator, SimulationParameters
+from common.file_storage.dataframe_storage import ArrowPolarsDataframeStorage
+from common.file_storage.file_storage import StoredFile
+from common.person_period_processor.person_period_template_processor import PersonPeriodTemplateProcessor
+from common.person_period_template_generator.person_period_template_generator import PersonPeriodTemplateExpander, TempColumn
+from common.person_time_engine.interval_person_time_engine import IntervalPersonTimeEngine
+from common.random_streams.random_streams import RandomStreams
+from common.time_tracker import TimeTracker
+from common.typings import CUBE_DIMENSIONS, AggregatedColumn, NewColumn
+
+
+@dataclass(frozen=True)
+class SimulationChunk:
+    index: int
+    first_person_id: int
+    number_of_persons: int
+
+
+# Simulates the cohort in independent chunks of persons, so only one chunk per worker is ever in memory. Every chunk is
+# simulated with its own random stream (keyed by the chunk index), so the cohort only depends on the seed and the chunk
+# size (not on the number of workers), and any chunk can be (re)simulated on its own. The person IDs are the same as of
+# CohortSimulator.simulate_persons (1 to number_of_individuals - 1).
+class ChunkedCohortSimulator:
+    # One worker simulates the chunks in this process, more (None = one per CPU) spawn a process pool like SimulationSweep
+    def __init__(
+        self, parameters: SimulationParameters, chunk_size: int, seed: int | None = None, max_workers: int | None = 1
+    ) -> None:
+        self.__parameters = parameters
+        self.__chunk_size = chunk_size
+        self.__random_streams = RandomStreams(seed)
+        self.__max_workers = max_workers
+
+    def get_chunks(self) -> list[SimulationChunk]:
+        number_of_persons = self.__parameters.number_of_individuals - 1
+
+        return [
+            SimulationChunk(index, first_person_id, min(self.__chunk_size, number_of_persons - first_person_id + 1))
+            for index, first_person_id in enumerate(range(1, number_of_persons + 1, self.__chunk_size))
+        ]
+
+    def simulate_chunk(self, chunk: SimulationChunk) -> DataFrame:
+        chunk_parameters = replace(self.__parameters, number_of_individuals=chunk.number_of_persons + 1)
+
+        persons_df = CohortSimulator(chunk_parameters, self.__random_streams.get_rng(chunk.index)).simulate_persons()
+
+        return persons_df.with_columns((col(TempColumn.PERSON_ID) + (chunk.first_person_id - 1)).cast(UInt32))
+
+    # Each chunk is reduced to its person-time cube, the cubes of all chunks are summed up
+    def compute_cube(self, time_periods: list[str]) -> DataFrame:
+        return self.__merge_cubes(self.__map_chunks(compute_chunk_cube, time_periods))
+
+    # Streams the processed rows of each chunk into its own part file (<file_name>/part-XXXXX) and writes the summed
+    # person-time cube of all chunks (<file_name>_cube)
+    def write(
+        self,
+        file_storage: ArrowPolarsDataframeStorage,
+        file_name: str,
+        time_periods: list[str],
+    ) -> list[StoredFile]:
+        file_storage.delete(file_name)
+        file_storage.clear_partitions(file_name)
+
+        results = self.__map_chunks(write_chunk, file_storage, file_name, time_periods)
+
+        return [
+            *(stored_file for stored_file, _ in results),
+            file_storage.write(f"{file_name}_cube", self.__merge_cubes([cube_df for _, cube_df in results])),
+        ]
+
+    # The results are returned in the order of the chunks, however the chunks were scheduled
+    def __map_chunks(self, function: Callable[..., Any], *args: object) -> list[Any]:
+        chunks = self.get_chunks()
+
+        if self.__max_workers == 1:
+            return [function(self, chunk, *args) for chunk in chunks]
+
+        # Forking a process with an already running polars thread pool can deadlock, so the workers are spawned
+        with ProcessPoolExecutor(max_workers=self.__max_workers, mp_context=get_context("spawn")) as executor:
+            return list(executor.map(function, repeat(self), chunks, *(repeat(arg) for arg in args)))
+
+    def __merge_cubes(self, cube_dfs: list[DataFrame]) -> DataFrame:
+        dimensions = [NewColumn.TIME_PERIOD, *CUBE_DIMENSIONS]
+
+        return concat(cube_dfs).group_by(dimensions).agg(col(AggregatedColumn.PERSON_PERIODS).sum().cast(UInt32)).sort(dimensions)
+
+
+# Module level, so they can be pickled into the worker processes
+def compute_chunk_cube(simulator: ChunkedCohortSimulator, chunk: SimulationChunk, time_periods: list[str]) -> DataFrame:
+    with TimeTracker(f"Simulating chunk {chunk.index + 1}/{len(simulator.get_chunks())}"):
+        return IntervalPersonTimeEngine().compute(simulator.simulate_chunk(chunk), time_periods)
+
+
+def write_chunk(
+    simulator: ChunkedCohortSimulator,
+    chunk: SimulationChunk,
+    file_storage: ArrowPolarsDataframeStorage,
+    file_name: str,
+    time_periods: list[str],
+) -> tuple[StoredFile, DataFrame]:
+    with TimeTracker(f"Simulating and processing chunk {chunk.index + 1}/{len(simulator.get_chunks())}"):
+        persons_df = simulator.simulate_chunk(chunk)
+
+        stored_file = file_storage.sink_partition(
+            file_name,
+            chunk.index,
+            PersonPeriodTemplateProcessor().process_lazy(
+                PersonPeriodTemplateExpander.expand_lazy(persons_df.lazy(), time_periods)
+            ),
+        )
+
+        return stored_file, IntervalPersonTimeEngine().compute(persons_df, time_periods)
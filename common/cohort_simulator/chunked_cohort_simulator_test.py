@@ -0,0 +1,87 @@
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+
+from common.cohort_simulator.chunked_cohort_simulator import ChunkedCohortSimulator, SimulationChunk
+from common.cohort_simulator.cohort_simulator import SimulationParameters
+from common.file_storage.dataframe_storage import ArrowPolarsDataframeStorage
+from common.file_storage.file_storage import LocalFileStorage
+from common.person_period_processor.person_period_template_processor import PersonPeriodTemplateProcessor
+from common.person_period_template_generator.person_period_template_generator import PersonDfSchema, TempColumn
+from common.time_period.time_period_helper import TimePeriodHelper
+from common.typings import CUBE_DIMENSIONS, NewColumn
+
+
+class TestChunkedCohortSimulator(TestCase):
+    def setUp(self) -> None:
+        self.__weeks = TimePeriodHelper.get_weeks_in_range(datetime(2021, 1, 5), datetime(2022, 12, 31))
+        self.__parameters = SimulationParameters(
+            number_of_individuals=2_501, num_of_weeks=len(self.__weeks), death_probability=0.1, hve_window=26, hve_probability=0.5
+        )
+
+    # - Given a cohort that is not a multiple of the chunk size
+    # -- When splitting it into chunks
+    # --- It should cover the person IDs of CohortSimulator exactly once, with a smaller last chunk
+    def test_get_chunks_covers_all_persons(self) -> None:
+        simulator = ChunkedCohortSimulator(self.__parameters, chunk_size=1_000, seed=1)
+
+        chunks = simulator.get_chunks()
+
+        self.assertEqual(chunks, [SimulationChunk(0, 1, 1_000), SimulationChunk(1, 1_001, 1_000), SimulationChunk(2, 2_001, 500)])
+        person_ids = [simulator.simulate_chunk(chunk)[TempColumn.PERSON_ID] for chunk in chunks]
+        self.assertEqual([person_id for ids in person_ids for person_id in ids.to_list()], list(range(1, 2_501)))
+
+    # - Given the same seed
+    # -- When simulating a chunk on its own or in another simulator
+    # --- It should return the same persons, in the PersonDfSchema
+    def test_simulate_chunk_is_reproducible(self) -> None:
+        chunk = SimulationChunk(1, 1_001, 1_000)
+
+        result = ChunkedCohortSimulator(self.__parameters, chunk_size=1_000, seed=7).simulate_chunk(chunk)
+        same_seed_result = ChunkedCohortSimulator(self.__parameters, chunk_size=1_000, seed=7).simulate_chunk(chunk)
+        other_seed_result = ChunkedCohortSimulator(self.__parameters, chunk_size=1_000, seed=8).simulate_chunk(chunk)
+
+        self.assertEqual(result.schema, PersonDfSchema)
+        self.assertTrue(result.equals(same_seed_result))
+        self.assertFalse(result.equals(other_seed_result))
+
+    # - Given a chunked simulation written to storage
+    # -- When aggregating the written part files
+    # --- It should match the merged cube, which is also the cube returned by compute_cube
+    def test_write_cube_matches_written_partitions(self) -> None:
+        simulator = ChunkedCohortSimulator(self.__parameters, chunk_size=1_000, seed=5)
+        processor = PersonPeriodTemplateProcessor()
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), f"{directory}/")
+
+            stored_files = simulator.write(file_storage, "simulation", self.__weeks)
+
+            dimensions = [NewColumn.TIME_PERIOD, *CUBE_DIMENSIONS]
+            cube_df = file_storage.read("simulation_cube")
+            self.assertEqual(len(stored_files), 4)
+            self.assertEqual(
+                cube_df.sort(dimensions).rows(),
+                processor.aggregate(file_storage.read("simulation")).sort(dimensions).rows(),
+            )
+            self.assertTrue(cube_df.equals(simulator.compute_cube(self.__weeks)))
+
+    # - Given the same seed
+    # -- When simulating the chunks with a different number of workers
+    # --- It should return a bit-identical cube and write identical part files
+    def test_results_are_identical_regardless_of_workers(self) -> None:
+        single_worker_simulator = ChunkedCohortSimulator(self.__parameters, chunk_size=1_000, seed=3, max_workers=1)
+        multi_worker_simulator = ChunkedCohortSimulator(self.__parameters, chunk_size=1_000, seed=3, max_workers=2)
+
+        self.assertTrue(
+            single_worker_simulator.compute_cube(self.__weeks).equals(multi_worker_simulator.compute_cube(self.__weeks))
+        )
+
+        with tempfile.TemporaryDirectory() as directory:
+            file_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), f"{directory}/")
+
+            single_worker_simulator.write(file_storage, "single", self.__weeks)
+            multi_worker_simulator.write(file_storage, "multi", self.__weeks)
+
+            self.assertTrue(file_storage.read("single").equals(file_storage.read("multi")))
+            self.assertTrue(file_storage.read("single_cube").equals(file_storage.read("multi_cube")))
@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+
+import numpy as np
+from polars import DataFrame, Int64, Series, Utf8, lit
+
+from common.person_period_template_generator.person_period_template_generator import TempColumn
+
+# Probability of taking the 1st, 2nd and 3rd dose given the previous one was received
+DOSE_UPTAKE_CASCADE = [0.82, 0.96, 0.82]
+DOSE_GAP_MEAN = 20
+DOSE_GAP_STD = 3
+MOCKED_BIRTHDATE = "1900-01-05"  # mocked birthdate for 80+ y.o. group
+
+
+@dataclass(frozen=True)
+class SimulationParameters:
+    number_of_individuals: int
+    num_of_weeks: int
+    death_probability: float
+    hve_window: int
+    hve_probability: float
+
+
+class CohortSimulator:
+    def __init__(self, parameters: SimulationParameters, rng: np.random.Generator) -> None:
+        self.__parameters = parameters
+        self.__rng = rng
+
+    # Simulates the whole cohort at once (one array per attribute) and returns it in the PersonDfSchema
+    def simulate_persons(self) -> DataFrame:
+        person_ids = np.arange(1, self.__parameters.number_of_individuals, dtype=np.uint32)
+        death_indices = self.__assign_deaths(len(person_ids))
+        doses = self.__assign_doses(death_indices)
+
+        return DataFrame(
+            [
+                Series(TempColumn.PERSON_ID, person_ids),
+                *doses,
+                Series(TempColumn.DEATH_INDEX, death_indices, dtype=Int64),
+            ]
+        ).select(
+            TempColumn.PERSON_ID,
+            lit(MOCKED_BIRTHDATE, dtype=Utf8).alias(TempColumn.BIRTHDATE),
+            TempColumn.DOSE_1,
+            TempColumn.DOSE_2,
+            TempColumn.DOSE_3,
+            lit(self.__parameters.num_of_weeks + 1, dtype=Int64).alias(TempColumn.DOSE_4),
+            TempColumn.DEATH_INDEX,
+        )
+
+    def __assign_deaths(self, size: int) -> np.ndarray:
+        num_of_weeks = self.__parameters.num_of_weeks
+        is_dying = self.__rng.uniform(0, 1, size) <= self.__parameters.death_probability
+        death_weeks = np.rint(self.__rng.uniform(0, num_of_weeks, size)).astype(np.int64)
+
+        return np.where(is_dying, death_weeks, num_of_weeks + 1)
+
+    # Each dose is only offered to persons who received the previous one, a refused dose ends the cascade
+    def __assign_doses(self, death_indices: np.ndarray) -> list[Series]:
+        size = len(death_indices)
+        is_eligible = np.ones(size, dtype=bool)
+        dose_weeks = np.zeros(size, dtype=np.int64)
+        doses: list[Series] = []
+
+        for dose_col, uptake in zip([TempColumn.DOSE_1, TempColumn.DOSE_2, TempColumn.DOSE_3], DOSE_UPTAKE_CASCADE, strict=True):
+            is_taking_dose = is_eligible & (self.__rng.uniform(0, 1, size) < uptake)
+            dose_weeks = dose_weeks + np.rint(self.__rng.normal(DOSE_GAP_MEAN, DOSE_GAP_STD, size)).astype(np.int64)
+
+            is_receiving_dose = is_taking_dose & self.__should_receive_dose(death_indices, dose_weeks)
+            doses.append(Series(dose_col, dose_weeks, dtype=Int64).set(Series(~is_receiving_dose), None))
+            is_eligible = is_receiving_dose
+
+        return doses
+
+    # Healthy vaccinee effect: persons close to their death refuse the dose with HVE probability
+    def __should_receive_dose(self, death_indices: np.ndarray, dose_weeks: np.ndarray) -> np.ndarray:
+        is_close_to_death = death_indices - dose_weeks <= self.__parameters.hve_window
+        is_refusing = self.__rng.uniform(0, 1, len(dose_weeks)) <= self.__parameters.hve_probability
+
+        return ~(is_close_to_death & is_refusing)
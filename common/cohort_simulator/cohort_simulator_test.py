@@ -0,0 +1,61 @@
+from dataclasses import replace
+from unittest import TestCase
+
+import numpy as np
+from polars import col
+
+from common.cohort_simulator.cohort_simulator import DOSE_UPTAKE_CASCADE, CohortSimulator, SimulationParameters
+from common.person_period_template_generator.person_period_template_generator import PersonDfSchema, TempColumn
+
+
+class TestCohortSimulator(TestCase):
+    def setUp(self) -> None:
+        self.__parameters = SimulationParameters(
+            number_of_individuals=20_001,
+            num_of_weeks=104,
+            death_probability=0.1,
+            hve_window=26,
+            hve_probability=0.0,
+        )
+
+    # - When simulating the persons
+    # -- It should return one row per individual in the PersonDfSchema
+    def test_simulate_persons_structure(self) -> None:
+        result = CohortSimulator(self.__parameters, np.random.default_rng(1)).simulate_persons()
+
+        self.assertEqual(result.schema, PersonDfSchema)
+        self.assertEqual(result[TempColumn.PERSON_ID].to_list(), list(range(1, self.__parameters.number_of_individuals)))
+        self.assertTrue((result[TempColumn.DOSE_4] == self.__parameters.num_of_weeks + 1).all())
+
+    # - Given the same random generator seed
+    # -- When simulating the persons twice
+    # --- It should return the same cohort
+    def test_simulate_persons_is_reproducible(self) -> None:
+        first = CohortSimulator(self.__parameters, np.random.default_rng(7)).simulate_persons()
+        second = CohortSimulator(self.__parameters, np.random.default_rng(7)).simulate_persons()
+
+        self.assertTrue(first.equals(second))
+
+    # - When simulating the persons
+    # -- It should only give a dose to persons who received the previous one, with later weeks
+    def test_doses_follow_the_cascade(self) -> None:
+        result = CohortSimulator(self.__parameters, np.random.default_rng(1)).simulate_persons()
+
+        for previous_dose, dose in [(TempColumn.DOSE_1, TempColumn.DOSE_2), (TempColumn.DOSE_2, TempColumn.DOSE_3)]:
+            with_dose = result.filter(col(dose).is_not_null())
+            self.assertEqual(with_dose[previous_dose].null_count(), 0)
+
+        # Without HVE the uptake of the first dose is only driven by the cascade probability
+        self.assertAlmostEqual(result[TempColumn.DOSE_1].is_not_null().mean(), DOSE_UPTAKE_CASCADE[0], delta=0.02)
+
+    # - Given the HVE probability of 1
+    # -- When simulating the persons
+    # --- It should not give any dose within the HVE window before death
+    def test_full_hve_refuses_doses_close_to_death(self) -> None:
+        parameters = replace(self.__parameters, hve_probability=1.0)
+
+        result = CohortSimulator(parameters, np.random.default_rng(1)).simulate_persons()
+
+        for dose in [TempColumn.DOSE_1, TempColumn.DOSE_2, TempColumn.DOSE_3]:
+            close_to_death = result.filter(col(TempColumn.DEATH_INDEX) - col(dose) <= parameters.hve_window)
+            self.assertEqual(close_to_death.height, 0)
@@ -0,0 +1,73 @@
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from enum import StrEnum
+from itertools import product, repeat
+from multiprocessing import get_context
+
+import numpy as np
+from polars import DataFrame, Float64, Int64, concat, lit
+
+from common.acm_calculator.acm_calculator import ACMCalculator
+from common.cohort_simulator.cohort_simulator import CohortSimulator, SimulationParameters
+from common.person_time_engine.interval_person_time_engine import IntervalPersonTimeEngine
+from common.random_streams.random_streams import RandomStreams
+
+
+class SweepColumn(StrEnum):
+    SCENARIO_INDEX = "scenario_index"
+    NUMBER_OF_INDIVIDUALS = "number_of_individuals"
+    DEATH_PROBABILITY = "death_probability"
+    HVE_WINDOW = "hve_window"
+    HVE_PROBABILITY = "hve_probability"
+
+
+@dataclass(frozen=True)
+class SweepGrid:
+    numbers_of_individuals: list[int]
+    death_probabilities: list[float]
+    hve_windows: list[int]
+    hve_probabilities: list[float]
+
+    def get_scenarios(self, num_of_weeks: int) -> list[SimulationParameters]:
+        return [
+            SimulationParameters(number_of_individuals, num_of_weeks, death_probability, hve_window, hve_probability)
+            for number_of_individuals, death_probability, hve_window, hve_probability in product(
+                self.numbers_of_individuals, self.death_probabilities, self.hve_windows, self.hve_probabilities
+            )
+        ]
+
+
+# Runs every scenario in a separate process. Each scenario gets its own random stream (keyed by its position in the list),
+# so the results only depend on the seed and the scenarios, not on the number of workers or their scheduling.
+class SimulationSweep:
+    def __init__(self, time_periods: list[str], seed: int | None = None, max_workers: int | None = None) -> None:
+        self.__time_periods = time_periods
+        self.__random_streams = RandomStreams(seed)
+        self.__max_workers = max_workers
+
+    def run(self, scenarios: list[SimulationParameters]) -> DataFrame:
+        seed_sequences = [self.__random_streams.get_seed_sequence(index) for index in range(len(scenarios))]
+
+        # Forking a process with an already running polars thread pool can deadlock, so the workers are spawned
+        with ProcessPoolExecutor(max_workers=self.__max_workers, mp_context=get_context("spawn")) as executor:
+            results = executor.map(run_scenario, scenarios, seed_sequences, repeat(self.__time_periods))
+
+            return concat(
+                result.select(lit(scenario_index, Int64).alias(SweepColumn.SCENARIO_INDEX), "*")
+                for scenario_index, result in enumerate(results)
+            )
+
+
+# Module level, so it can be pickled into the worker processes
+def run_scenario(parameters: SimulationParameters, seed_sequence: np.random.SeedSequence, time_periods: list[str]) -> DataFrame:
+    persons_df = CohortSimulator(parameters, np.random.default_rng(seed_sequence)).simulate_persons()
+    cube_df = IntervalPersonTimeEngine().compute(persons_df, time_periods)
+    acm_df = ACMCalculator().compute_all(cube_df, is_using_months=False)
+
+    return acm_df.select(
+        lit(parameters.number_of_individuals, Int64).alias(SweepColumn.NUMBER_OF_INDIVIDUALS),
+        lit(parameters.death_probability, Float64).alias(SweepColumn.DEATH_PROBABILITY),
+        lit(parameters.hve_window, Int64).alias(SweepColumn.HVE_WINDOW),
+        lit(parameters.hve_probability, Float64).alias(SweepColumn.HVE_PROBABILITY),
+        "*",
+    )
@@ -0,0 +1,50 @@
+from datetime import datetime
+from unittest import TestCase
+
+from common.cohort_simulator.cohort_simulator import SimulationParameters
+from common.cohort_simulator.simulation_sweep import SimulationSweep, SweepColumn, SweepGrid
+from common.time_period.time_period_helper import TimePeriodHelper
+
+
+class TestSimulationSweep(TestCase):
+    def setUp(self) -> None:
+        self.__weeks = TimePeriodHelper.get_weeks_in_range(datetime(2021, 1, 5), datetime(2022, 12, 31))
+        self.__grid = SweepGrid(
+            numbers_of_individuals=[2_001],
+            death_probabilities=[0.1, 0.2],
+            hve_windows=[26],
+            hve_probabilities=[0.0, 0.5],
+        )
+
+    # - Given a sweep grid
+    # -- When creating the scenarios
+    # --- It should return every combination of the grid parameters
+    def test_grid_scenarios(self) -> None:
+        scenarios = self.__grid.get_scenarios(num_of_weeks=len(self.__weeks))
+
+        self.assertEqual(len(scenarios), 4)
+        self.assertIn(SimulationParameters(2_001, len(self.__weeks), 0.2, 26, 0.5), scenarios)
+
+    # - When running the sweep
+    # -- It should return the ACM results of every scenario tagged with its parameters
+    def test_run_tags_results_with_scenario(self) -> None:
+        scenarios = self.__grid.get_scenarios(num_of_weeks=len(self.__weeks))
+
+        result = SimulationSweep(self.__weeks, seed=1, max_workers=2).run(scenarios)
+
+        self.assertEqual(result[SweepColumn.SCENARIO_INDEX].unique().sort().to_list(), [0, 1, 2, 3])
+        self.assertEqual(
+            result.select(SweepColumn.DEATH_PROBABILITY, SweepColumn.HVE_PROBABILITY).unique().sort("*").rows(),
+            [(0.1, 0.0), (0.1, 0.5), (0.2, 0.0), (0.2, 0.5)],
+        )
+
+    # - Given the same seed
+    # -- When running the sweep with a different number of workers
+    # --- It should return the same results
+    def test_run_is_reproducible_regardless_of_workers(self) -> None:
+        scenarios = self.__grid.get_scenarios(num_of_weeks=len(self.__weeks))
+
+        single_worker_result = SimulationSweep(self.__weeks, seed=3, max_workers=1).run(scenarios)
+        multi_worker_result = SimulationSweep(self.__weeks, seed=3, max_workers=3).run(scenarios)
+
+        self.assertTrue(single_worker_result.equals(multi_worker_result))
@@ -1,32 +1,150 @@
-from io import BytesIO
+from collections.abc import Mapping
+from enum import StrEnum
 
-from polars import DataFrame, read_parquet
+from polars import DataFrame, Expr, LazyFrame, concat, read_ipc, read_parquet, scan_ipc, scan_parquet
+from polars import len as polars_len
 
 from common.file_storage.file_storage import FileStorage, StoredFile
 
 
+class DataframeFormat(StrEnum):
+    # Compressed, smallest on disk (the format of the bundled data, despite its suffix)
+    PARQUET = "parquet"
+    # Uncompressed Arrow IPC (Feather v2), memory mapped on read, so reopening a dataset is near-instant
+    IPC = "ipc"
+
+
+FILE_SUFFIX = "_polars.arrow.gz"
+FILE_SUFFIXES = {DataframeFormat.PARQUET: FILE_SUFFIX, DataframeFormat.IPC: "_polars.arrow"}
+
+
 class ArrowPolarsDataframeStorage:
-    def __init__(self, file_storage: FileStorage, path: str) -> None:
+    def __init__(self, file_storage: FileStorage, path: str, file_format: DataframeFormat = DataframeFormat.PARQUET) -> None:
         self.__file_storage = file_storage
         self.__path = path
+        self.__file_format = file_format
 
     def write(self, file_name: str, data: DataFrame) -> StoredFile:
-        buffer_value = self.__convert_dataframe_to_bytes(data)
-        file_path = self.__generate_file_path(file_name)
-        return self.__file_storage.write(file_path, buffer_value)
+        return self.__write_file(self.__generate_file_path(file_name, self.__file_format), data)
+
+    def sink(self, file_name: str, data: LazyFrame) -> StoredFile:
+        # Runs the query on the streaming engine and writes batches straight to the file, so the whole result
+        # is never held in memory
+        return self.__sink_file(self.__generate_file_path(file_name, self.__file_format), data)
+
+    # Hive keys put the part file into a <key>=<value> subdirectory per key (e.g. dataset/year=2021/quarter=3/part-00000),
+    # which scan() exposes as columns and uses to skip whole partitions
+    def sink_partition(
+        self, dataset_name: str, partition_index: int, data: LazyFrame, hive_keys: Mapping[str, int] | None = None
+    ) -> StoredFile:
+        return self.sink(self.get_partition_name(dataset_name, partition_index, hive_keys), data)
+
+    def get_partition_name(self, dataset_name: str, partition_index: int, hive_keys: Mapping[str, int] | None = None) -> str:
+        return f"{self.__get_partition_directory(dataset_name, hive_keys)}/part-{str(partition_index).zfill(5)}"
 
+    def clear_partitions(self, dataset_name: str, hive_keys: Mapping[str, int] | None = None) -> None:
+        for partition_path in self.__list_partition_paths(self.__get_partition_directory(dataset_name, hive_keys)):
+            self.__file_storage.delete(partition_path)
+
+    # Rewrites (each atomically) only the part files containing rows that do not match the predicate; the other part files
+    # are only scanned for the columns of the predicate
+    def filter_partitions(self, dataset_name: str, predicate: Expr, hive_keys: Mapping[str, int] | None = None) -> None:
+        for partition_path in self.__list_partition_paths(self.__get_partition_directory(dataset_name, hive_keys)):
+            if self.__scan_file(partition_path).filter(~predicate).select(polars_len()).collect().item() > 0:
+                # Collected before the rewrite, as the scan would otherwise read the file being replaced
+                self.__sink_file(partition_path, self.__read_file(partition_path).filter(predicate).lazy())
+
+    # Files are read in the format they were written in, regardless of the format this storage writes
     def read(self, file_name: str) -> DataFrame:
-        file_path = self.__generate_file_path(file_name)
-        file_content = self.__file_storage.read(file_path)
-        with BytesIO(file_content) as buffer:
-            return read_parquet(buffer, use_pyarrow=True)
-
-    def __generate_file_path(self, file_name: str) -> str:
-        return (
-            self.__path + file_name + "_polars.arrow.gz" if not file_name.endswith("_polars.arrow.gz") else self.__path + file_name
+        # Partitioned datasets (a directory of part files) are read as one dataframe, without the hive key columns
+        partition_paths = self.__list_partition_paths(file_name)
+        if partition_paths:
+            # Memory mapped partitions stay separate chunks instead of being copied into one
+            return concat([self.__read_file(partition_path) for partition_path in partition_paths], how="vertical", rechunk=False)
+
+        return self.__read_file(self.__find_file_path(file_name))
+
+    # Unlike read(), the (local) files are only read when the LazyFrame is collected: filters and column selections are
+    # pushed down into the scan, so filters on the hive keys skip whole partitions and only selected columns are read
+    def scan(self, file_name: str) -> LazyFrame:
+        partition_paths = self.__list_partition_paths(file_name)
+        file_paths = self.get_file_paths(file_name)
+        is_hive_partitioned = any(
+            "=" in partition_path.removeprefix(self.__path + file_name) for partition_path in partition_paths
+        )
+
+        if file_paths[0].endswith(FILE_SUFFIXES[DataframeFormat.IPC]):
+            return scan_ipc(file_paths, hive_partitioning=is_hive_partitioned, memory_map=True)
+
+        return scan_parquet(file_paths, hive_partitioning=is_hive_partitioned)
+
+    def delete(self, file_name: str) -> None:
+        for file_path in self.get_file_paths(file_name):
+            if self.__file_storage.exists(file_path):
+                self.__file_storage.delete(file_path)
+
+    def get_file_paths(self, file_name: str) -> list[str]:
+        return self.__list_partition_paths(file_name) or [self.__find_file_path(file_name)]
+
+    def exists(self, file_name: str) -> bool:
+        return bool(self.__list_partition_paths(file_name)) or any(
+            self.__file_storage.exists(self.__generate_file_path(file_name, file_format)) for file_format in DataframeFormat
         )
 
-    def __convert_dataframe_to_bytes(self, data: DataFrame) -> bytes:
-        with BytesIO() as buffer:
-            data.write_parquet(buffer, use_pyarrow=True)
-            return buffer.getvalue()
+    # The format follows the file suffix, so rewritten files keep their format
+    def __sink_file(self, file_path: str, data: LazyFrame) -> StoredFile:
+        with self.__file_storage.open_write(file_path) as file:
+            if file_path.endswith(FILE_SUFFIXES[DataframeFormat.IPC]):
+                data.sink_ipc(file, engine="streaming")
+            else:
+                data.sink_parquet(file, engine="streaming")
+        return StoredFile(file_path)
+
+    def __write_file(self, file_path: str, data: DataFrame) -> StoredFile:
+        # Serialized straight into the (atomically renamed) file, without building the whole file content in memory
+        with self.__file_storage.open_write(file_path) as file:
+            if file_path.endswith(FILE_SUFFIXES[DataframeFormat.IPC]):
+                data.write_ipc(file, compression="uncompressed")
+            else:
+                data.write_parquet(file, use_pyarrow=True)
+        return StoredFile(file_path)
+
+    def __read_file(self, file_path: str) -> DataFrame:
+        # Read straight from the file (no intermediate bytes/BytesIO copies); IPC files are memory mapped,
+        # so their columns are backed by the page cache instead of the process memory
+        with self.__file_storage.open_read(file_path) as file:
+            if file_path.endswith(FILE_SUFFIXES[DataframeFormat.IPC]):
+                return read_ipc(file, memory_map=True, rechunk=False)
+
+            return read_parquet(file)
+
+    def __scan_file(self, file_path: str) -> LazyFrame:
+        if file_path.endswith(FILE_SUFFIXES[DataframeFormat.IPC]):
+            return scan_ipc(file_path, memory_map=True)
+
+        return scan_parquet(file_path)
+
+    def __find_file_path(self, file_name: str) -> str:
+        for file_format in [self.__file_format, *DataframeFormat]:
+            file_path = self.__generate_file_path(file_name, file_format)
+            if self.__file_storage.exists(file_path):
+                return file_path
+
+        return self.__generate_file_path(file_name, self.__file_format)
+
+    def __list_partition_paths(self, dataset_name: str) -> list[str]:
+        return [
+            file_path
+            for file_path in self.__file_storage.list_files(self.__path + dataset_name, is_recursive=True)
+            if file_path.endswith(tuple(FILE_SUFFIXES.values()))
+        ]
+
+    def __get_partition_directory(self, dataset_name: str, hive_keys: Mapping[str, int] | None) -> str:
+        return "/".join([dataset_name, *(f"{key}={value}" for key, value in (hive_keys or {}).items())])
+
+    def __generate_file_path(self, file_name: str, file_format: DataframeFormat) -> str:
+        for suffix in FILE_SUFFIXES.values():
+            if file_name.endswith(suffix):
+                return self.__path + file_name
+
+        return self.__path + file_name + FILE_SUFFIXES[file_format]
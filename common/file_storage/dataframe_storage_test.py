@@ -1,39 +1,41 @@
+import os
+from contextlib import nullcontext
 from io import BytesIO
+from tempfile import TemporaryDirectory
 from unittest import TestCase
-from unittest.mock import Mock
+from unittest.mock import Mock, patch
 
-from polars import DataFrame
+from polars import DataFrame, col, read_ipc, read_parquet
 
-from common.file_storage.dataframe_storage import ArrowPolarsDataframeStorage
-from common.file_storage.file_storage import FileStorage
+from common.file_storage.dataframe_storage import ArrowPolarsDataframeStorage, DataframeFormat
+from common.file_storage.file_storage import FileStorage, LocalFileStorage
 
 
 class TestArrowPolarsDataframeStorage(TestCase):
     def setUp(self) -> None:
         self.__df = DataFrame({"a": [1, 2, 3]})
         self.__storage_mock = Mock(FileStorage)
+        self.__storage_mock.list_files.return_value = []
         self.__test_path = "/dummy/path/"
         self.__polars_df_storage = ArrowPolarsDataframeStorage(self.__storage_mock, self.__test_path)
 
-    def test_write_calls_file_storage_write(self):
-        self.__storage_mock.write.return_value = "dummy_stored_file"
+    def test_write_streams_dataframe_into_file_storage(self):
+        buffer = BytesIO()
+        self.__storage_mock.open_write.return_value = nullcontext(buffer)
 
         result = self.__polars_df_storage.write("testfile", self.__df)
 
-        self.__storage_mock.write.assert_called_once()
-        call_args, _ = self.__storage_mock.write.call_args
-        self.assertEqual(call_args[0], self.__test_path + "testfile_polars.arrow.gz")
-        self.assertIsInstance(call_args[1], bytes)
-        self.assertGreater(len(call_args[1]), 0)
-
-        self.assertEqual(result, "dummy_stored_file")
+        self.__storage_mock.open_write.assert_called_once_with(self.__test_path + "testfile_polars.arrow.gz")
+        self.__storage_mock.write.assert_not_called()
+        self.assertTrue(read_parquet(BytesIO(buffer.getvalue())).equals(self.__df))
+        self.assertEqual(result.file_uri, self.__test_path + "testfile_polars.arrow.gz")
 
     def test_read_calls_file_storage_read_and_returns_dataframe(self):
         self.__mock_read_return_value()
 
         result_df = self.__polars_df_storage.read("testfile")
 
-        self.__storage_mock.read.assert_called_once_with(self.__test_path + "testfile_polars.arrow.gz")
+        self.__storage_mock.open_read.assert_called_once_with(self.__test_path + "testfile_polars.arrow.gz")
         self.assertTrue(result_df.equals(self.__df))
 
     def test_file_path_handling_when_filename_already_suffixed(self):
@@ -41,11 +43,134 @@ class TestArrowPolarsDataframeStorage(TestCase):
 
         result_df = self.__polars_df_storage.read("file_polars.arrow.gz")
 
-        self.__storage_mock.read.assert_called_once_with(self.__test_path + "file_polars.arrow.gz")
+        self.__storage_mock.open_read.assert_called_once_with(self.__test_path + "file_polars.arrow.gz")
         self.assertTrue(result_df.equals(self.__df))
 
+    def test_sink_streams_lazy_frame_into_file_storage(self):
+        with TemporaryDirectory() as tmp_dir:
+            polars_df_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), tmp_dir + "/nested/")
+
+            result = polars_df_storage.sink("testfile", self.__df.lazy())
+
+            self.assertEqual(result.file_uri, tmp_dir + "/nested/testfile_polars.arrow.gz")
+            self.assertTrue(read_parquet(result.file_uri).equals(self.__df))
+            self.assertEqual(LocalFileStorage().list_files(tmp_dir + "/nested"), [result.file_uri])
+
+    def test_read_concatenates_partitions_of_partitioned_dataset(self):
+        with TemporaryDirectory() as tmp_dir:
+            polars_df_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), tmp_dir + "/")
+            polars_df_storage.sink_partition("dataset", 0, self.__df.lazy())
+            polars_df_storage.sink_partition("dataset", 1, DataFrame({"a": [4, 5]}).lazy())
+
+            result_df = polars_df_storage.read("dataset")
+
+            self.assertEqual(result_df["a"].to_list(), [1, 2, 3, 4, 5])
+
+    def test_clear_partitions_deletes_only_partition_files(self):
+        self.__storage_mock.list_files.return_value = [
+            self.__test_path + "dataset/part-00000_polars.arrow.gz",
+            self.__test_path + "dataset/notes.txt",
+        ]
+
+        self.__polars_df_storage.clear_partitions("dataset")
+
+        self.__storage_mock.list_files.assert_called_once_with(self.__test_path + "dataset", is_recursive=True)
+        self.__storage_mock.delete.assert_called_once_with(self.__test_path + "dataset/part-00000_polars.arrow.gz")
+
+    def test_exists_checks_single_file_and_partitioned_dataset(self):
+        with TemporaryDirectory() as tmp_dir:
+            polars_df_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), tmp_dir + "/")
+            polars_df_storage.write("single", self.__df)
+            polars_df_storage.sink_partition("dataset", 0, self.__df.lazy())
+
+            self.assertTrue(polars_df_storage.exists("single"))
+            self.assertTrue(polars_df_storage.exists("dataset"))
+            self.assertFalse(polars_df_storage.exists("missing"))
+
+    def test_ipc_format_round_trip_is_memory_mapped(self):
+        with TemporaryDirectory() as tmp_dir:
+            polars_df_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), tmp_dir + "/", DataframeFormat.IPC)
+
+            stored_file = polars_df_storage.write("testfile", self.__df)
+            with patch("common.file_storage.dataframe_storage.read_ipc", wraps=read_ipc) as read_ipc_mock:
+                result_df = polars_df_storage.read("testfile")
+
+            self.assertEqual(stored_file.file_uri, tmp_dir + "/testfile_polars.arrow")
+            self.assertTrue(result_df.equals(self.__df))
+            self.assertTrue(read_ipc_mock.call_args.kwargs["memory_map"])
+
+    def test_read_detects_format_of_existing_file(self):
+        with TemporaryDirectory() as tmp_dir:
+            ArrowPolarsDataframeStorage(LocalFileStorage(), tmp_dir + "/", DataframeFormat.IPC).write("ipc_file", self.__df)
+            ArrowPolarsDataframeStorage(LocalFileStorage(), tmp_dir + "/").sink_partition("dataset", 0, self.__df.lazy())
+            polars_df_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), tmp_dir + "/")
+
+            self.assertTrue(polars_df_storage.read("ipc_file").equals(self.__df))
+            self.assertTrue(polars_df_storage.read("dataset").equals(self.__df))
+
+    def test_scan_prunes_hive_partitions_and_read_returns_all_rows(self):
+        with TemporaryDirectory() as tmp_dir:
+            polars_df_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), tmp_dir + "/")
+            polars_df_storage.sink_partition("dataset", 0, self.__df.lazy(), {"year": 2021, "quarter": 4})
+            stored_file = polars_df_storage.sink_partition(
+                "dataset", 0, DataFrame({"a": [4, 5]}).lazy(), {"year": 2022, "quarter": 1}
+            )
+
+            scan_lf = polars_df_storage.scan("dataset").filter(col("year") == 2022).select("a", "quarter")
+
+            self.assertEqual(stored_file.file_uri, tmp_dir + "/dataset/year=2022/quarter=1/part-00000_polars.arrow.gz")
+            self.assertNotIn("year=2021", scan_lf.explain())
+            self.assertEqual(scan_lf.collect().rows(), [(4, 1), (5, 1)])
+            self.assertEqual(polars_df_storage.read("dataset").columns, ["a"])
+            self.assertEqual(polars_df_storage.read("dataset")["a"].to_list(), [1, 2, 3, 4, 5])
+
+    def test_scan_reads_single_file_lazily(self):
+        with TemporaryDirectory() as tmp_dir:
+            for file_format in DataframeFormat:
+                polars_df_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), tmp_dir + "/", file_format)
+                polars_df_storage.write(f"testfile_{file_format}", self.__df)
+
+                self.assertTrue(polars_df_storage.scan(f"testfile_{file_format}").collect().equals(self.__df))
+
+    def test_filter_partitions_rewrites_only_files_with_removed_rows(self):
+        with TemporaryDirectory() as tmp_dir:
+            polars_df_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), tmp_dir + "/")
+            kept_file = polars_df_storage.sink_partition("dataset", 0, DataFrame({"a": [4, 5]}).lazy(), {"year": 2021})
+            filtered_file = polars_df_storage.sink_partition("dataset", 1, self.__df.lazy(), {"year": 2021})
+            other_file = polars_df_storage.sink_partition("dataset", 0, self.__df.lazy(), {"year": 2022})
+            modified_times = {file.file_uri: os.stat(file.file_uri).st_mtime_ns for file in [kept_file, other_file]}
+
+            polars_df_storage.filter_partitions("dataset", col("a") != 2, {"year": 2021})
+
+            self.assertEqual(read_parquet(filtered_file.file_uri)["a"].to_list(), [1, 3])
+            self.assertEqual({path: os.stat(path).st_mtime_ns for path in modified_times}, modified_times)
+
+    def test_clear_partitions_of_hive_partition_keeps_other_partitions(self):
+        with TemporaryDirectory() as tmp_dir:
+            polars_df_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), tmp_dir + "/")
+            polars_df_storage.sink_partition("dataset", 0, DataFrame({"a": [4, 5]}).lazy(), {"year": 2021})
+            polars_df_storage.sink_partition("dataset", 0, self.__df.lazy(), {"year": 2022})
+
+            polars_df_storage.clear_partitions("dataset", {"year": 2021})
+
+            self.assertEqual(polars_df_storage.read("dataset")["a"].to_list(), [1, 2, 3])
+
+    def test_delete_removes_single_file_and_partitioned_dataset(self):
+        with TemporaryDirectory() as tmp_dir:
+            polars_df_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), tmp_dir + "/")
+            polars_df_storage.write("single", self.__df)
+            polars_df_storage.sink_partition("dataset", 0, self.__df.lazy(), {"year": 2021})
+
+            polars_df_storage.delete("single")
+            polars_df_storage.delete("dataset")
+            polars_df_storage.delete("missing")
+
+            self.assertFalse(polars_df_storage.exists("single"))
+            self.assertFalse(polars_df_storage.exists("dataset"))
+
     def __mock_read_return_value(self) -> None:
         with BytesIO() as buf:
             self.__df.write_parquet(buf, use_pyarrow=True)
             parquet_bytes = buf.getvalue()
-        self.__storage_mock.read.return_value = parquet_bytes
+        self.__storage_mock.exists.return_value = True
+        self.__storage_mock.open_read.return_value = BytesIO(parquet_bytes)
@@ -1,6 +1,9 @@
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager, suppress
 from dataclasses import dataclass
-from os import makedirs, path
-from typing import Protocol
+from os import listdir, makedirs, path, remove, replace, walk
+from typing import BinaryIO, Protocol
+from uuid import uuid4
 
 
 @dataclass(frozen=True)
@@ -11,22 +14,72 @@ class StoredFile:
 class FileStorage(Protocol):
     def write(self, file_name: str, content: bytes) -> StoredFile: ...
 
+    def open_write(self, file_name: str) -> AbstractContextManager[BinaryIO]: ...
+
     def read(self, file_name: str) -> bytes: ...
 
+    def open_read(self, file_name: str) -> BinaryIO: ...
+
+    def list_files(self, directory: str, is_recursive: bool = False) -> list[str]: ...
+
+    def delete(self, file_name: str) -> None: ...
+
+    def exists(self, file_name: str) -> bool: ...
+
+    def get_size(self, file_name: str) -> int: ...
+
 
 class LocalFileStorage(FileStorage):
     def write(self, file_name: str, content: bytes) -> StoredFile:
-        if path.sep in file_name:
-            dirs = file_name.split(path.sep)
-            dirs.pop()
-            directory = path.join(*dirs)
-            makedirs(directory, exist_ok=True)
-
-        with open(file_name, "wb") as file:
+        with self.open_write(file_name) as file:
             file.write(content)
 
         return StoredFile(file_name)
 
+    # Writers stream into the yielded file, so the content never has to be held in memory as a whole. It is a temp file
+    # in the target directory, renamed to the target only after the writer succeeds, so an interrupted run never leaves
+    # a truncated file behind (and readers only ever see the previous or the complete new file).
+    @contextmanager
+    def open_write(self, file_name: str) -> Iterator[BinaryIO]:
+        directory = path.dirname(file_name)
+        if directory:
+            makedirs(directory, exist_ok=True)
+
+        tmp_file_name = path.join(directory, f".{path.basename(file_name)}.{uuid4().hex}.tmp")
+        try:
+            with open(tmp_file_name, "xb") as file:
+                yield file
+            replace(tmp_file_name, file_name)
+        except BaseException:
+            # The temp file does not exist when opening it failed, which must not hide the original error
+            with suppress(FileNotFoundError):
+                remove(tmp_file_name)
+            raise
+
     def read(self, file_name: str) -> bytes:
         with open(file_name, "rb") as file:
             return file.read()
+
+    # Readers can consume (or memory map) the file directly instead of copying its whole content into bytes first
+    def open_read(self, file_name: str) -> BinaryIO:
+        return open(file_name, "rb")
+
+    def list_files(self, directory: str, is_recursive: bool = False) -> list[str]:
+        if not path.isdir(directory):
+            return []
+
+        if is_recursive:
+            return sorted(path.join(root, file_name) for root, _, file_names in walk(directory) for file_name in file_names)
+
+        return sorted(
+            path.join(directory, file_name) for file_name in listdir(directory) if path.isfile(path.join(directory, file_name))
+        )
+
+    def delete(self, file_name: str) -> None:
+        remove(file_name)
+
+    def exists(self, file_name: str) -> bool:
+        return path.exists(file_name)
+
+    def get_size(self, file_name: str) -> int:
+        return path.getsize(file_name)
@@ -1,6 +1,7 @@
 import os
 import shutil
 from unittest import TestCase
+from unittest.mock import patch
 
 from common.file_storage.file_storage import LocalFileStorage
 
@@ -25,6 +26,12 @@ class TestLocalFileStorage(TestCase):
         content = self.storage.read(self.test_file)
         self.assertEqual(content, self.test_content)
 
+    def test_open_read_returns_readable_file(self) -> None:
+        self.storage.write(self.test_file, self.test_content)
+
+        with self.storage.open_read(self.test_file) as file:
+            self.assertEqual(file.read(), self.test_content)
+
     def test_write_creates_nested_directories(self) -> None:
         nested_file = "nested/dir/test_file.txt"
         stored_file = self.storage.write(nested_file, self.test_content)
@@ -33,6 +40,72 @@ class TestLocalFileStorage(TestCase):
 
         shutil.rmtree("nested")
 
+    def test_open_write_streams_chunks_into_file(self) -> None:
+        with self.storage.open_write(self.test_file) as file:
+            file.write(b"Hello, ")
+            file.write(b"world!")
+
+        self.assertEqual(self.storage.read(self.test_file), self.test_content)
+
+    def test_interrupted_open_write_keeps_previous_file_and_leaves_no_temp_file(self) -> None:
+        self.storage.write(self.test_file, self.test_content)
+
+        with self.assertRaises(RuntimeError), self.storage.open_write(self.test_file) as file:
+            file.write(b"truncated")
+            raise RuntimeError("interrupted")
+
+        self.assertEqual(self.storage.read(self.test_file), self.test_content)
+        self.assertEqual([file_name for file_name in os.listdir(".") if file_name.endswith(".tmp")], [])
+
+    def test_failing_open_write_raises_original_error(self) -> None:
+        with (
+            patch("builtins.open", side_effect=PermissionError("denied")),
+            self.assertRaises(PermissionError),
+            self.storage.open_write(self.test_file) as file,
+        ):
+            file.write(self.test_content)
+
+        self.assertFalse(os.path.exists(self.test_file))
+
     def test_read_nonexistent_file_raises_error(self) -> None:
         with self.assertRaises(FileNotFoundError):
             self.storage.read("nonexistent.txt")
+
+    def test_list_files_returns_sorted_files_in_directory(self) -> None:
+        self.storage.write("listed/b.txt", self.test_content)
+        self.storage.write("listed/a.txt", self.test_content)
+        self.storage.write("listed/nested/c.txt", self.test_content)
+
+        self.assertEqual(self.storage.list_files("listed"), ["listed/a.txt", "listed/b.txt"])
+
+        shutil.rmtree("listed")
+
+    def test_list_files_recursively_returns_sorted_files_in_subdirectories(self) -> None:
+        self.storage.write("listed/b.txt", self.test_content)
+        self.storage.write("listed/a=1/c.txt", self.test_content)
+
+        self.assertEqual(self.storage.list_files("listed", is_recursive=True), ["listed/a=1/c.txt", "listed/b.txt"])
+
+        shutil.rmtree("listed")
+
+    def test_list_files_of_nonexistent_directory_returns_empty_list(self) -> None:
+        self.assertEqual(self.storage.list_files("nonexistent"), [])
+
+    def test_delete_removes_file(self) -> None:
+        self.storage.write(self.test_file, self.test_content)
+
+        self.storage.delete(self.test_file)
+
+        self.assertFalse(os.path.exists(self.test_file))
+
+    def test_exists_returns_whether_file_exists(self) -> None:
+        self.assertFalse(self.storage.exists(self.test_file))
+
+        self.storage.write(self.test_file, self.test_content)
+
+        self.assertTrue(self.storage.exists(self.test_file))
+
+    def test_get_size_returns_file_size_in_bytes(self) -> None:
+        self.storage.write(self.test_file, self.test_content)
+
+        self.assertEqual(self.storage.get_size(self.test_file), len(self.test_content))
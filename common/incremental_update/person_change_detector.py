@@ -0,0 +1,68 @@
+from enum import StrEnum
+
+from polars import DataFrame, Expr, col, lit, min_horizontal, when
+
+from common.person_period_template_generator.person_period_template_generator import TempColumn
+from common.typings import MAX_TIME_PERIOD_VALUE
+
+
+class PersonChangeColumn(StrEnum):
+    FIRST_CHANGED_INDEX = "first_changed_index"
+    IS_CURRENT = "is_current"
+    IS_PREVIOUS = "is_previous"
+
+
+PREVIOUS_SUFFIX = "_previous"
+DOSE_COLUMNS = [TempColumn.DOSE_1, TempColumn.DOSE_2, TempColumn.DOSE_3, TempColumn.DOSE_4]
+
+
+# Finds the persons whose rows within the previously processed time periods differ between two deliveries. Doses and
+# deaths after those periods do not affect their rows, so they are compared as if they were outside the range (no dose,
+# death at MAX_TIME_PERIOD_VALUE). Each changed person gets the first time period index their rows can differ from.
+class PersonChangeDetector:
+    def detect(self, previous_persons_df: DataFrame, persons_df: DataFrame, num_of_previous_time_periods: int) -> DataFrame:
+        return (
+            self.__clip_to_previous_range(persons_df, num_of_previous_time_periods)
+            .with_columns(lit(True).alias(PersonChangeColumn.IS_CURRENT))
+            .join(
+                self.__clip_to_previous_range(previous_persons_df, num_of_previous_time_periods).with_columns(
+                    lit(True).alias(PersonChangeColumn.IS_PREVIOUS)
+                ),
+                on=TempColumn.PERSON_ID,
+                how="full",
+                coalesce=True,
+                suffix=PREVIOUS_SUFFIX,
+            )
+            .select(TempColumn.PERSON_ID, self.__get_first_changed_index_expr().alias(PersonChangeColumn.FIRST_CHANGED_INDEX))
+            .filter(col(PersonChangeColumn.FIRST_CHANGED_INDEX).is_not_null())
+            .sort(TempColumn.PERSON_ID)
+        )
+
+    def __clip_to_previous_range(self, persons_df: DataFrame, num_of_previous_time_periods: int) -> DataFrame:
+        return persons_df.with_columns(
+            *(when(col(dose) < num_of_previous_time_periods).then(col(dose)).alias(dose) for dose in DOSE_COLUMNS),
+            when(col(TempColumn.DEATH_INDEX) < num_of_previous_time_periods)
+            .then(col(TempColumn.DEATH_INDEX))
+            .otherwise(MAX_TIME_PERIOD_VALUE)
+            .alias(TempColumn.DEATH_INDEX),
+        )
+
+    # Added, removed and re-born persons change from the first period, otherwise the earliest of the changed indices
+    # (a death index of -1 means dead before the range, so it changes the first period as well)
+    def __get_first_changed_index_expr(self) -> Expr:
+        is_in_both = col(PersonChangeColumn.IS_CURRENT).is_not_null() & col(PersonChangeColumn.IS_PREVIOUS).is_not_null()
+        is_birthdate_changed = col(TempColumn.BIRTHDATE).ne_missing(col(f"{TempColumn.BIRTHDATE}{PREVIOUS_SUFFIX}"))
+
+        return (
+            when(~is_in_both | is_birthdate_changed)
+            .then(0)
+            .otherwise(
+                min_horizontal(
+                    when(col(column).ne_missing(col(f"{column}{PREVIOUS_SUFFIX}"))).then(
+                        min_horizontal(col(column), col(f"{column}{PREVIOUS_SUFFIX}"))
+                    )
+                    for column in [*DOSE_COLUMNS, TempColumn.DEATH_INDEX]
+                )
+            )
+            .clip(lower_bound=0)
+        )
@@ -0,0 +1,55 @@
+from unittest import TestCase
+
+from polars import DataFrame
+
+from common.incremental_update.person_change_detector import PersonChangeColumn, PersonChangeDetector
+from common.person_period_template_generator.person_period_template_generator import PersonDfSchema, TempColumn
+from common.typings import MAX_TIME_PERIOD_VALUE
+
+NUM_OF_PREVIOUS_TIME_PERIODS = 10
+
+
+class TestPersonChangeDetector(TestCase):
+    def setUp(self) -> None:
+        self.__previous_persons_df = self.__create_persons_df(
+            [
+                (1, "1950W01", None, MAX_TIME_PERIOD_VALUE),  # unchanged
+                (2, "1950W01", None, MAX_TIME_PERIOD_VALUE),  # dies in a new period
+                (3, "1950W01", 4, MAX_TIME_PERIOD_VALUE),  # late reported death in a previous period
+                (4, "1950W01", None, MAX_TIME_PERIOD_VALUE),  # late reported dose in a previous period
+                (5, "1950W01", None, 2),  # removed
+            ]
+        )
+
+    # - Given the persons of the previous and the new delivery
+    # -- When detecting the changed persons
+    # --- It should return only the persons whose rows within the previous periods differ, with their first changed index
+    def test_detect_changes_within_previous_periods(self) -> None:
+        persons_df = self.__create_persons_df(
+            [
+                (1, "1950W01", None, MAX_TIME_PERIOD_VALUE),
+                (2, "1950W01", 11, 12),
+                (3, "1950W01", 4, 7),
+                (4, "1950W01", 6, MAX_TIME_PERIOD_VALUE),
+                (6, "1960W01", None, MAX_TIME_PERIOD_VALUE),  # added
+            ]
+        )
+
+        result = PersonChangeDetector().detect(self.__previous_persons_df, persons_df, NUM_OF_PREVIOUS_TIME_PERIODS)
+
+        self.assertEqual(result.rows(), [(3, 7), (4, 6), (5, 0), (6, 0)])
+        self.assertEqual(result.columns, [TempColumn.PERSON_ID, PersonChangeColumn.FIRST_CHANGED_INDEX])
+
+    def __create_persons_df(self, rows: list[tuple[int, str, int | None, int]]) -> DataFrame:
+        return DataFrame(
+            {
+                TempColumn.PERSON_ID: [person_id for person_id, _, _, _ in rows],
+                TempColumn.BIRTHDATE: [birthdate for _, birthdate, _, _ in rows],
+                TempColumn.DOSE_1: [dose for _, _, dose, _ in rows],
+                TempColumn.DOSE_2: [None] * len(rows),
+                TempColumn.DOSE_3: [None] * len(rows),
+                TempColumn.DOSE_4: [None] * len(rows),
+                TempColumn.DEATH_INDEX: [death_index for _, _, _, death_index in rows],
+            },
+            schema=PersonDfSchema,
+        )
@@ -1,26 +1,70 @@
-from polars import DataFrame, col
+from collections.abc import Sequence
 
-from common.person_period_template_generator.person_period_template_generator import PersonPeriodDfSchema
+from polars import DataFrame, Enum, Expr, LazyFrame, Schema, UInt8, UInt16, UInt32, col
+from polars import len as polars_len
+
+from common.person_period_template_generator.person_period_template_generator import (
+    CompactPersonPeriodDfSchema,
+    PersonPeriodDfSchema,
+    TempColumn,
+)
 from common.polars_expressions.age_group_expression import AgeGroupExpression
 from common.polars_expressions.death_status_expression import DeathStatusExpression
 from common.polars_expressions.vaccine_status_expression import VaccineStatusExpression
-from common.typings import AgeStatus, NewColumn
+from common.typings import CUBE_DIMENSIONS, AgeStatus, AggregatedColumn, AliveStatus, NewColumn
+
+# Time period labels are replaced by their index, the labels are stored separately
+# (see PersonPeriodTemplateExpander.get_time_periods_df)
+CompactProcessedDfSchema = Schema(
+    {
+        NewColumn.PERSON_ID.value: UInt32,
+        TempColumn.TIME_PERIOD_INDEX.value: UInt16,
+        NewColumn.AGE.value: Enum(AgeStatus),
+        NewColumn.DEATH_STATUS.value: Enum(AliveStatus),
+        NewColumn.VACCINE_STATUS.value: UInt8,
+    }
+)
 
 
 class PersonPeriodTemplateProcessor:
-    def process(self, df: DataFrame, is_using_months: bool = False) -> DataFrame:
-        assert df.schema == PersonPeriodDfSchema
+    def process(self, df: DataFrame, is_using_months: bool = False, is_compact: bool = False) -> DataFrame:
+        return self.process_lazy(df.lazy(), is_using_months, is_compact).collect()
+
+    def process_lazy(self, lf: LazyFrame, is_using_months: bool = False, is_compact: bool = False) -> LazyFrame:
+        assert lf.collect_schema() == (CompactPersonPeriodDfSchema if is_compact else PersonPeriodDfSchema)
+
+        # Dropping the <60 rows is not really necessary, but it saves some RAM :)
+        processed_lf = lf.with_columns(self.get_status_exprs(is_using_months)).filter(col(NewColumn.AGE) != AgeStatus.LESS_THAN_60)
+
+        if is_compact:
+            return processed_lf.select(col(column).cast(dtype) for column, dtype in CompactProcessedDfSchema.items())
 
+        return processed_lf.select(list(NewColumn))
+
+    def get_status_exprs(self, is_using_months: bool = False) -> list[Expr]:
         time_period_amount = 1 if is_using_months else 4
 
+        return [
+            AgeGroupExpression.get_expr().alias(NewColumn.AGE),
+            DeathStatusExpression.get_expr().alias(NewColumn.DEATH_STATUS),
+            VaccineStatusExpression.get_expr(time_period_amount).alias(NewColumn.VACCINE_STATUS),
+        ]
+
+    def aggregate(self, processed_df: DataFrame, extra_dimensions: Sequence[str] = ()) -> DataFrame:
+        return self.aggregate_lazy(processed_df.lazy(), extra_dimensions).collect()
+
+    # Reduces the processed rows to the person-time cube (person_periods per time period, age, vaccine and death status
+    # and any extra dimension). Rows after death carry no person-time, so they are left out (as in IntervalPersonTimeEngine).
+    def aggregate_lazy(self, processed_lf: LazyFrame, extra_dimensions: Sequence[str] = ()) -> LazyFrame:
+        # Compact processed dataframes only have the time period index
+        time_period_column = (
+            NewColumn.TIME_PERIOD if NewColumn.TIME_PERIOD in processed_lf.collect_schema() else TempColumn.TIME_PERIOD_INDEX
+        )
+        dimensions = [time_period_column, *CUBE_DIMENSIONS, *extra_dimensions]
+
         return (
-            df.with_columns(
-                [
-                    AgeGroupExpression.get_expr().alias(NewColumn.AGE),
-                    DeathStatusExpression.get_expr().alias(NewColumn.DEATH_STATUS),
-                    VaccineStatusExpression.get_expr(time_period_amount).alias(NewColumn.VACCINE_STATUS),
-                ]
-            )
-            .filter(col(NewColumn.AGE) != AgeStatus.LESS_THAN_60)  # It's not really necessary, but it saves some RAM :)
-            .select(list(NewColumn))
+            processed_lf.filter(col(NewColumn.DEATH_STATUS) != AliveStatus.AFTER_DEATH)
+            .group_by(dimensions)
+            .agg(polars_len().cast(UInt32).alias(AggregatedColumn.PERSON_PERIODS))
+            .sort(dimensions)
         )
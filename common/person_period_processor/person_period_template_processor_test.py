@@ -1,10 +1,17 @@
 from unittest import TestCase
 
-from polars import DataFrame
+from polars import DataFrame, LazyFrame
 
-from common.person_period_processor.person_period_template_processor import PersonPeriodTemplateProcessor
-from common.person_period_template_generator.person_period_template_generator import PersonPeriodDfSchema, TempColumn
-from common.typings import NewColumn
+from common.person_period_processor.person_period_template_processor import (
+    CompactProcessedDfSchema,
+    PersonPeriodTemplateProcessor,
+)
+from common.person_period_template_generator.person_period_template_generator import (
+    CompactPersonPeriodDfSchema,
+    PersonPeriodDfSchema,
+    TempColumn,
+)
+from common.typings import AggregatedColumn, NewColumn
 
 
 class TestPersonPeriodTemplateProcessor(TestCase):
@@ -24,6 +31,9 @@ class TestPersonPeriodTemplateProcessor(TestCase):
                 TempColumn.DOSE_3: [3, 3],
                 TempColumn.DOSE_4: [4, 4],
                 TempColumn.DEATH_INDEX: [1, 2],
+                TempColumn.AGE_60_INDEX: [3, 3],
+                TempColumn.AGE_70_INDEX: [3, 3],
+                TempColumn.AGE_80_INDEX: [3, 3],
                 TempColumn.TIME_PERIOD: ["2021W01", "2021W02"],
                 TempColumn.TIME_PERIOD_INDEX: [1, 2],
             },
@@ -47,4 +57,126 @@ class TestPersonPeriodTemplateProcessor(TestCase):
         with self.assertRaises(AssertionError):
             self.processor.process(df_invalid)
 
+    # - Given a LazyFrame with the correct schema
+    # -- When calling the process_lazy method
+    # -- It should return a LazyFrame producing the same result as the eager process method
+    def test_process_lazy_should_match_eager_process(self):
+        df = DataFrame(
+            {
+                TempColumn.PERSON_ID: [1, 1],
+                TempColumn.BIRTHDATE: ["1950W01", "1950W01"],
+                TempColumn.DOSE_1: [1, 1],
+                TempColumn.DOSE_2: [None, None],
+                TempColumn.DOSE_3: [None, None],
+                TempColumn.DOSE_4: [None, None],
+                TempColumn.DEATH_INDEX: [2, 2],
+                TempColumn.AGE_60_INDEX: [0, 0],
+                TempColumn.AGE_70_INDEX: [0, 0],
+                TempColumn.AGE_80_INDEX: [3, 3],
+                TempColumn.TIME_PERIOD: ["2021W01", "2021W02"],
+                TempColumn.TIME_PERIOD_INDEX: [1, 2],
+            },
+            schema=PersonPeriodDfSchema,
+        )
+
+        result_lf = self.processor.process_lazy(df.lazy())
+
+        self.assertIsInstance(result_lf, LazyFrame)
+        self.assertTrue(result_lf.collect(engine="streaming").equals(self.processor.process(df)))
+
+    # - Given a LazyFrame with incorrect schema
+    # -- When calling the process_lazy method
+    # -- It should raise an assertion error without executing the query
+    def test_process_lazy_should_raise_assertion_error_for_invalid_schema(self):
+        lf_invalid = LazyFrame({"invalid_column": [1, 2, 3]})
+
+        with self.assertRaises(AssertionError):
+            self.processor.process_lazy(lf_invalid)
+
+    # - Given a template DataFrame with the compact schema
+    # -- When calling the process method with is_compact set to True
+    # -- It should return the compact schema with the same values as the default processing
+    def test_process_compact_should_return_compact_schema_with_same_values(self):
+        df = DataFrame(
+            {
+                TempColumn.PERSON_ID: [1, 1, 1],
+                TempColumn.BIRTHDATE: ["1950W01", "1950W01", "1950W01"],
+                TempColumn.DOSE_1: [1, 1, 1],
+                TempColumn.DOSE_2: [None, None, None],
+                TempColumn.DOSE_3: [None, None, None],
+                TempColumn.DOSE_4: [None, None, None],
+                TempColumn.DEATH_INDEX: [2, 2, 2],
+                TempColumn.AGE_60_INDEX: [0, 0, 0],
+                TempColumn.AGE_70_INDEX: [0, 0, 0],
+                TempColumn.AGE_80_INDEX: [4, 4, 4],
+                TempColumn.TIME_PERIOD: ["2021W01", "2021W02", "2021W03"],
+                TempColumn.TIME_PERIOD_INDEX: [1, 2, 3],
+            },
+            schema=PersonPeriodDfSchema,
+        )
+
+        result_df = self.processor.process(df.cast(CompactPersonPeriodDfSchema), is_compact=True)
+        expected_df = self.processor.process(df)
+
+        self.assertEqual(result_df.schema, CompactProcessedDfSchema)
+        self.assertEqual(result_df[TempColumn.TIME_PERIOD_INDEX].to_list(), [1, 2, 3])
+        for column in [NewColumn.AGE, NewColumn.DEATH_STATUS, NewColumn.VACCINE_STATUS]:
+            self.assertEqual(result_df[column].to_list(), expected_df[column].to_list())
+
+    # - Given a template DataFrame with the default schema
+    # -- When calling the process method with is_compact set to True
+    # -- It should raise an assertion error due to schema mismatch
+    def test_process_compact_should_raise_assertion_error_for_default_schema(self):
+        df = DataFrame(schema=PersonPeriodDfSchema)
+
+        with self.assertRaises(AssertionError):
+            self.processor.process(df, is_compact=True)
+
+    # - Given a processed DataFrame
+    # -- When calling the aggregate method with an extra dimension
+    # --- It should count the person-periods per time period and dimensions and leave out the rows after death
+    def test_aggregate_should_count_person_periods_per_dimensions(self):
+        processed_df = DataFrame(
+            {
+                NewColumn.PERSON_ID: [1, 2, 3, 1, 2],
+                NewColumn.TIME_PERIOD: ["2021W01", "2021W01", "2021W01", "2021W02", "2021W02"],
+                NewColumn.AGE: ["60-69", "60-69", "80+", "60-69", "60-69"],
+                NewColumn.DEATH_STATUS: ["alive", "alive", "alive", "died_now", "after_death"],
+                NewColumn.VACCINE_STATUS: [0, 0, 11, 0, 0],
+                "gender": ["Z", "M", "Z", "Z", "M"],
+            }
+        )
+
+        result_df = self.processor.aggregate(processed_df, extra_dimensions=["gender"])
+
+        self.assertEqual(
+            result_df.rows(),
+            [
+                ("2021W01", "60-69", 0, "alive", "M", 1),
+                ("2021W01", "60-69", 0, "alive", "Z", 1),
+                ("2021W01", "80+", 11, "alive", "Z", 1),
+                ("2021W02", "60-69", 0, "died_now", "Z", 1),
+            ],
+        )
+        self.assertEqual(result_df.columns[-1], AggregatedColumn.PERSON_PERIODS)
+
+    # - Given a processed DataFrame with the compact schema
+    # -- When calling the aggregate method
+    # --- It should aggregate by the time period index
+    def test_aggregate_compact_should_use_time_period_index(self):
+        processed_df = DataFrame(
+            {
+                NewColumn.PERSON_ID: [1, 2],
+                TempColumn.TIME_PERIOD_INDEX: [3, 3],
+                NewColumn.AGE: ["70-79", "70-79"],
+                NewColumn.DEATH_STATUS: ["alive", "alive"],
+                NewColumn.VACCINE_STATUS: [21, 21],
+            },
+            schema=CompactProcessedDfSchema,
+        )
+
+        result_df = self.processor.aggregate(processed_df)
+
+        self.assertEqual(result_df.rows(), [(3, "70-79", 21, "alive", 2)])
+
     # Add tests for checking needed expression calls and col selection
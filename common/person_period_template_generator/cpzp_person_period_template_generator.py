@@ -1,9 +1,13 @@
 from datetime import datetime
 from enum import StrEnum
 
-from polars import DataFrame, Expr, Int64, Schema, Utf8, col, when
+from polars import DataFrame, Expr, Int64, LazyFrame, Schema, Utf8, col, when
 
-from common.person_period_template_generator.person_period_template_generator import PersonPeriodTemplateGenerator, TempColumn
+from common.person_period_template_generator.person_period_template_generator import (
+    PersonPeriodTemplateExpander,
+    PersonPeriodTemplateGenerator,
+    TempColumn,
+)
 from common.time_period.time_period_helper import TimePeriodHelper
 from common.typings import MAX_TIME_PERIOD_VALUE
 
@@ -42,26 +46,54 @@ CpzpBaseDfSchema = Schema(
     }
 )
 
+# Columns the generator actually reads (ISO week labels, so they stay Utf8), the rest of the CSV does not have to be loaded
+CpzpUsedDfSchema = Schema(
+    {
+        column.value: CpzpBaseDfSchema[column]
+        for column in [
+            CpzpBaseColumn.BIRTHDATE,
+            CpzpBaseColumn.VACCINE_1_DATE,
+            CpzpBaseColumn.VACCINE_2_DATE,
+            CpzpBaseColumn.VACCINE_3_DATE,
+            CpzpBaseColumn.VACCINE_4_DATE,
+            CpzpBaseColumn.DEATHDATE,
+        ]
+    }
+)
+
 
 class CpzpPersonPeriodTemplateGenerator(PersonPeriodTemplateGenerator):
     def __init__(self, start_date: datetime, end_date: datetime) -> None:
         self.weeks = TimePeriodHelper.get_weeks_in_range(start_date, end_date)
         self.week_indices = {week: i for i, week in enumerate(self.weeks)}
 
-    def generate(self, base_df: DataFrame) -> DataFrame:
-        self.__assert_schema_matches_cpzp(base_df)
+    @property
+    def time_periods(self) -> list[str]:
+        return self.weeks
+
+    def generate(self, base_df: DataFrame, is_compact: bool = False, is_eligible_only: bool = False) -> DataFrame:
+        return self.generate_lazy(base_df.lazy(), is_compact, is_eligible_only).collect()
+
+    def generate_lazy(self, base_lf: LazyFrame, is_compact: bool = False, is_eligible_only: bool = False) -> LazyFrame:
+        return PersonPeriodTemplateExpander.expand_lazy(
+            self.generate_persons_lazy(base_lf), self.weeks, is_compact, is_eligible_only
+        )
+
+    def generate_persons(self, base_df: DataFrame) -> DataFrame:
+        return self.generate_persons_lazy(base_df.lazy()).collect()
+
+    def generate_persons_lazy(self, base_lf: LazyFrame) -> LazyFrame:
+        self.__assert_schema_matches_cpzp(base_lf)
 
-        persons_df = (
-            base_df.with_row_index(TempColumn.PERSON_ID, offset=1)
+        return (
+            base_lf.with_row_index(TempColumn.PERSON_ID, offset=1)
             .with_columns(
                 [
                     self.__map_iso_week_to_week_index(CpzpBaseColumn.VACCINE_1_DATE).alias(TempColumn.DOSE_1),
                     self.__map_iso_week_to_week_index(CpzpBaseColumn.VACCINE_2_DATE).alias(TempColumn.DOSE_2),
                     self.__map_iso_week_to_week_index(CpzpBaseColumn.VACCINE_3_DATE).alias(TempColumn.DOSE_3),
                     self.__map_iso_week_to_week_index(CpzpBaseColumn.VACCINE_4_DATE).alias(TempColumn.DOSE_4),
-                    col(CpzpBaseColumn.DEATHDATE)
-                    .map_elements(self.__compute_death_index, return_dtype=Int64)
-                    .alias(TempColumn.DEATH_INDEX),
+                    self.get_death_index_expr().alias(TempColumn.DEATH_INDEX),
                 ]
             )
             .select(
@@ -75,15 +107,6 @@ class CpzpPersonPeriodTemplateGenerator(PersonPeriodTemplateGenerator):
             )
         )
 
-        weeks_df = DataFrame(
-            {
-                TempColumn.TIME_PERIOD: self.weeks,
-                TempColumn.TIME_PERIOD_INDEX: list(range(len(self.weeks))),
-            }
-        )
-
-        return persons_df.join(weeks_df, how="cross")
-
     def __map_iso_week_to_week_index(self, col_name: str) -> Expr:
         return (
             when(col(col_name).str.strip_chars().is_in(["", " "]))
@@ -93,21 +116,26 @@ class CpzpPersonPeriodTemplateGenerator(PersonPeriodTemplateGenerator):
             .cast(Int64, strict=False)
         )
 
-    def __compute_death_index(self, death_week: str) -> int:
-        if not death_week or death_week.strip() in {"", " "}:
-            return MAX_TIME_PERIOD_VALUE
-
-        current_year = int(death_week[:4])
+    # Death week -> week index: -1 before the range, MAX_TIME_PERIOD_VALUE after it or when empty, lookup otherwise
+    def get_death_index_expr(self) -> Expr:
+        death_week = col(CpzpBaseColumn.DEATHDATE)
+        death_year = death_week.str.slice(0, 4).cast(Int64, strict=False)
         min_year = int(self.weeks[0][:4])
         max_year = int(self.weeks[-1][:4])
 
-        if current_year < min_year:
-            return -1
-
-        if current_year > max_year:
-            return MAX_TIME_PERIOD_VALUE
-
-        return self.week_indices.get(death_week, -1)
+        return (
+            when(death_week.is_null() | (death_week.str.strip_chars() == ""))
+            .then(MAX_TIME_PERIOD_VALUE)
+            .when(death_year < min_year)
+            .then(-1)
+            .when(death_year > max_year)
+            .then(MAX_TIME_PERIOD_VALUE)
+            .otherwise(death_week.replace_strict(self.week_indices, default=-1, return_dtype=Int64))
+            .cast(Int64)
+        )
 
-    def __assert_schema_matches_cpzp(self, df: DataFrame) -> None:
-        assert df.schema == CpzpBaseDfSchema, "CPZP dataframe does not follow the expected CPZP schema"
+    def __assert_schema_matches_cpzp(self, lf: LazyFrame) -> None:
+        schema = lf.collect_schema()
+        assert all(schema.get(column) == dtype for column, dtype in CpzpUsedDfSchema.items()), (
+            "CPZP dataframe does not follow the expected CPZP schema"
+        )
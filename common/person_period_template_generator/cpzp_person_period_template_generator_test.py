@@ -7,8 +7,13 @@ from polars import DataFrame, Series, col
 from common.person_period_template_generator.cpzp_person_period_template_generator import (
     CpzpBaseColumn,
     CpzpPersonPeriodTemplateGenerator,
+    CpzpUsedDfSchema,
+)
+from common.person_period_template_generator.person_period_template_generator import (
+    CompactPersonPeriodDfSchema,
+    PersonPeriodDfSchema,
+    TempColumn,
 )
-from common.person_period_template_generator.person_period_template_generator import PersonPeriodDfSchema
 from common.typings import MAX_TIME_PERIOD_VALUE, NewColumn
 
 
@@ -39,6 +44,17 @@ class TestCpzpPersonPeriodTemplateGenerator(TestCase):
 
         self.assertEqual(PersonPeriodDfSchema, result.schema)
 
+    # - When generating the compact template from a base DataFrame
+    # -- It should return a DataFrame with the compact schema
+    def test_generate_compact_structure(self) -> None:
+        base_df = self.__create_base_df({CpzpBaseColumn.DEATHDATE: ["2021W20"], CpzpBaseColumn.VACCINE_1_DATE: ["2021W10"]})
+        generator = CpzpPersonPeriodTemplateGenerator(self.__from_date, self.__to_date)
+
+        result = generator.generate(base_df, is_compact=True)
+
+        self.assertEqual(CompactPersonPeriodDfSchema, result.schema)
+        self.assertTrue(result.equals(generator.generate(base_df).cast(CompactPersonPeriodDfSchema)))
+
     # - When generating the template from a base DataFrame
     # -- It should produce a cross join with the correct number of rows
     def test_row_count(self) -> None:
@@ -134,6 +150,67 @@ class TestCpzpPersonPeriodTemplateGenerator(TestCase):
         )
         self.assertTrue(all(val == MAX_TIME_PERIOD_VALUE for val in person_death_indices))
 
+    # - When generating the persons from a base DataFrame
+    # -- And the death week is missing (null) or unknown within the requested years
+    # --- It should set the death index to maximum value for missing and -1 for unknown weeks
+    def test_death_index_missing_and_unknown_week(self) -> None:
+        base_df = self.__create_base_df({CpzpBaseColumn.DEATHDATE: [None, "2021W99"]})  # type: ignore[list-item]
+        generator = CpzpPersonPeriodTemplateGenerator(self.__from_date, self.__to_date)
+
+        result_df = generator.generate_persons(base_df)
+
+        self.assertEqual(result_df[TempColumn.DEATH_INDEX].to_list(), [MAX_TIME_PERIOD_VALUE, -1])
+
+    # - Given a base DataFrame with only the columns used by the generator (see CachedCsvLoader)
+    # -- When generating the persons
+    # --- It should accept it and return the same persons as for the full CPZP schema
+    def test_generate_persons_from_used_columns_only(self) -> None:
+        base_df = self.__create_base_df({CpzpBaseColumn.DEATHDATE: ["2021W20"], CpzpBaseColumn.VACCINE_1_DATE: ["2021W10"]})
+        generator = CpzpPersonPeriodTemplateGenerator(self.__from_date, self.__to_date)
+
+        result_df = generator.generate_persons(base_df.select(list(CpzpUsedDfSchema)))
+
+        self.assertTrue(result_df.equals(generator.generate_persons(base_df)))
+
+    # - When generating the template lazily from a base LazyFrame
+    # -- It should produce the same template as the eager generate method
+    def test_generate_lazy_matches_generate(self) -> None:
+        base_df = self.__create_base_df(num_of_rows=3)
+        generator = CpzpPersonPeriodTemplateGenerator(self.__from_date, self.__to_date)
+
+        result = generator.generate_lazy(base_df.lazy()).collect(engine="streaming")
+
+        sort_columns = [TempColumn.PERSON_ID, TempColumn.TIME_PERIOD_INDEX]
+        self.assertTrue(result.sort(sort_columns).equals(generator.generate(base_df).sort(sort_columns)))
+
+    # - Given persons turning 60 within the time span, older ones, younger ones and ones who died before it
+    # -- When generating the eligible template only
+    # --- It should emit each person's time periods from turning 60 through death, with the same columns as the full template
+    def test_generate_eligible_only(self) -> None:
+        base_df = self.__create_base_df(
+            {
+                CpzpBaseColumn.BIRTHDATE: ["1961W30", "1950W01", "1970W01", "1940W01"],
+                CpzpBaseColumn.DEATHDATE: ["2022W10", "", "", "2020W10"],
+            }
+        )
+        generator = CpzpPersonPeriodTemplateGenerator(self.__from_date, self.__to_date)
+
+        for is_compact in [False, True]:
+            with self.subTest(is_compact=is_compact):
+                result = generator.generate(base_df, is_compact, is_eligible_only=True).sort(
+                    TempColumn.PERSON_ID, TempColumn.TIME_PERIOD_INDEX
+                )
+
+                self.assertEqual(result.schema, generator.generate(base_df, is_compact).schema)
+                self.assertEqual(
+                    [self.__get_column_for_person(result, person_id, TempColumn.TIME_PERIOD).to_list() for person_id in [1, 2]],
+                    [
+                        generator.weeks[generator.week_indices["2021W30"] : generator.week_indices["2022W10"] + 1],
+                        generator.weeks,
+                    ],
+                )
+                self.assertEqual(result[TempColumn.PERSON_ID].unique().sort().to_list(), [1, 2])
+
     def __get_column_for_person(self, df: DataFrame, person_id: int, col_name: str) -> Series:
         return df.filter(col(NewColumn.PERSON_ID) == person_id).select(col_name).to_series()
 
@@ -149,6 +226,8 @@ class TestCpzpPersonPeriodTemplateGenerator(TestCase):
             num_of_rows = max(len(v) for v in overrides.values())
 
         base_data = {col.value: [""] * num_of_rows for col in CpzpBaseColumn}
+        # The age transition indices of the template are computed from the birthdate, so it has to be valid
+        base_data[CpzpBaseColumn.BIRTHDATE] = ["1950W01"] * num_of_rows
 
         for key, values in overrides.items():
             base_data[key.value] = values
@@ -1,9 +1,13 @@
 from datetime import datetime
 from enum import StrEnum
 
-from polars import DataFrame, Expr, Int64, Schema, Utf8, col, when
+from polars import DataFrame, Expr, Int64, LazyFrame, Schema, Utf8, col, concat_str, lit, when
 
-from common.person_period_template_generator.person_period_template_generator import PersonPeriodTemplateGenerator, TempColumn
+from common.person_period_template_generator.person_period_template_generator import (
+    PersonPeriodTemplateExpander,
+    PersonPeriodTemplateGenerator,
+    TempColumn,
+)
 from common.time_period.time_period_helper import TimePeriodHelper
 from common.typings import MAX_TIME_PERIOD_VALUE
 
@@ -65,15 +69,36 @@ OzpBaseDfSchema = Schema(
         OzpBaseColumn.VACCINE_4_CODE.value: Int64,
         OzpBaseColumn.VACCINE_4_YEAR.value: Int64,
         OzpBaseColumn.VACCINE_4_MONTH.value: Int64,
-        OzpBaseColumn.VACCINE_5_CODE.value: Utf8,
-        OzpBaseColumn.VACCINE_5_YEAR.value: Utf8,
-        OzpBaseColumn.VACCINE_5_MONTH.value: Utf8,
-        OzpBaseColumn.VACCINE_6_CODE.value: Utf8,
-        OzpBaseColumn.VACCINE_6_YEAR.value: Utf8,
-        OzpBaseColumn.VACCINE_6_MONTH.value: Utf8,
-        OzpBaseColumn.VACCINE_7_CODE.value: Utf8,
-        OzpBaseColumn.VACCINE_7_YEAR.value: Utf8,
-        OzpBaseColumn.VACCINE_7_MONTH.value: Utf8,
+        OzpBaseColumn.VACCINE_5_CODE.value: Int64,
+        OzpBaseColumn.VACCINE_5_YEAR.value: Int64,
+        OzpBaseColumn.VACCINE_5_MONTH.value: Int64,
+        OzpBaseColumn.VACCINE_6_CODE.value: Int64,
+        OzpBaseColumn.VACCINE_6_YEAR.value: Int64,
+        OzpBaseColumn.VACCINE_6_MONTH.value: Int64,
+        OzpBaseColumn.VACCINE_7_CODE.value: Int64,
+        OzpBaseColumn.VACCINE_7_YEAR.value: Int64,
+        OzpBaseColumn.VACCINE_7_MONTH.value: Int64,
+    }
+)
+
+# Columns the generator actually reads, the rest of the CSV does not have to be loaded
+OzpUsedDfSchema = Schema(
+    {
+        column.value: OzpBaseDfSchema[column]
+        for column in [
+            OzpBaseColumn.BIRTH_YEAR,
+            OzpBaseColumn.BIRTH_MONTH,
+            OzpBaseColumn.DEATH_YEAR,
+            OzpBaseColumn.DEATH_MONTH,
+            OzpBaseColumn.VACCINE_1_YEAR,
+            OzpBaseColumn.VACCINE_1_MONTH,
+            OzpBaseColumn.VACCINE_2_YEAR,
+            OzpBaseColumn.VACCINE_2_MONTH,
+            OzpBaseColumn.VACCINE_3_YEAR,
+            OzpBaseColumn.VACCINE_3_MONTH,
+            OzpBaseColumn.VACCINE_4_YEAR,
+            OzpBaseColumn.VACCINE_4_MONTH,
+        ]
     }
 )
 
@@ -82,36 +107,39 @@ class OzpPersonPeriodTemplateGenerator(PersonPeriodTemplateGenerator):
     def __init__(self, start_date: datetime, end_date: datetime) -> None:
         self.months = TimePeriodHelper.get_months_in_range(start_date, end_date)
         self.month_indices = {month: i for i, month in enumerate(self.months)}
+        # Months are labeled as YYYYMmm
+        self.start_year = int(self.months[0][:4])
+        self.start_month = int(self.months[0][5:7])
+
+    @property
+    def time_periods(self) -> list[str]:
+        return self.months
+
+    def generate(self, base_df: DataFrame, is_compact: bool = False, is_eligible_only: bool = False) -> DataFrame:
+        return self.generate_lazy(base_df.lazy(), is_compact, is_eligible_only).collect()
+
+    def generate_lazy(self, base_lf: LazyFrame, is_compact: bool = False, is_eligible_only: bool = False) -> LazyFrame:
+        return PersonPeriodTemplateExpander.expand_lazy(
+            self.generate_persons_lazy(base_lf), self.months, is_compact, is_eligible_only
+        )
+
+    def generate_persons(self, base_df: DataFrame) -> DataFrame:
+        return self.generate_persons_lazy(base_df.lazy()).collect()
 
-    def generate(self, base_df: DataFrame) -> DataFrame:
-        self.__assert_schema_matches_ozp(base_df)
+    def generate_persons_lazy(self, base_lf: LazyFrame) -> LazyFrame:
+        self.__assert_schema_matches_ozp(base_lf)
 
-        persons_df = (
-            base_df.with_row_index(TempColumn.PERSON_ID, offset=1)
+        return (
+            base_lf.with_row_index(TempColumn.PERSON_ID, offset=1)
             .with_columns(
                 [
                     # Compute Vaccine doses indexes
-                    self.__map_iso_month_to_month_index(OzpBaseColumn.VACCINE_1_YEAR, OzpBaseColumn.VACCINE_1_MONTH).alias(
-                        TempColumn.DOSE_1
-                    ),
-                    self.__map_iso_month_to_month_index(OzpBaseColumn.VACCINE_2_YEAR, OzpBaseColumn.VACCINE_2_MONTH).alias(
-                        TempColumn.DOSE_2
-                    ),
-                    self.__map_iso_month_to_month_index(OzpBaseColumn.VACCINE_3_YEAR, OzpBaseColumn.VACCINE_3_MONTH).alias(
-                        TempColumn.DOSE_3
-                    ),
-                    self.__map_iso_month_to_month_index(OzpBaseColumn.VACCINE_4_YEAR, OzpBaseColumn.VACCINE_4_MONTH).alias(
-                        TempColumn.DOSE_4
-                    ),
+                    self.__get_month_index(OzpBaseColumn.VACCINE_1_YEAR, OzpBaseColumn.VACCINE_1_MONTH).alias(TempColumn.DOSE_1),
+                    self.__get_month_index(OzpBaseColumn.VACCINE_2_YEAR, OzpBaseColumn.VACCINE_2_MONTH).alias(TempColumn.DOSE_2),
+                    self.__get_month_index(OzpBaseColumn.VACCINE_3_YEAR, OzpBaseColumn.VACCINE_3_MONTH).alias(TempColumn.DOSE_3),
+                    self.__get_month_index(OzpBaseColumn.VACCINE_4_YEAR, OzpBaseColumn.VACCINE_4_MONTH).alias(TempColumn.DOSE_4),
                     # Compute death indexes
-                    when((col(OzpBaseColumn.DEATH_YEAR).is_null()) | (col(OzpBaseColumn.DEATH_MONTH).is_null()))
-                    .then(MAX_TIME_PERIOD_VALUE)
-                    .otherwise(
-                        self.__join_year_and_month(OzpBaseColumn.DEATH_YEAR, OzpBaseColumn.DEATH_MONTH).map_elements(
-                            self.__compute_death_index, return_dtype=Int64
-                        )
-                    )
-                    .alias(TempColumn.DEATH_INDEX),
+                    self.get_death_index_expr().alias(TempColumn.DEATH_INDEX),
                     # Compute birthdate
                     self.__join_year_and_month(OzpBaseColumn.BIRTH_YEAR, OzpBaseColumn.BIRTH_MONTH).alias(TempColumn.BIRTHDATE),
                 ]
@@ -127,42 +155,39 @@ class OzpPersonPeriodTemplateGenerator(PersonPeriodTemplateGenerator):
             )
         )
 
-        weeks_df = DataFrame(
-            {
-                TempColumn.TIME_PERIOD: self.months,
-                TempColumn.TIME_PERIOD_INDEX: list(range(len(self.months))),
-            }
-        )
-
-        return persons_df.join(weeks_df, how="cross")
+    # (year, month) -> month index computed directly, null when missing or outside of the requested months
+    def __get_month_index(self, year_col: str, month_col: str) -> Expr:
+        month_index = (col(year_col) - self.start_year) * 12 + col(month_col) - self.start_month
 
-    def __map_iso_month_to_month_index(self, year_col: str, month_col: str) -> Expr:
         return (
-            when((col(year_col).is_null()) | (col(month_col).is_null()))
-            .then(None)
-            .otherwise(self.__join_year_and_month(year_col, month_col))
-            .replace(self.month_indices)
-            .cast(Int64, strict=False)
+            when(col(month_col).is_between(1, 12) & month_index.is_between(0, len(self.months) - 1))
+            .then(month_index)
+            .otherwise(None)
+            .cast(Int64)
         )
 
-    def __compute_death_index(self, death_week: str) -> int:
-        if not death_week or death_week.strip() in {"", " "}:
-            return MAX_TIME_PERIOD_VALUE
-
-        current_year = int(death_week[:4])
+    # Death month -> month index: -1 before the range, MAX_TIME_PERIOD_VALUE after it or when empty, lookup otherwise
+    def get_death_index_expr(self) -> Expr:
+        death_year = col(OzpBaseColumn.DEATH_YEAR)
         min_year = int(self.months[0][:4])
         max_year = int(self.months[-1][:4])
 
-        if current_year < min_year:
-            return -1
-
-        if current_year > max_year:
-            return MAX_TIME_PERIOD_VALUE
-
-        return self.month_indices.get(death_week, -1)
+        return (
+            when(death_year.is_null() | col(OzpBaseColumn.DEATH_MONTH).is_null())
+            .then(MAX_TIME_PERIOD_VALUE)
+            .when(death_year < min_year)
+            .then(-1)
+            .when(death_year > max_year)
+            .then(MAX_TIME_PERIOD_VALUE)
+            .otherwise(self.__get_month_index(OzpBaseColumn.DEATH_YEAR, OzpBaseColumn.DEATH_MONTH).fill_null(-1))
+            .cast(Int64)
+        )
 
     def __join_year_and_month(self, year_col: str, month_col: str) -> Expr:
-        return col(year_col).cast(Utf8) + col(month_col).map_elements(lambda x: f"M{str(x).zfill(2)}", return_dtype=Utf8)
+        return concat_str(col(year_col).cast(Utf8), lit("M"), col(month_col).cast(Utf8).str.zfill(2))
 
-    def __assert_schema_matches_ozp(self, df: DataFrame) -> None:
-        assert df.schema == OzpBaseDfSchema, "OZP dataframe does not follow the expected OZP schema"
+    def __assert_schema_matches_ozp(self, lf: LazyFrame) -> None:
+        schema = lf.collect_schema()
+        assert all(schema.get(column) == dtype for column, dtype in OzpUsedDfSchema.items()), (
+            "OZP dataframe does not follow the expected OZP schema"
+        )
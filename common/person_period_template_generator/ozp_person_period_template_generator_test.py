@@ -1,7 +1,7 @@
 from datetime import datetime
 from unittest import TestCase
 
-from polars import DataFrame, Series, Utf8, col
+from polars import DataFrame, Series, col
 
 from common.person_period_template_generator.ozp_person_period_template_generator import (
     OzpBaseColumn,
@@ -67,6 +67,30 @@ class TestOzpPersonPeriodTemplateGenerator(TestCase):
             )
             self.assertTrue(all(val == expected_index for val in dose_series))
 
+    # - When generating the persons for a time span not starting in January
+    # -- It should compute the dose indices relative to the first month and leave months outside of the span empty
+    def test_dose_conversion_outside_of_time_span(self):
+        generator = OzpPersonPeriodTemplateGenerator(datetime(2021, 6, 1), datetime(2022, 3, 31))
+        base_df = self.__create_base_df(
+            {
+                OzpBaseColumn.VACCINE_1_YEAR: [2021, 2021, 2022, 2022],
+                OzpBaseColumn.VACCINE_1_MONTH: [5, 7, 3, 4],
+            }
+        )
+
+        result_df = generator.generate_persons(base_df)
+
+        self.assertEqual(result_df[TempColumn.DOSE_1].to_list(), [None, 1, 9, None])
+
+    # - When generating the persons from a base DataFrame
+    # -- It should build the birthdate label as YYYYMmm
+    def test_birthdate_label(self):
+        base_df = self.__create_base_df({OzpBaseColumn.BIRTH_YEAR: [1950, 1961], OzpBaseColumn.BIRTH_MONTH: [3, 11]})
+
+        result_df = self.__generator.generate_persons(base_df)
+
+        self.assertEqual(result_df[TempColumn.BIRTHDATE].to_list(), ["1950M03", "1961M11"])
+
     # - When generating the template from a base DataFrame
     # -- It should correctly convert the death month to a numeric index (death_index)
     def test_death_index_conversion(self):
@@ -119,6 +143,27 @@ class TestOzpPersonPeriodTemplateGenerator(TestCase):
         )
         self.assertTrue(all(val == MAX_TIME_PERIOD_VALUE for val in person_death_indices))
 
+    # - When generating the persons from a base DataFrame
+    # -- And the death month is only partially set or unknown within the requested years
+    # --- It should set the death index to maximum value for partial and -1 for unknown months
+    def test_death_index_partial_and_unknown_month(self):
+        base_df = self.__create_base_df({OzpBaseColumn.DEATH_YEAR: [2021, None], OzpBaseColumn.DEATH_MONTH: [13, 5]})
+
+        result_df = self.__generator.generate_persons(base_df)
+
+        self.assertEqual(result_df[TempColumn.DEATH_INDEX].to_list(), [-1, MAX_TIME_PERIOD_VALUE])
+
+    # - When generating the template lazily from a base LazyFrame
+    # -- It should produce the same template as the eager generate method
+    def test_generate_lazy_matches_generate(self) -> None:
+        base_df = self.__create_base_df(num_of_rows=3)
+        generator = self.__generator
+
+        result = generator.generate_lazy(base_df.lazy()).collect(engine="streaming")
+
+        sort_columns = [TempColumn.PERSON_ID, TempColumn.TIME_PERIOD_INDEX]
+        self.assertTrue(result.sort(sort_columns).equals(generator.generate(base_df).sort(sort_columns)))
+
     def __get_column_for_person(self, df: DataFrame, person_id: int, col_name: str) -> Series:
         return df.filter(col(TempColumn.PERSON_ID) == person_id).select(col_name).to_series()
 
@@ -133,7 +178,7 @@ class TestOzpPersonPeriodTemplateGenerator(TestCase):
         if overrides:
             num_of_rows = max(len(v) for v in overrides.values())
 
-        base_data = {col: ["" if dtype == Utf8 else None] * num_of_rows for col, dtype in OzpBaseDfSchema.items()}
+        base_data = {col: [None] * num_of_rows for col in OzpBaseDfSchema}
 
         for key, values in overrides.items():
             base_data[key.value] = values
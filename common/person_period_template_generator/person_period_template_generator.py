@@ -1,7 +1,8 @@
+from collections.abc import Sequence
 from enum import StrEnum
 from typing import Protocol
 
-from polars import DataFrame, Int64, Schema, UInt32, Utf8
+from polars import DataFrame, Expr, Int16, Int64, LazyFrame, Schema, Series, UInt16, UInt32, Utf8, col, int_ranges, lit
 
 
 class TempColumn(StrEnum):
@@ -14,9 +15,16 @@ class TempColumn(StrEnum):
     DOSE_4 = "dose4"
     DEATH_INDEX = "death_index"
     BIRTHDATE = "tyden_narozeni"
+    # Index of the first time period in which the person is at least 60/70/80 years old (see get_age_transition_exprs)
+    AGE_60_INDEX = "age_60_index"
+    AGE_70_INDEX = "age_70_index"
+    AGE_80_INDEX = "age_80_index"
 
 
-PersonPeriodDfSchema = Schema(
+AGE_TRANSITIONS = {TempColumn.AGE_60_INDEX: 60, TempColumn.AGE_70_INDEX: 70, TempColumn.AGE_80_INDEX: 80}
+
+
+PersonDfSchema = Schema(
     {
         TempColumn.PERSON_ID.value: UInt32,
         TempColumn.BIRTHDATE.value: Utf8,
@@ -25,13 +33,129 @@ PersonPeriodDfSchema = Schema(
         TempColumn.DOSE_3.value: Int64,
         TempColumn.DOSE_4.value: Int64,
         TempColumn.DEATH_INDEX.value: Int64,
+    }
+)
+
+PersonPeriodDfSchema = Schema(
+    {
+        **PersonDfSchema,
+        **{column.value: Int64 for column in AGE_TRANSITIONS},
         TempColumn.TIME_PERIOD.value: Utf8,
         TempColumn.TIME_PERIOD_INDEX.value: Int64,
     }
 )
 
+# Same columns with the smallest dtypes that fit (indices are < MAX_TIME_PERIOD_VALUE)
+CompactPersonPeriodDfSchema = Schema(
+    {
+        **PersonPeriodDfSchema,
+        TempColumn.DOSE_1.value: Int16,
+        TempColumn.DOSE_2.value: Int16,
+        TempColumn.DOSE_3.value: Int16,
+        TempColumn.DOSE_4.value: Int16,
+        TempColumn.DEATH_INDEX.value: Int16,
+        **{column.value: Int16 for column in AGE_TRANSITIONS},
+        TempColumn.TIME_PERIOD_INDEX.value: UInt16,
+    }
+)
+
 
 class PersonPeriodTemplateGenerator(Protocol):
     def __init__(self, start_year: int, end_year: int) -> None: ...
 
-    def generate(self, base_df: DataFrame) -> DataFrame: ...
+    @property
+    def time_periods(self) -> list[str]: ...
+
+    def generate_persons(self, base_df: DataFrame) -> DataFrame: ...
+
+    def generate_persons_lazy(self, base_lf: LazyFrame) -> LazyFrame: ...
+
+    def generate(self, base_df: DataFrame, is_compact: bool = False, is_eligible_only: bool = False) -> DataFrame: ...
+
+    def generate_lazy(self, base_lf: LazyFrame, is_compact: bool = False, is_eligible_only: bool = False) -> LazyFrame: ...
+
+
+class PersonPeriodTemplateExpander:
+    @staticmethod
+    def expand(
+        persons_df: DataFrame, time_periods: list[str], is_compact: bool = False, is_eligible_only: bool = False
+    ) -> DataFrame:
+        return PersonPeriodTemplateExpander.expand_lazy(persons_df.lazy(), time_periods, is_compact, is_eligible_only).collect()
+
+    # With is_eligible_only, every person only gets the rows that can count towards the ACM: from the time period they
+    # turn 60 through their death period. The processed rows are the same, except that there are no after_death rows.
+    # With time_period_indices, only the rows of these time periods are generated.
+    @staticmethod
+    def expand_lazy(
+        persons_lf: LazyFrame,
+        time_periods: list[str],
+        is_compact: bool = False,
+        is_eligible_only: bool = False,
+        time_period_indices: Sequence[int] | None = None,
+    ) -> LazyFrame:
+        time_periods_lf = PersonPeriodTemplateExpander.get_time_periods_df(time_periods).lazy()
+        first_index, last_index = 0, len(time_periods) - 1
+
+        if time_period_indices is not None:
+            time_periods_lf = time_periods_lf.filter(col(TempColumn.TIME_PERIOD_INDEX).is_in(list(time_period_indices)))
+            first_index, last_index = min(time_period_indices, default=0), max(time_period_indices, default=-1)
+
+        # Computed once per person, so the age group of each row is an integer comparison with the time period index
+        persons_lf = persons_lf.with_columns(PersonPeriodTemplateExpander.get_age_transition_exprs(time_periods))
+
+        if is_compact:
+            # Cast before the cross join, so the narrow dtypes are the ones that get replicated
+            persons_lf = persons_lf.with_columns(
+                col(column).cast(CompactPersonPeriodDfSchema[column]) for column in [*PersonDfSchema, *AGE_TRANSITIONS]
+            )
+            time_periods_lf = time_periods_lf.with_columns(
+                col(TempColumn.TIME_PERIOD_INDEX).cast(CompactPersonPeriodDfSchema[TempColumn.TIME_PERIOD_INDEX])
+            )
+
+        if not is_eligible_only:
+            return persons_lf.join(time_periods_lf, how="cross")
+
+        # Each person's range is clipped to the generated time periods before it is exploded, so a filter on the time
+        # periods does not explode the whole range (it is not pushed through the explode like through the cross join)
+        first_eligible_index_expr = col(TempColumn.AGE_60_INDEX).cast(Int64).clip(lower_bound=first_index)
+        last_eligible_index_expr = col(TempColumn.DEATH_INDEX).cast(Int64).clip(upper_bound=last_index)
+        schema = CompactPersonPeriodDfSchema if is_compact else PersonPeriodDfSchema
+
+        # Persons turning 60 after the time periods or after their death get no rows at all
+        return (
+            persons_lf.filter(first_eligible_index_expr <= last_eligible_index_expr)
+            .with_columns(
+                int_ranges(
+                    first_eligible_index_expr, last_eligible_index_expr + 1, dtype=schema[TempColumn.TIME_PERIOD_INDEX]
+                ).alias(TempColumn.TIME_PERIOD_INDEX)
+            )
+            .explode(TempColumn.TIME_PERIOD_INDEX)
+            .join(time_periods_lf, on=TempColumn.TIME_PERIOD_INDEX, maintain_order="left")
+            .select(schema.names())
+        )
+
+    # Index of the first time period in which the person is at least 60/70/80 years old (0 when older at the start,
+    # len(time_periods) when never within them). A person is `age` years old in every time period whose (year, week/month)
+    # key is not lower than (birth year + age, birth week/month), so the birthdate is only parsed once per person.
+    @staticmethod
+    def get_age_transition_exprs(time_periods: list[str]) -> list[Expr]:
+        time_period_keys = Series(
+            [int(time_period[:4]) * 100 + int(time_period[5:7]) for time_period in time_periods], dtype=Int64
+        )
+        birth_year = col(TempColumn.BIRTHDATE).str.slice(0, 4).cast(Int64)
+        birth_sub_period = col(TempColumn.BIRTHDATE).str.slice(5, 2).cast(Int64)
+
+        return [
+            lit(time_period_keys).search_sorted((birth_year + age) * 100 + birth_sub_period).cast(Int64).alias(column)
+            for column, age in AGE_TRANSITIONS.items()
+        ]
+
+    @staticmethod
+    def get_time_periods_df(time_periods: list[str]) -> DataFrame:
+        return DataFrame(
+            {
+                TempColumn.TIME_PERIOD: time_periods,
+                TempColumn.TIME_PERIOD_INDEX: list(range(len(time_periods))),
+            },
+            schema={TempColumn.TIME_PERIOD: Utf8, TempColumn.TIME_PERIOD_INDEX: Int64},
+        )
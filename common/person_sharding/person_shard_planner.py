@@ -0,0 +1,53 @@
+from dataclasses import dataclass
+from math import ceil
+
+import psutil
+
+# Peak memory needed per person-period row while generating and processing the template. Measured as the peak RSS
+# increase of an eager expand + process of 200k simulated persons x 157 weeks (31.4M rows): ~138 B/row for the default
+# and ~132 B/row for the compact schema. The streaming sink stays far below that (~100-200 MB per shard in total),
+# so this is the worst case with ~2x headroom for polars' intermediate buffers.
+DEFAULT_BYTES_PER_PERSON_PERIOD = 256
+
+
+@dataclass(frozen=True)
+class PersonShard:
+    index: int
+    first_person_id: int
+    last_person_id: int
+
+
+class PersonShardPlanner:
+    def __init__(
+        self,
+        memory_budget_bytes: int | None = None,
+        bytes_per_person_period: int = DEFAULT_BYTES_PER_PERSON_PERIOD,
+        available_memory_fraction: float = 0.5,
+    ) -> None:
+        self.__memory_budget_bytes = memory_budget_bytes
+        self.__bytes_per_person_period = bytes_per_person_period
+        self.__available_memory_fraction = available_memory_fraction
+
+    def plan(self, num_of_persons: int, num_of_time_periods: int) -> list[PersonShard]:
+        shard_size = self.get_shard_size(num_of_time_periods)
+        num_of_shards = max(1, ceil(num_of_persons / shard_size))
+
+        # Person IDs are 1-based row indices of the input file (see the template generators)
+        return [
+            PersonShard(
+                index=i,
+                first_person_id=i * shard_size + 1,
+                last_person_id=min((i + 1) * shard_size, num_of_persons),
+            )
+            for i in range(num_of_shards)
+        ]
+
+    def get_shard_size(self, num_of_time_periods: int) -> int:
+        bytes_per_person = max(1, num_of_time_periods) * self.__bytes_per_person_period
+        return max(1, self.__get_memory_budget_bytes() // bytes_per_person)
+
+    def __get_memory_budget_bytes(self) -> int:
+        if self.__memory_budget_bytes is not None:
+            return self.__memory_budget_bytes
+
+        return int(psutil.virtual_memory().available * self.__available_memory_fraction)
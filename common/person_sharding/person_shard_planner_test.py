@@ -0,0 +1,65 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from common.person_sharding.person_shard_planner import DEFAULT_BYTES_PER_PERSON_PERIOD, PersonShard, PersonShardPlanner
+
+
+class TestPersonShardPlanner(TestCase):
+    # - Given an explicit memory budget
+    # -- When computing the shard size
+    # --- It should fit as many persons as the budget allows for the given amount of time periods
+    def test_shard_size_is_derived_from_memory_budget(self) -> None:
+        planner = PersonShardPlanner(memory_budget_bytes=100 * 10 * DEFAULT_BYTES_PER_PERSON_PERIOD)
+
+        self.assertEqual(planner.get_shard_size(num_of_time_periods=10), 100)
+
+    # - Given a memory budget smaller than a single person
+    # -- When computing the shard size
+    # --- It should still process at least one person per shard
+    def test_shard_size_is_at_least_one(self) -> None:
+        planner = PersonShardPlanner(memory_budget_bytes=1)
+
+        self.assertEqual(planner.get_shard_size(num_of_time_periods=156), 1)
+
+    # - Given a custom amount of bytes per person-period
+    # -- When computing the shard size
+    # --- It should use it instead of the default
+    def test_shard_size_uses_custom_bytes_per_person_period(self) -> None:
+        planner = PersonShardPlanner(memory_budget_bytes=1_000, bytes_per_person_period=10)
+
+        self.assertEqual(planner.get_shard_size(num_of_time_periods=10), 10)
+
+    # - Given no explicit memory budget
+    # -- When computing the shard size
+    # --- It should use the configured fraction of the available memory
+    @patch("common.person_sharding.person_shard_planner.psutil")
+    def test_shard_size_uses_available_memory_by_default(self, psutil_mock: Mock) -> None:
+        psutil_mock.virtual_memory.return_value.available = 4 * 50 * DEFAULT_BYTES_PER_PERSON_PERIOD
+        planner = PersonShardPlanner(available_memory_fraction=0.25)
+
+        self.assertEqual(planner.get_shard_size(num_of_time_periods=1), 50)
+
+    # - Given a number of persons not divisible by the shard size
+    # -- When planning the shards
+    # --- It should cover all person IDs exactly once with a smaller last shard
+    def test_plan_covers_all_persons(self) -> None:
+        planner = PersonShardPlanner(memory_budget_bytes=4 * DEFAULT_BYTES_PER_PERSON_PERIOD)
+
+        shards = planner.plan(num_of_persons=10, num_of_time_periods=1)
+
+        self.assertEqual(
+            shards,
+            [
+                PersonShard(index=0, first_person_id=1, last_person_id=4),
+                PersonShard(index=1, first_person_id=5, last_person_id=8),
+                PersonShard(index=2, first_person_id=9, last_person_id=10),
+            ],
+        )
+
+    # - Given no persons at all
+    # -- When planning the shards
+    # --- It should return a single empty shard, so an (empty) output is still written
+    def test_plan_without_persons(self) -> None:
+        planner = PersonShardPlanner(memory_budget_bytes=DEFAULT_BYTES_PER_PERSON_PERIOD)
+
+        self.assertEqual(planner.plan(num_of_persons=0, num_of_time_periods=1), [PersonShard(0, 1, 0)])
@@ -0,0 +1,185 @@
+from enum import StrEnum
+
+import numpy as np
+from polars import DataFrame, Expr, Int64, Series, UInt32, col, concat, lit
+
+from common.person_period_template_generator.person_period_template_generator import (
+    PersonDfSchema,
+    PersonPeriodTemplateExpander,
+    TempColumn,
+)
+from common.polars_expressions.age_group_expression import AgeGroupExpression
+from common.polars_expressions.death_status_expression import DeathStatusExpression
+from common.polars_expressions.vaccine_status_expression import VaccineStatusExpression
+from common.typings import CUBE_DIMENSIONS, AgeStatus, AggregatedColumn, AliveStatus, NewColumn
+from common.vaccine_episode.vaccine_episode_builder import EpisodeColumn, VaccineEpisodeDfSchema
+
+
+class IntervalColumn(StrEnum):
+    BREAKPOINTS = "breakpoints"
+    SEGMENT_END = "segment_end"
+    DELTA = "delta"
+
+
+# Splits every person's timeline into segments at the periods where their age group, vaccine status or death status
+# can change, evaluates each segment once and spreads it back over the time periods via cumulative sums of +1/-1 events.
+# Memory scales with the number of persons instead of persons x periods.
+class IntervalPersonTimeEngine:
+    def compute(self, persons_df: DataFrame, time_periods: list[str], is_using_months: bool = False) -> DataFrame:
+        assert persons_df.schema == PersonDfSchema
+
+        time_period_amount = 1 if is_using_months else 4
+        num_of_time_periods = len(time_periods)
+
+        segments_df = self.__split_into_segments(
+            persons_df.with_columns(PersonPeriodTemplateExpander.get_age_transition_exprs(time_periods)),
+            time_period_amount,
+            num_of_time_periods,
+        ).with_columns(
+            AgeGroupExpression.get_expr().alias(NewColumn.AGE),
+            DeathStatusExpression.get_expr().alias(NewColumn.DEATH_STATUS),
+            VaccineStatusExpression.get_expr(time_period_amount).alias(NewColumn.VACCINE_STATUS),
+        )
+
+        return self.__spread_segments_over_time_periods(self.__count_segments(segments_df), time_periods)
+
+    # The same cube from the vaccine episodes (see VaccineEpisodeBuilder), which already are the segments of the vaccine
+    # status: they only have to be split further where the age group or the death status changes
+    def compute_from_episodes(self, episodes_df: DataFrame, persons_df: DataFrame, time_periods: list[str]) -> DataFrame:
+        assert episodes_df.schema == VaccineEpisodeDfSchema
+        assert persons_df.schema == PersonDfSchema
+
+        episodes_df = episodes_df.join(
+            persons_df.select(
+                TempColumn.PERSON_ID, TempColumn.DEATH_INDEX, *PersonPeriodTemplateExpander.get_age_transition_exprs(time_periods)
+            ),
+            on=NewColumn.PERSON_ID,
+            how="left",
+        )
+        episode_starts = episodes_df[EpisodeColumn.START_INDEX].to_numpy()[:, None]
+        episode_ends = episodes_df[EpisodeColumn.END_INDEX].to_numpy()[:, None] + 1
+
+        breakpoints = np.clip(
+            episodes_df.select(
+                expr.alias(f"{IntervalColumn.BREAKPOINTS}_{i}")
+                for i, expr in enumerate(
+                    [
+                        col(EpisodeColumn.START_INDEX),
+                        col(TempColumn.DEATH_INDEX),
+                        col(TempColumn.DEATH_INDEX) + 1,
+                        col(TempColumn.AGE_60_INDEX),
+                        col(TempColumn.AGE_70_INDEX),
+                        col(TempColumn.AGE_80_INDEX),
+                    ]
+                )
+            )
+            .to_numpy()
+            .astype(np.int64),
+            episode_starts,
+            episode_ends,
+        )
+        breakpoints = np.column_stack([breakpoints, episode_ends])
+        breakpoints.sort(axis=1)
+
+        segment_starts, segment_ends = breakpoints[:, :-1], breakpoints[:, 1:]
+        episode_rows, segment_cols = np.nonzero(segment_starts < segment_ends)
+
+        segments_df = (
+            episodes_df[episode_rows]
+            .with_columns(
+                Series(TempColumn.TIME_PERIOD_INDEX, segment_starts[episode_rows, segment_cols], dtype=Int64),
+                Series(IntervalColumn.SEGMENT_END, segment_ends[episode_rows, segment_cols], dtype=Int64),
+            )
+            .with_columns(
+                AgeGroupExpression.get_expr().alias(NewColumn.AGE),
+                DeathStatusExpression.get_expr().alias(NewColumn.DEATH_STATUS),
+            )
+        )
+
+        return self.__spread_segments_over_time_periods(self.__count_segments(segments_df), time_periods)
+
+    def __count_segments(self, segments_df: DataFrame) -> DataFrame:
+        return (
+            segments_df.filter(
+                (col(NewColumn.AGE) != AgeStatus.LESS_THAN_60) & (col(NewColumn.DEATH_STATUS) != AliveStatus.AFTER_DEATH)
+            )
+            # Persons sharing the same segment only need to be spread once
+            .group_by(*CUBE_DIMENSIONS, TempColumn.TIME_PERIOD_INDEX, IntervalColumn.SEGMENT_END)
+            .len(name=IntervalColumn.DELTA)
+            .with_columns(col(IntervalColumn.DELTA).cast(Int64))
+        )
+
+    def __spread_segments_over_time_periods(self, segments_df: DataFrame, time_periods: list[str]) -> DataFrame:
+        deltas_df = (
+            concat(
+                [
+                    segments_df.select(*CUBE_DIMENSIONS, TempColumn.TIME_PERIOD_INDEX, IntervalColumn.DELTA),
+                    segments_df.select(
+                        *CUBE_DIMENSIONS,
+                        col(IntervalColumn.SEGMENT_END).alias(TempColumn.TIME_PERIOD_INDEX),
+                        -col(IntervalColumn.DELTA),
+                    ),
+                ]
+            )
+            .group_by(*CUBE_DIMENSIONS, TempColumn.TIME_PERIOD_INDEX)
+            .agg(col(IntervalColumn.DELTA).sum())
+        )
+
+        time_periods_df = PersonPeriodTemplateExpander.get_time_periods_df(time_periods)
+
+        return (
+            deltas_df.select(CUBE_DIMENSIONS)
+            .unique()
+            .join(time_periods_df, how="cross")
+            .join(deltas_df, on=[*CUBE_DIMENSIONS, TempColumn.TIME_PERIOD_INDEX], how="left")
+            .sort(*CUBE_DIMENSIONS, TempColumn.TIME_PERIOD_INDEX)
+            .with_columns(
+                col(IntervalColumn.DELTA)
+                .fill_null(0)
+                .cum_sum()
+                .over(CUBE_DIMENSIONS)
+                .cast(UInt32)
+                .alias(AggregatedColumn.PERSON_PERIODS)
+            )
+            .filter(col(AggregatedColumn.PERSON_PERIODS) > 0)
+            .select(NewColumn.TIME_PERIOD, *CUBE_DIMENSIONS, AggregatedColumn.PERSON_PERIODS)
+        )
+
+    # Sorts every person's breakpoints (row-wise in NumPy, which is much faster than polars list operations) and returns
+    # one row per non-empty segment [time_period_index, segment_end); duplicated and missing breakpoints give empty segments
+    def __split_into_segments(self, persons_df: DataFrame, time_period_amount: int, num_of_time_periods: int) -> DataFrame:
+        breakpoints = (
+            persons_df.select(
+                expr.clip(0, num_of_time_periods).fill_null(num_of_time_periods).alias(f"{IntervalColumn.BREAKPOINTS}_{i}")
+                for i, expr in enumerate(self.__get_breakpoint_exprs(time_period_amount, num_of_time_periods))
+            )
+            .to_numpy()
+            .astype(np.int64)
+        )
+        breakpoints.sort(axis=1)
+
+        segment_starts, segment_ends = breakpoints[:, :-1], breakpoints[:, 1:]
+        person_rows, segment_cols = np.nonzero(segment_starts < segment_ends)
+
+        return persons_df.drop(TempColumn.PERSON_ID, TempColumn.BIRTHDATE)[person_rows].with_columns(
+            Series(TempColumn.TIME_PERIOD_INDEX, segment_starts[person_rows, segment_cols], dtype=Int64),
+            Series(IntervalColumn.SEGMENT_END, segment_ends[person_rows, segment_cols], dtype=Int64),
+        )
+
+    def __get_breakpoint_exprs(self, time_period_amount: int, num_of_time_periods: int) -> list[Expr]:
+        return [
+            lit(0, Int64),
+            lit(num_of_time_periods, Int64),
+            col(TempColumn.DOSE_1),
+            col(TempColumn.DOSE_1) + time_period_amount,
+            col(TempColumn.DOSE_2),
+            col(TempColumn.DOSE_2) + time_period_amount,
+            col(TempColumn.DOSE_3),
+            col(TempColumn.DOSE_3) + time_period_amount,
+            col(TempColumn.DOSE_4),
+            col(TempColumn.DEATH_INDEX),
+            col(TempColumn.DEATH_INDEX) + 1,
+            col(TempColumn.AGE_60_INDEX),
+            col(TempColumn.AGE_70_INDEX),
+            col(TempColumn.AGE_80_INDEX),
+        ]
@@ -0,0 +1,156 @@
+import random
+from datetime import datetime
+from unittest import TestCase
+
+from polars import DataFrame, col
+
+from common.acm_calculator.acm_calculator import ACMCalculator
+from common.person_period_processor.person_period_template_processor import PersonPeriodTemplateProcessor
+from common.person_period_template_generator.person_period_template_generator import (
+    PersonDfSchema,
+    PersonPeriodTemplateExpander,
+    TempColumn,
+)
+from common.person_time_engine.interval_person_time_engine import IntervalPersonTimeEngine
+from common.time_period.time_period_helper import TimePeriodHelper
+from common.typings import MAX_TIME_PERIOD_VALUE, AggregatedColumn, AliveStatus, AnalysedAgeStatus, NewColumn, VaccineStatus
+from common.vaccine_episode.vaccine_episode_builder import VaccineEpisodeBuilder
+
+CUBE_KEYS = [NewColumn.TIME_PERIOD, NewColumn.AGE, NewColumn.VACCINE_STATUS, NewColumn.DEATH_STATUS]
+
+
+class TestIntervalPersonTimeEngine(TestCase):
+    def setUp(self) -> None:
+        self.__engine = IntervalPersonTimeEngine()
+        self.__processor = PersonPeriodTemplateProcessor()
+        self.__weeks = TimePeriodHelper.get_weeks_in_range(datetime(2020, 1, 1), datetime(2022, 12, 31))
+        self.__months = TimePeriodHelper.get_months_in_range(datetime(2020, 1, 1), datetime(2022, 12, 31))
+
+    # - Given a person who turns 60 during the analysed time span and dies in it
+    # -- When computing the person-time cube
+    # --- It should count alive periods per age group and a single death in the death period
+    def test_compute_should_split_person_time_by_age_and_death(self) -> None:
+        persons_df = self.__create_persons_df(birthdates=["1962M06"], death_indices=[30])
+
+        result = self.__engine.compute(persons_df, self.__months, is_using_months=True)
+
+        self.assertEqual(
+            result.sort(NewColumn.TIME_PERIOD).rows(),
+            [
+                ("2022M06", "60-69", 0, AliveStatus.ALIVE.value, 1),
+                ("2022M07", "60-69", 0, AliveStatus.DIED_NOW.value, 1),
+            ],
+        )
+
+    # - Given a person who died before the analysed time span
+    # -- When computing the person-time cube
+    # --- It should not count any person-time
+    def test_compute_should_ignore_persons_dead_before_time_span(self) -> None:
+        persons_df = self.__create_persons_df(birthdates=["1930W01"], death_indices=[-1])
+
+        result = self.__engine.compute(persons_df, self.__weeks)
+
+        self.assertTrue(result.is_empty())
+
+    # - Given randomly generated persons (in weeks)
+    # -- When computing the person-time cube
+    # --- It should match the cross join processed by PersonPeriodTemplateProcessor exactly
+    def test_compute_should_match_processor_for_weeks(self) -> None:
+        persons_df = self.__create_random_persons_df(self.__weeks, birth_sub_period_format="W{:02d}", max_sub_period=53)
+
+        self.__assert_matches_processor(persons_df, self.__weeks, is_using_months=False)
+
+    # - Given randomly generated persons (in months)
+    # -- When computing the person-time cube
+    # --- It should match the cross join processed by PersonPeriodTemplateProcessor exactly
+    def test_compute_should_match_processor_for_months(self) -> None:
+        persons_df = self.__create_random_persons_df(self.__months, birth_sub_period_format="M{:02d}", max_sub_period=12)
+
+        self.__assert_matches_processor(persons_df, self.__months, is_using_months=True)
+
+    # - Given randomly generated persons
+    # -- When computing ACM from the person-time cube
+    # --- It should return the same ACM as computed from the processed cross join
+    def test_compute_should_produce_same_acm_as_processor(self) -> None:
+        persons_df = self.__create_random_persons_df(self.__weeks, birth_sub_period_format="W{:02d}", max_sub_period=53)
+        acm_calculator = ACMCalculator()
+
+        cube_df = self.__engine.compute(persons_df, self.__weeks)
+        processed_df = self.__processor.process(PersonPeriodTemplateExpander.expand(persons_df, self.__weeks))
+
+        for age_status in AnalysedAgeStatus:
+            for vac_status in VaccineStatus:
+                expected = acm_calculator.compute_person_years_acm(processed_df, age_status, vac_status, is_using_months=False)
+                result = acm_calculator.compute_person_years_acm(cube_df, age_status, vac_status, is_using_months=False)
+                self.assertEqual(result, expected)
+
+    # - Given randomly generated persons (in weeks and in months)
+    # -- When computing the person-time cube from their vaccine episodes
+    # --- It should return the same cube as computing it from the persons
+    def test_compute_from_episodes_should_match_compute(self) -> None:
+        for time_periods, birth_sub_period_format, max_sub_period, is_using_months in [
+            (self.__weeks, "W{:02d}", 53, False),
+            (self.__months, "M{:02d}", 12, True),
+        ]:
+            with self.subTest(is_using_months=is_using_months):
+                persons_df = self.__create_random_persons_df(time_periods, birth_sub_period_format, max_sub_period)
+                episodes_df = VaccineEpisodeBuilder().build(persons_df, len(time_periods), is_using_months)
+
+                result = self.__engine.compute_from_episodes(episodes_df, persons_df, time_periods)
+
+                self.assertTrue(result.equals(self.__engine.compute(persons_df, time_periods, is_using_months)))
+
+    def __assert_matches_processor(self, persons_df: DataFrame, time_periods: list[str], is_using_months: bool) -> None:
+        processed_df = self.__processor.process(PersonPeriodTemplateExpander.expand(persons_df, time_periods), is_using_months)
+        expected = (
+            processed_df.filter(col(NewColumn.DEATH_STATUS) != AliveStatus.AFTER_DEATH)
+            .group_by(CUBE_KEYS)
+            .len(name=AggregatedColumn.PERSON_PERIODS)
+            .sort(CUBE_KEYS)
+        )
+
+        result = self.__engine.compute(persons_df, time_periods, is_using_months).sort(CUBE_KEYS)
+
+        self.assertEqual(result.rows(), expected.rows())
+
+    def __create_random_persons_df(self, time_periods: list[str], birth_sub_period_format: str, max_sub_period: int) -> DataFrame:
+        rng = random.Random(42)
+        num_of_persons = 300
+        num_of_time_periods = len(time_periods)
+
+        def random_dose() -> int | None:
+            return rng.randrange(num_of_time_periods) if rng.random() < 0.7 else None
+
+        return self.__create_persons_df(
+            birthdates=[
+                f"{rng.randint(1925, 1965)}{birth_sub_period_format.format(rng.randint(1, max_sub_period))}"
+                for _ in range(num_of_persons)
+            ],
+            death_indices=[
+                rng.choice([-1, MAX_TIME_PERIOD_VALUE, rng.randrange(num_of_time_periods)]) for _ in range(num_of_persons)
+            ],
+            doses=[[random_dose() for _ in range(num_of_persons)] for _ in range(4)],
+        )
+
+    def __create_persons_df(
+        self,
+        birthdates: list[str],
+        death_indices: list[int],
+        doses: list[list[int | None]] | None = None,
+    ) -> DataFrame:
+        num_of_persons = len(birthdates)
+        if doses is None:
+            doses = [[None] * num_of_persons for _ in range(4)]
+
+        return DataFrame(
+            {
+                TempColumn.PERSON_ID: list(range(1, num_of_persons + 1)),
+                TempColumn.BIRTHDATE: birthdates,
+                TempColumn.DOSE_1: doses[0],
+                TempColumn.DOSE_2: doses[1],
+                TempColumn.DOSE_3: doses[2],
+                TempColumn.DOSE_4: doses[3],
+                TempColumn.DEATH_INDEX: death_indices,
+            },
+            schema=PersonDfSchema,
+        )
@@ -1,27 +1,19 @@
-from polars import Expr, Int64, col, lit, when
+from polars import Expr, col, lit, when
 
 from common.person_period_template_generator.person_period_template_generator import TempColumn
 from common.typings import AgeStatus
 
 
 class AgeGroupExpression:
+    # Integer comparisons against the per-person age transition indices (see PersonPeriodTemplateExpander.get_age_transition_exprs)
     @staticmethod
     def get_expr() -> Expr:
-        age_expr = (
-            col(TempColumn.TIME_PERIOD).str.slice(0, 4).cast(Int64)
-            - col(TempColumn.BIRTHDATE).str.slice(0, 4).cast(Int64)
-            - (
-                (
-                    col(TempColumn.TIME_PERIOD).str.slice(5, 2).cast(Int64) < col(TempColumn.BIRTHDATE).str.slice(5, 2).cast(Int64)
-                ).cast(Int64)
-            )
-        )
         return (
-            when(age_expr < 60)
+            when(col(TempColumn.TIME_PERIOD_INDEX) < col(TempColumn.AGE_60_INDEX))
             .then(lit(AgeStatus.LESS_THAN_60))
-            .when(age_expr < 70)
+            .when(col(TempColumn.TIME_PERIOD_INDEX) < col(TempColumn.AGE_70_INDEX))
             .then(lit(AgeStatus.BETWEEN_60_AND_69))
-            .when(age_expr < 80)
+            .when(col(TempColumn.TIME_PERIOD_INDEX) < col(TempColumn.AGE_80_INDEX))
             .then(lit(AgeStatus.BETWEEN_70_AND_79))
             .otherwise(lit(AgeStatus.GREATER_THAN_80))
         )
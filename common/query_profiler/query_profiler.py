@@ -0,0 +1,59 @@
+from enum import StrEnum
+
+from polars import DataFrame, LazyFrame, col, concat, lit
+
+from common.file_storage.file_storage import FileStorage, StoredFile
+
+
+class ProfileColumn(StrEnum):
+    STAGE = "stage"
+    NODE = "node"
+    START = "start"
+    END = "end"
+    DURATION_US = "duration_us"
+    SHARE = "share"  # of the duration of the whole stage
+
+
+# Collects queries with LazyFrame.profile() (in memory, on the default engine) instead of collect(). For every stage it
+# saves the optimized plan (<stage>.plan.txt) and the timings of the plan nodes (<stage>.profile.csv, in microseconds,
+# slowest first); summary.csv has the nodes of all stages so far, slowest first.
+class QueryProfiler:
+    def __init__(self, file_storage: FileStorage, directory: str) -> None:
+        self.__file_storage = file_storage
+        self.__directory = directory
+        self.__profile_dfs: list[DataFrame] = []
+
+    def collect(self, stage: str, lf: LazyFrame) -> DataFrame:
+        self.__file_storage.write(f"{self.__directory}{stage}.plan.txt", lf.explain(optimized=True).encode())
+
+        result_df, profile_df = lf.profile()
+        stage_profile_df = self.__get_stage_profile_df(stage, profile_df)
+        self.__profile_dfs.append(stage_profile_df)
+
+        self.__write_csv(f"{stage}.profile.csv", stage_profile_df)
+        self.__write_csv("summary.csv", self.get_summary_df())
+
+        return result_df
+
+    def get_summary_df(self) -> DataFrame:
+        return concat(self.__profile_dfs).sort(ProfileColumn.DURATION_US, descending=True)
+
+    def __get_stage_profile_df(self, stage: str, profile_df: DataFrame) -> DataFrame:
+        return (
+            profile_df.select(
+                lit(stage).alias(ProfileColumn.STAGE),
+                ProfileColumn.NODE,
+                ProfileColumn.START,
+                ProfileColumn.END,
+                (col(ProfileColumn.END) - col(ProfileColumn.START)).alias(ProfileColumn.DURATION_US),
+            )
+            .with_columns(
+                (col(ProfileColumn.DURATION_US) / col(ProfileColumn.END).max().clip(lower_bound=1))
+                .round(4)
+                .alias(ProfileColumn.SHARE)
+            )
+            .sort(ProfileColumn.DURATION_US, descending=True)
+        )
+
+    def __write_csv(self, file_name: str, df: DataFrame) -> StoredFile:
+        return self.__file_storage.write(f"{self.__directory}{file_name}", df.write_csv().encode())
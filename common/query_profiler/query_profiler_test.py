@@ -0,0 +1,51 @@
+from os import path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from polars import LazyFrame, col, read_csv
+
+from common.file_storage.file_storage import LocalFileStorage
+from common.query_profiler.query_profiler import ProfileColumn, QueryProfiler
+
+
+class TestQueryProfiler(TestCase):
+    def setUp(self) -> None:
+        self.__tmp_dir = TemporaryDirectory()
+        self.__directory = f"{self.__tmp_dir.name}/profiles/"
+        self.__query_profiler = QueryProfiler(LocalFileStorage(), self.__directory)
+        self.__lf = LazyFrame({"a": [1, 2, 3]}).with_columns((col("a") * 2).alias("b")).filter(col("a") > 1)
+
+    def tearDown(self) -> None:
+        self.__tmp_dir.cleanup()
+
+    # - When collecting a query with the profiler
+    # -- It should return the same result as collect() and save the optimized plan and the node timings of the stage
+    def test_collect_saves_plan_and_node_timings(self) -> None:
+        result = self.__query_profiler.collect("stage", self.__lf)
+
+        self.assertTrue(result.equals(self.__lf.collect()))
+        with open(path.join(self.__directory, "stage.plan.txt"), encoding="utf-8") as plan_file:
+            self.assertEqual(plan_file.read(), self.__lf.explain(optimized=True))
+
+        profile_df = read_csv(path.join(self.__directory, "stage.profile.csv"))
+        self.assertEqual(profile_df.columns, list(ProfileColumn))
+        self.assertEqual(profile_df[ProfileColumn.STAGE].unique().to_list(), ["stage"])
+        self.assertTrue(profile_df[ProfileColumn.NODE].str.contains("filter").any())
+        self.assertEqual(
+            profile_df[ProfileColumn.DURATION_US].to_list(), sorted(profile_df[ProfileColumn.DURATION_US], reverse=True)
+        )
+
+    # - Given several profiled stages
+    # -- When reading the summary
+    # --- It should contain the nodes of all stages, slowest first
+    def test_summary_contains_all_stages(self) -> None:
+        self.__query_profiler.collect("first", self.__lf)
+        self.__query_profiler.collect("second", self.__lf.select("b"))
+
+        summary_df = read_csv(path.join(self.__directory, "summary.csv"))
+
+        self.assertTrue(summary_df.equals(self.__query_profiler.get_summary_df()))
+        self.assertEqual(sorted(summary_df[ProfileColumn.STAGE].unique().to_list()), ["first", "second"])
+        self.assertEqual(
+            summary_df[ProfileColumn.DURATION_US].to_list(), sorted(summary_df[ProfileColumn.DURATION_US], reverse=True)
+        )
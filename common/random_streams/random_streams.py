@@ -0,0 +1,20 @@
+import numpy as np
+
+
+# The single source of simulation randomness. Every stream is a child of one root SeedSequence, addressed by its key
+# (e.g. the scenario or chunk index) instead of being spawned in order, so a stream only depends on the seed and its key,
+# not on how many other streams were created before it or in which process. Without a seed the root entropy is drawn
+# once, so the streams of one instance are still consistent with each other.
+class RandomStreams:
+    def __init__(self, seed: int | None = None) -> None:
+        self.__root = np.random.SeedSequence(seed)
+
+    # Without a key it is the root itself (the same stream as np.random.default_rng(seed))
+    def get_seed_sequence(self, *key: int) -> np.random.SeedSequence:
+        if not key:
+            return self.__root
+
+        return np.random.SeedSequence(self.__root.entropy, spawn_key=key)
+
+    def get_rng(self, *key: int) -> np.random.Generator:
+        return np.random.default_rng(self.get_seed_sequence(*key))
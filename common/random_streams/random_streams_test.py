@@ -0,0 +1,48 @@
+from unittest import TestCase
+
+import numpy as np
+
+from common.random_streams.random_streams import RandomStreams
+
+
+class TestRandomStreams(TestCase):
+    # - Given the same seed
+    # -- When getting the streams of the same keys, in a different order
+    # --- It should return the same numbers
+    def test_streams_depend_only_on_seed_and_key(self) -> None:
+        streams = RandomStreams(42)
+        other_streams = RandomStreams(42)
+
+        result = [streams.get_rng(key).random(5) for key in range(3)]
+        reversed_result = [other_streams.get_rng(key).random(5) for key in reversed(range(3))]
+
+        for numbers, other_numbers in zip(result, reversed(reversed_result), strict=True):
+            np.testing.assert_array_equal(numbers, other_numbers)
+
+    # - Given a seed
+    # -- When getting the streams of different keys or of another seed
+    # --- It should return different numbers
+    def test_streams_are_independent(self) -> None:
+        streams = RandomStreams(42)
+
+        self.assertFalse(np.array_equal(streams.get_rng(0).random(5), streams.get_rng(1).random(5)))
+        self.assertFalse(np.array_equal(streams.get_rng(0, 1).random(5), streams.get_rng(1, 0).random(5)))
+        self.assertFalse(np.array_equal(streams.get_rng(0).random(5), RandomStreams(43).get_rng(0).random(5)))
+
+    # - Given a seed
+    # -- When getting the streams without a key and of a single key
+    # --- It should match np.random.default_rng(seed) and SeedSequence(seed).spawn
+    def test_streams_match_numpy_seeding(self) -> None:
+        streams = RandomStreams(7)
+        spawned = np.random.SeedSequence(7).spawn(3)
+
+        np.testing.assert_array_equal(streams.get_rng().random(5), np.random.default_rng(7).random(5))
+        np.testing.assert_array_equal(streams.get_rng(2).random(5), np.random.default_rng(spawned[2]).random(5))
+
+    # - Given no seed
+    # -- When getting the same key twice from one instance
+    # --- It should return the same numbers
+    def test_unseeded_streams_are_consistent_within_instance(self) -> None:
+        streams = RandomStreams()
+
+        np.testing.assert_array_equal(streams.get_rng(3).random(5), streams.get_rng(3).random(5))
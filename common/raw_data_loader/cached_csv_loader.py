@@ -0,0 +1,54 @@
+from contextlib import suppress
+from glob import escape, glob
+from hashlib import sha256
+from os import path, remove, replace, stat
+
+from polars import LazyFrame, Schema, scan_csv, scan_parquet
+
+CACHE_SUFFIX = ".cache.parquet"
+
+
+# Loads only the columns of the given schema from a CSV with explicit dtypes and caches the typed result as a parquet
+# file next to the CSV (<name>.<fingerprint>.cache.parquet). The fingerprint covers the CSV size, modification time
+# and the schema, so a changed CSV (or schema) gets a new cache file and the stale ones are removed.
+class CachedCsvLoader:
+    def __init__(self, schema: Schema, separator: str = ";") -> None:
+        self.__schema = schema
+        self.__separator = separator
+
+    def scan(self, csv_path: str) -> LazyFrame:
+        cache_path = self.get_cache_path(csv_path)
+
+        if not path.exists(cache_path):
+            self.__remove_stale_caches(csv_path)
+            self.__write_cache(csv_path, cache_path)
+
+        return scan_parquet(cache_path)
+
+    def get_cache_path(self, csv_path: str) -> str:
+        return f"{path.splitext(csv_path)[0]}.{self.__get_fingerprint(csv_path)}{CACHE_SUFFIX}"
+
+    def __write_cache(self, csv_path: str, cache_path: str) -> None:
+        # Written to a temp file first, so an interrupted run never leaves a truncated cache behind
+        tmp_path = f"{cache_path}.tmp"
+        try:
+            (
+                scan_csv(csv_path, separator=self.__separator, schema_overrides=self.__schema)
+                .select(list(self.__schema))
+                .sink_parquet(tmp_path, engine="streaming")
+            )
+            replace(tmp_path, cache_path)
+        except BaseException:
+            # The sink may fail before creating the temp file
+            with suppress(FileNotFoundError):
+                remove(tmp_path)
+            raise
+
+    def __remove_stale_caches(self, csv_path: str) -> None:
+        for cache_path in glob(f"{escape(path.splitext(csv_path)[0])}.*{CACHE_SUFFIX}"):
+            remove(cache_path)
+
+    def __get_fingerprint(self, csv_path: str) -> str:
+        csv_stat = stat(csv_path)
+        key = f"{csv_stat.st_size}:{csv_stat.st_mtime_ns}:{self.__schema}"
+        return sha256(key.encode()).hexdigest()[:16]
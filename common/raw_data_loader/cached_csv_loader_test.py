@@ -0,0 +1,81 @@
+from glob import glob
+from os import path
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from polars import Int64, Schema, Utf8
+
+from common.raw_data_loader import cached_csv_loader
+from common.raw_data_loader.cached_csv_loader import CACHE_SUFFIX, CachedCsvLoader
+
+
+class TestCachedCsvLoader(TestCase):
+    def setUp(self) -> None:
+        self.__tmp_dir = TemporaryDirectory()
+        self.__csv_path = path.join(self.__tmp_dir.name, "OZP.csv")
+        self.__loader = CachedCsvLoader(Schema({"Rok": Int64, "Kód": Utf8}))
+
+    def tearDown(self) -> None:
+        self.__tmp_dir.cleanup()
+
+    # - When scanning a CSV for the first time
+    # -- It should load only the schema columns with the schema dtypes and write the cache next to the CSV
+    def test_scan_loads_typed_schema_columns(self) -> None:
+        self.__write_csv("Rok;Kód;Nepoužitý\n2021;007;x\n;;y\n")
+
+        result = self.__loader.scan(self.__csv_path).collect()
+
+        self.assertEqual(result.schema, Schema({"Rok": Int64, "Kód": Utf8}))
+        self.assertEqual(result.rows(), [(2021, "007"), (None, None)])
+        self.assertTrue(path.exists(self.__loader.get_cache_path(self.__csv_path)))
+
+    # - Given an already cached CSV
+    # -- When scanning it again
+    # --- It should read the cache without parsing the CSV
+    def test_scan_reuses_cache(self) -> None:
+        self.__write_csv("Rok;Kód\n2021;1\n")
+        self.__loader.scan(self.__csv_path)
+
+        with patch.object(cached_csv_loader, "scan_csv") as scan_csv_mock:
+            result = self.__loader.scan(self.__csv_path).collect()
+
+        scan_csv_mock.assert_not_called()
+        self.assertEqual(result.rows(), [(2021, "1")])
+
+    # - Given an already cached CSV
+    # -- When the CSV changes
+    # --- It should rebuild the cache and remove the stale one
+    def test_scan_invalidates_cache_when_csv_changes(self) -> None:
+        self.__write_csv("Rok;Kód\n2021;1\n")
+        self.__loader.scan(self.__csv_path)
+
+        self.__write_csv("Rok;Kód\n2021;1\n2022;2\n")
+        result = self.__loader.scan(self.__csv_path).collect()
+
+        self.assertEqual(result.rows(), [(2021, "1"), (2022, "2")])
+        self.assertEqual(glob(path.join(self.__tmp_dir.name, f"*{CACHE_SUFFIX}")), [self.__loader.get_cache_path(self.__csv_path)])
+
+    # - Given a failing CSV parse
+    # -- When scanning the CSV
+    # --- It should not leave any (partial) cache or temp file behind
+    @patch.object(cached_csv_loader, "scan_csv")
+    def test_scan_does_not_leave_partial_cache(self, scan_csv_mock: Mock) -> None:
+        self.__write_csv("Rok;Kód\n2021;1\n")
+
+        def interrupted_sink(tmp_path: str, **_: object) -> None:
+            with open(tmp_path, "wb") as file:
+                file.write(b"truncated")
+            raise RuntimeError("interrupted")
+
+        scan_csv_mock.return_value.select.return_value.sink_parquet.side_effect = interrupted_sink
+
+        with self.assertRaises(RuntimeError):
+            self.__loader.scan(self.__csv_path)
+
+        self.assertEqual(glob(path.join(self.__tmp_dir.name, f"*{CACHE_SUFFIX}")), [])
+        self.assertEqual(glob(path.join(self.__tmp_dir.name, "*.tmp")), [])
+
+    def __write_csv(self, content: str) -> None:
+        with open(self.__csv_path, "w", encoding="utf-8") as file:
+            file.write(content)
@@ -1,4 +1,13 @@
 from datetime import datetime, timedelta
+from enum import StrEnum
+
+from polars import Expr, col, lit
+
+
+# Hive partition keys of time-partitioned datasets (<dataset>/year=2021/quarter=3/...)
+class TimePartitionColumn(StrEnum):
+    YEAR = "year"
+    QUARTER = "quarter"
 
 
 class TimePeriodHelper:
@@ -32,3 +41,34 @@ class TimePeriodHelper:
                 current_month += 1
 
         return months
+
+    # Weeks are assigned to quarters by their ISO week number (13 weeks each, week 53 belongs to the 4th quarter)
+    @staticmethod
+    def get_time_partition(time_period: str) -> tuple[int, int]:
+        year = int(time_period[:4])
+        sub_period = int(time_period[5:])
+
+        if time_period[4] == "M":
+            return year, (sub_period - 1) // 3 + 1
+
+        return year, min((sub_period - 1) // 13 + 1, 4)
+
+    # Indices of the time periods per (year, quarter), in the order of the time periods
+    @staticmethod
+    def group_by_time_partition(time_periods: list[str]) -> dict[tuple[int, int], list[int]]:
+        time_partitions: dict[tuple[int, int], list[int]] = {}
+
+        for time_period_index, time_period in enumerate(time_periods):
+            time_partitions.setdefault(TimePeriodHelper.get_time_partition(time_period), []).append(time_period_index)
+
+        return time_partitions
+
+    # Matches the partitions containing any of the time periods, so scans of time-partitioned datasets skip the others
+    @staticmethod
+    def get_time_partition_filter_expr(time_periods: list[str]) -> Expr:
+        expr = lit(False)
+
+        for year, quarter in TimePeriodHelper.group_by_time_partition(time_periods):
+            expr = expr | ((col(TimePartitionColumn.YEAR) == year) & (col(TimePartitionColumn.QUARTER) == quarter))
+
+        return expr
@@ -1,10 +1,36 @@
 from datetime import datetime
 from unittest import TestCase
 
-from common.time_period.time_period_helper import TimePeriodHelper
+from polars import DataFrame
+
+from common.time_period.time_period_helper import TimePartitionColumn, TimePeriodHelper
 
 
 class TestTimePeriodHelper(TestCase):
+    # - When getting the time partition of weeks and months
+    # -- It should return their year and quarter
+    def test_get_time_partition(self):
+        self.assertEqual(TimePeriodHelper.get_time_partition("2021W13"), (2021, 1))
+        self.assertEqual(TimePeriodHelper.get_time_partition("2021W14"), (2021, 2))
+        self.assertEqual(TimePeriodHelper.get_time_partition("2020W53"), (2020, 4))
+        self.assertEqual(TimePeriodHelper.get_time_partition("2022M03"), (2022, 1))
+        self.assertEqual(TimePeriodHelper.get_time_partition("2022M10"), (2022, 4))
+
+    # - When grouping time periods by time partition
+    # -- It should return the indices of the time periods in each partition
+    def test_group_by_time_partition(self):
+        result = TimePeriodHelper.group_by_time_partition(["2021M05", "2021M06", "2021M07"])
+        self.assertEqual(result, {(2021, 2): [0, 1], (2021, 3): [2]})
+
+    # - When filtering time partitions by time periods
+    # -- It should keep only the partitions containing the time periods
+    def test_get_time_partition_filter_expr(self):
+        partitions_df = DataFrame({TimePartitionColumn.YEAR: [2021, 2021, 2022], TimePartitionColumn.QUARTER: [2, 3, 3]})
+
+        result = partitions_df.filter(TimePeriodHelper.get_time_partition_filter_expr(["2021M09", "2021M10", "2022M07"]))
+
+        self.assertEqual(result.rows(), [(2021, 3), (2022, 3)])
+
     # - When the start date is January 1st
     # -- It should correctly handle ISO week from the previous year
     def test_first_day_of_year(self):
@@ -1,30 +1,206 @@
+import json
+import threading
 import time
 from collections.abc import Generator
 from contextlib import contextmanager
+from dataclasses import asdict, dataclass
 from datetime import datetime
+from os import getpid
 from typing import Any
 
 import psutil
 
+from common.file_storage.file_storage import LocalFileStorage
+
+RSS_SAMPLING_INTERVAL_SECONDS = 0.01
+MIN_RSS_SAMPLE_CHANGE_BYTES = 1024 * 1024  # smaller changes are not recorded as Chrome trace counter events
+BYTES_IN_MB = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class Span:
+    name: str
+    path: str  # names of the enclosing spans and this span joined by " / "
+    depth: int
+    thread_id: int
+    start_timestamp: float  # seconds since the epoch
+    duration_seconds: float
+    start_rss_mb: float
+    end_rss_mb: float
+    peak_rss_mb: float
+
+
+@dataclass
+class ActiveSpan:
+    name: str
+    path: str
+    depth: int
+    start_timestamp: float
+    start_perf_counter: float
+    start_rss_bytes: int
+    peak_rss_bytes: int
+
+
+# Collects the finished spans of all TimeTrackers while active. Optionally appends each span as a JSON line
+# (flushed right away, so a crashed run keeps the spans finished before it) and writes a Chrome trace
+# (chrome://tracing, https://ui.perfetto.dev) with the spans and the sampled RSS on exit.
+class SpanRecorder:
+    def __init__(self, jsonl_path: str | None = None, chrome_trace_path: str | None = None) -> None:
+        self.__jsonl_path = jsonl_path
+        self.__chrome_trace_path = chrome_trace_path
+        self.__chrome_trace_events: list[dict[str, Any]] = []
+        self.__last_rss_sample_bytes = 0
+        self.spans: list[Span] = []
+
+    def __enter__(self) -> "SpanRecorder":
+        if self.__jsonl_path is not None:
+            LocalFileStorage().write(self.__jsonl_path, b"")
+        span_recorders.append(self)
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        span_recorders.remove(self)
+
+        if self.__chrome_trace_path is not None:
+            chrome_trace = {"traceEvents": self.__chrome_trace_events, "displayTimeUnit": "ms"}
+            LocalFileStorage().write(self.__chrome_trace_path, json.dumps(chrome_trace).encode())
+
+    def record_span(self, span: Span) -> None:
+        self.spans.append(span)
+
+        if self.__jsonl_path is not None:
+            with open(self.__jsonl_path, "a", encoding="utf-8") as jsonl_file:
+                jsonl_file.write(json.dumps(asdict(span)) + "\n")
+
+        self.__chrome_trace_events.append(
+            {
+                "name": span.name,
+                "ph": "X",
+                "ts": span.start_timestamp * 1_000_000,
+                "dur": span.duration_seconds * 1_000_000,
+                "pid": getpid(),
+                "tid": span.thread_id,
+                "args": {"peak_rss_mb": span.peak_rss_mb, "start_rss_mb": span.start_rss_mb, "end_rss_mb": span.end_rss_mb},
+            }
+        )
+
+    def record_rss_sample(self, timestamp: float, rss_bytes: int) -> None:
+        if abs(rss_bytes - self.__last_rss_sample_bytes) < MIN_RSS_SAMPLE_CHANGE_BYTES:
+            return
+
+        self.__last_rss_sample_bytes = rss_bytes
+        self.__chrome_trace_events.append(
+            {
+                "name": "rss_mb",
+                "ph": "C",
+                "ts": timestamp * 1_000_000,
+                "pid": getpid(),
+                "args": {"rss_mb": rss_bytes / BYTES_IN_MB},
+            }
+        )
+
+
+# One background thread samples the RSS of the process while any span is active and raises the peak of all active spans,
+# so the peak within a span (e.g. in the middle of a cross join) is not missed
+class PeakRssSampler:
+    def __init__(self) -> None:
+        self.__process = psutil.Process()
+        self.__lock = threading.Lock()
+        self.__active_spans: list[ActiveSpan] = []
+        self.__thread: threading.Thread | None = None
+        self.__is_stopped = threading.Event()
+
+    def get_rss_bytes(self) -> int:
+        return self.__process.memory_info().rss
+
+    def add(self, active_span: ActiveSpan) -> None:
+        with self.__lock:
+            self.__active_spans.append(active_span)
+
+            # Each thread gets its own stop event, so a thread being stopped never keeps running for a new span
+            if self.__thread is None:
+                self.__is_stopped = threading.Event()
+                self.__thread = threading.Thread(
+                    target=self.__sample, args=(self.__is_stopped,), name="PeakRssSampler", daemon=True
+                )
+                self.__thread.start()
+
+    def remove(self, active_span: ActiveSpan) -> None:
+        self.__update_peaks(self.get_rss_bytes())
+
+        with self.__lock:
+            self.__active_spans.remove(active_span)
+            thread = self.__thread if not self.__active_spans else None
+            if thread is not None:
+                self.__thread = None
+                self.__is_stopped.set()
+
+        if thread is not None:
+            thread.join()
+
+    def __sample(self, is_stopped: threading.Event) -> None:
+        while not is_stopped.wait(RSS_SAMPLING_INTERVAL_SECONDS):
+            rss_bytes = self.get_rss_bytes()
+            self.__update_peaks(rss_bytes)
+
+            for span_recorder in list(span_recorders):
+                span_recorder.record_rss_sample(time.time(), rss_bytes)
+
+    def __update_peaks(self, rss_bytes: int) -> None:
+        with self.__lock:
+            for active_span in self.__active_spans:
+                active_span.peak_rss_bytes = max(active_span.peak_rss_bytes, rss_bytes)
+
+
+span_recorders: list[SpanRecorder] = []
+peak_rss_sampler = PeakRssSampler()
+active_span_stacks = threading.local()
+
 
 @contextmanager
 def TimeTracker(action_name: str) -> Generator[Any, Any, Any]:
-    process = psutil.Process()
-    start_time = time.time()
-    start_memory = process.memory_info().rss / 1024 / 1024  # Convert to MB
+    span_stack: list[ActiveSpan] = active_span_stacks.__dict__.setdefault("stack", [])
+    parent_span = span_stack[-1] if span_stack else None
+    start_rss_bytes = peak_rss_sampler.get_rss_bytes()
+    active_span = ActiveSpan(
+        action_name,
+        f"{parent_span.path} / {action_name}" if parent_span is not None else action_name,
+        len(span_stack),
+        time.time(),
+        time.perf_counter(),
+        start_rss_bytes,
+        start_rss_bytes,
+    )
+    indentation = "  " * active_span.depth
     start_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    print(f"[{start_timestamp}] Starting '{action_name}'...", end="\r")
+    print(f"{indentation}[{start_timestamp}] Starting '{action_name}'...", end="\r")
 
-    yield
+    span_stack.append(active_span)
+    peak_rss_sampler.add(active_span)
+    try:
+        yield
+    finally:
+        peak_rss_sampler.remove(active_span)
+        span_stack.pop()
+
+    span = Span(
+        action_name,
+        active_span.path,
+        active_span.depth,
+        threading.get_ident(),
+        active_span.start_timestamp,
+        time.perf_counter() - active_span.start_perf_counter,
+        start_rss_bytes / BYTES_IN_MB,
+        peak_rss_sampler.get_rss_bytes() / BYTES_IN_MB,
+        active_span.peak_rss_bytes / BYTES_IN_MB,
+    )
+    for span_recorder in list(span_recorders):
+        span_recorder.record_span(span)
 
-    end_time = time.time()
-    end_memory = process.memory_info().rss / 1024 / 1024
-    elapsed_time = end_time - start_time
-    max_memory_usage = max(start_memory, end_memory)
     end_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     print(
-        f"[{end_timestamp}] Finished '{action_name}' in {elapsed_time:.4f} seconds "
-        f"with max memory usage of {max_memory_usage:.2f} MB."
+        f"{indentation}[{end_timestamp}] Finished '{action_name}' in {span.duration_seconds:.4f} seconds "
+        f"with max memory usage of {span.peak_rss_mb:.2f} MB."
     )
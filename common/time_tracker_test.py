@@ -0,0 +1,66 @@
+import json
+from tempfile import TemporaryDirectory
+from time import sleep
+from unittest import TestCase
+
+import numpy as np
+
+from common.time_tracker import RSS_SAMPLING_INTERVAL_SECONDS, SpanRecorder, TimeTracker
+
+ALLOCATED_BYTES = 200 * 1024 * 1024
+
+
+class TestTimeTracker(TestCase):
+    # - Given nested TimeTrackers
+    # -- When recording their spans
+    # --- It should record the children before their parent with the path of the enclosing spans
+    def test_nested_spans(self) -> None:
+        with SpanRecorder() as span_recorder:
+            with TimeTracker("Preprocessing"):
+                with TimeTracker("Generating"):
+                    pass
+                with TimeTracker("Processing"):
+                    pass
+
+        self.assertEqual(
+            [(span.name, span.path, span.depth) for span in span_recorder.spans],
+            [
+                ("Generating", "Preprocessing / Generating", 1),
+                ("Processing", "Preprocessing / Processing", 1),
+                ("Preprocessing", "Preprocessing", 0),
+            ],
+        )
+        self.assertGreaterEqual(span_recorder.spans[2].duration_seconds, span_recorder.spans[0].duration_seconds)
+
+    # - Given memory that is allocated and released within a span
+    # -- When the span finishes
+    # --- It should report the peak RSS in the middle of the span, not only the RSS at its start and end
+    def test_peak_rss_is_sampled_within_span(self) -> None:
+        with SpanRecorder() as span_recorder, TimeTracker("Allocating"):
+            allocated = np.ones(ALLOCATED_BYTES, dtype=np.uint8)
+            self.assertEqual(int(allocated[-1]), 1)
+            sleep(10 * RSS_SAMPLING_INTERVAL_SECONDS)  # gives the sampler time to see it
+            del allocated
+
+        span = span_recorder.spans[0]
+        self.assertGreater(span.peak_rss_mb - max(span.start_rss_mb, span.end_rss_mb), 0.5 * ALLOCATED_BYTES / 1024 / 1024)
+
+    # - Given a SpanRecorder with JSON lines and Chrome trace outputs
+    # -- When spans finish
+    # --- It should write one JSON line per span and a Chrome trace with complete events
+    def test_writes_jsonl_and_chrome_trace(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            jsonl_path = f"{tmp_dir}/spans.jsonl"
+            chrome_trace_path = f"{tmp_dir}/trace.json"
+
+            with SpanRecorder(jsonl_path, chrome_trace_path), TimeTracker("Outer"), TimeTracker("Inner"):
+                pass
+
+            with open(jsonl_path, encoding="utf-8") as jsonl_file:
+                spans = [json.loads(line) for line in jsonl_file]
+            with open(chrome_trace_path, encoding="utf-8") as chrome_trace_file:
+                trace_events = json.load(chrome_trace_file)["traceEvents"]
+
+        self.assertEqual([span["path"] for span in spans], ["Outer / Inner", "Outer"])
+        self.assertEqual([event["name"] for event in trace_events if event["ph"] == "X"], ["Inner", "Outer"])
+        self.assertTrue(all("peak_rss_mb" in event["args"] for event in trace_events if event["ph"] == "X"))
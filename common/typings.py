@@ -39,6 +39,14 @@ class NewColumn(StrEnum):
     VACCINE_STATUS = "vaccine_status"
 
 
+class AggregatedColumn(StrEnum):
+    PERSON_PERIODS = "person_periods"
+
+
+# Dimensions of the aggregated person-time cube (besides the time period)
+CUBE_DIMENSIONS = [NewColumn.AGE, NewColumn.VACCINE_STATUS, NewColumn.DEATH_STATUS]
+
+
 MAX_TIME_PERIOD_VALUE = 1_000  # there cant be more than 1000 time periods (weeks/years)
 
 
@@ -0,0 +1,148 @@
+from enum import StrEnum
+
+import numpy as np
+from polars import DataFrame, Int32, Int64, Schema, Series, UInt32, col, concat, int_ranges, lit
+
+from common.person_period_template_generator.person_period_template_generator import (
+    PersonDfSchema,
+    PersonPeriodTemplateExpander,
+    TempColumn,
+)
+from common.polars_expressions.vaccine_status_expression import VaccineStatusExpression
+from common.typings import AggregatedColumn, NewColumn
+
+
+class EpisodeColumn(StrEnum):
+    START_INDEX = "start_index"
+    END_INDEX = "end_index"  # inclusive
+    RUN = "run"
+    DELTA = "delta"
+
+
+VaccineEpisodeDfSchema = Schema(
+    {
+        NewColumn.PERSON_ID.value: UInt32,
+        NewColumn.VACCINE_STATUS.value: Int32,
+        EpisodeColumn.START_INDEX.value: Int64,
+        EpisodeColumn.END_INDEX.value: Int64,
+    }
+)
+
+
+# Run-length representation of the vaccine status: one row per person and run of time periods with the same status, from
+# the first time period through the death period (or the last time period). A status can only change at a dose or when the
+# 4 weeks (1 month) after dose 1-3 are over, so there are at most 8 episodes per person instead of one row per time period.
+class VaccineEpisodeBuilder:
+    def build(self, persons_df: DataFrame, num_of_time_periods: int, is_using_months: bool = False) -> DataFrame:
+        assert persons_df.schema == PersonDfSchema
+
+        time_period_amount = 1 if is_using_months else 4
+        # Exclusive end of each person's time periods, 0 for persons who died before them
+        ends = persons_df[TempColumn.DEATH_INDEX].clip(upper_bound=num_of_time_periods - 1).clip(lower_bound=-1).to_numpy() + 1
+
+        # Same sorting of the change points as in IntervalPersonTimeEngine, clipped to each person's own time periods
+        change_points = (
+            persons_df.select(
+                expr.fill_null(num_of_time_periods).alias(f"{EpisodeColumn.START_INDEX}_{i}")
+                for i, expr in enumerate(
+                    [
+                        lit(0, Int64),
+                        col(TempColumn.DOSE_1),
+                        col(TempColumn.DOSE_1) + time_period_amount,
+                        col(TempColumn.DOSE_2),
+                        col(TempColumn.DOSE_2) + time_period_amount,
+                        col(TempColumn.DOSE_3),
+                        col(TempColumn.DOSE_3) + time_period_amount,
+                        col(TempColumn.DOSE_4),
+                    ]
+                )
+            )
+            .to_numpy()
+            .astype(np.int64)
+        )
+        change_points = np.column_stack([np.clip(change_points, 0, ends[:, None]), ends])
+        change_points.sort(axis=1)
+
+        segment_starts, segment_ends = change_points[:, :-1], change_points[:, 1:]
+        person_rows, segment_cols = np.nonzero(segment_starts < segment_ends)
+
+        segments_df = persons_df[person_rows].with_columns(
+            Series(TempColumn.TIME_PERIOD_INDEX, segment_starts[person_rows, segment_cols], dtype=Int64),
+            Series(EpisodeColumn.END_INDEX, segment_ends[person_rows, segment_cols] - 1, dtype=Int64),
+        )
+
+        # Neighbouring segments with the same status (e.g. dose 2 given within 4 weeks of dose 1) form one episode
+        return (
+            segments_df.select(
+                NewColumn.PERSON_ID,
+                VaccineStatusExpression.get_expr(time_period_amount).alias(NewColumn.VACCINE_STATUS),
+                col(TempColumn.TIME_PERIOD_INDEX).alias(EpisodeColumn.START_INDEX),
+                EpisodeColumn.END_INDEX,
+            )
+            .with_columns(col(NewColumn.VACCINE_STATUS).rle_id().over(NewColumn.PERSON_ID).alias(EpisodeColumn.RUN))
+            .group_by(NewColumn.PERSON_ID, EpisodeColumn.RUN, maintain_order=True)
+            .agg(
+                col(NewColumn.VACCINE_STATUS).first(),
+                col(EpisodeColumn.START_INDEX).min(),
+                col(EpisodeColumn.END_INDEX).max(),
+            )
+            .select(VaccineEpisodeDfSchema.names())
+        )
+
+    # One row per person and time period of the episodes (the vaccine status of the processed rows)
+    def expand(self, episodes_df: DataFrame) -> DataFrame:
+        return (
+            episodes_df.with_columns(
+                int_ranges(col(EpisodeColumn.START_INDEX), col(EpisodeColumn.END_INDEX) + 1).alias(TempColumn.TIME_PERIOD_INDEX)
+            )
+            .explode(TempColumn.TIME_PERIOD_INDEX)
+            .select(NewColumn.PERSON_ID, TempColumn.TIME_PERIOD_INDEX, NewColumn.VACCINE_STATUS)
+        )
+
+    # Person-periods per vaccine status over all time periods
+    def sum_person_periods(self, episodes_df: DataFrame) -> DataFrame:
+        return (
+            episodes_df.group_by(NewColumn.VACCINE_STATUS)
+            .agg((col(EpisodeColumn.END_INDEX) - col(EpisodeColumn.START_INDEX) + 1).sum().alias(AggregatedColumn.PERSON_PERIODS))
+            .sort(NewColumn.VACCINE_STATUS)
+        )
+
+    # Person-periods per time period and vaccine status, spread from the episodes with cumulative sums of +1/-1 events
+    # (like the segments of IntervalPersonTimeEngine) instead of expanding them
+    def count_person_periods(self, episodes_df: DataFrame, time_periods: list[str]) -> DataFrame:
+        deltas_df = (
+            concat(
+                [
+                    episodes_df.select(
+                        NewColumn.VACCINE_STATUS,
+                        col(EpisodeColumn.START_INDEX).alias(TempColumn.TIME_PERIOD_INDEX),
+                        lit(1, Int64).alias(EpisodeColumn.DELTA),
+                    ),
+                    episodes_df.select(
+                        NewColumn.VACCINE_STATUS,
+                        (col(EpisodeColumn.END_INDEX) + 1).alias(TempColumn.TIME_PERIOD_INDEX),
+                        lit(-1, Int64).alias(EpisodeColumn.DELTA),
+                    ),
+                ]
+            )
+            .group_by(NewColumn.VACCINE_STATUS, TempColumn.TIME_PERIOD_INDEX)
+            .agg(col(EpisodeColumn.DELTA).sum())
+        )
+
+        return (
+            deltas_df.select(NewColumn.VACCINE_STATUS)
+            .unique()
+            .join(PersonPeriodTemplateExpander.get_time_periods_df(time_periods), how="cross")
+            .join(deltas_df, on=[NewColumn.VACCINE_STATUS, TempColumn.TIME_PERIOD_INDEX], how="left")
+            .sort(NewColumn.VACCINE_STATUS, TempColumn.TIME_PERIOD_INDEX)
+            .with_columns(
+                col(EpisodeColumn.DELTA)
+                .fill_null(0)
+                .cum_sum()
+                .over(NewColumn.VACCINE_STATUS)
+                .cast(UInt32)
+                .alias(AggregatedColumn.PERSON_PERIODS)
+            )
+            .filter(col(AggregatedColumn.PERSON_PERIODS) > 0)
+            .select(NewColumn.TIME_PERIOD, NewColumn.VACCINE_STATUS, AggregatedColumn.PERSON_PERIODS)
+        )
@@ -0,0 +1,131 @@
+import random
+from datetime import datetime
+from unittest import TestCase
+
+from polars import DataFrame, col
+from polars import len as polars_len
+
+from common.person_period_template_generator.person_period_template_generator import (
+    PersonDfSchema,
+    PersonPeriodTemplateExpander,
+    TempColumn,
+)
+from common.polars_expressions.vaccine_status_expression import VaccineStatusExpression
+from common.time_period.time_period_helper import TimePeriodHelper
+from common.typings import MAX_TIME_PERIOD_VALUE, AggregatedColumn, NewColumn, VaccineStatus
+from common.vaccine_episode.vaccine_episode_builder import VaccineEpisodeBuilder, VaccineEpisodeDfSchema
+
+DOSE_COLUMNS = [TempColumn.DOSE_1, TempColumn.DOSE_2, TempColumn.DOSE_3, TempColumn.DOSE_4]
+
+
+class TestVaccineEpisodeBuilder(TestCase):
+    def setUp(self) -> None:
+        self.__builder = VaccineEpisodeBuilder()
+        self.__weeks = TimePeriodHelper.get_weeks_in_range(datetime(2020, 1, 1), datetime(2022, 12, 31))
+        self.__months = TimePeriodHelper.get_months_in_range(datetime(2020, 1, 1), datetime(2022, 12, 31))
+
+    # - Given a person with two doses who dies within the time span
+    # -- When building the vaccine episodes
+    # --- It should return one episode per status, through the death period
+    def test_build_should_split_time_periods_at_status_changes(self) -> None:
+        persons_df = self.__create_persons_df(doses=[[5], [20], [None], [None]], death_indices=[30])
+
+        result = self.__builder.build(persons_df, len(self.__weeks))
+
+        self.assertEqual(result.schema, VaccineEpisodeDfSchema)
+        self.assertEqual(
+            result.rows(),
+            [
+                (1, VaccineStatus.UNVACCINATED.value, 0, 4),
+                (1, VaccineStatus.LESS_THAN_4_WEEKS_FROM_DOSE_1.value, 5, 8),
+                (1, VaccineStatus.MORE_THAN_4_WEEKS_FROM_DOSE_1.value, 9, 19),
+                (1, VaccineStatus.LESS_THAN_4_WEEKS_FROM_DOSE_2.value, 20, 23),
+                (1, VaccineStatus.MORE_THAN_4_WEEKS_FROM_DOSE_2.value, 24, 30),
+            ],
+        )
+
+    # - Given a person who died before the time span and a person who was vaccinated before it
+    # -- When building the vaccine episodes
+    # --- It should return no episode for the first and a single episode over all time periods for the second
+    def test_build_should_handle_persons_outside_time_span(self) -> None:
+        persons_df = self.__create_persons_df(
+            doses=[[None, -20], [None, -10], [None, None], [None, None]], death_indices=[-1, MAX_TIME_PERIOD_VALUE]
+        )
+
+        result = self.__builder.build(persons_df, len(self.__weeks))
+
+        self.assertEqual(result.rows(), [(2, VaccineStatus.MORE_THAN_4_WEEKS_FROM_DOSE_2.value, 0, len(self.__weeks) - 1)])
+
+    # - Given randomly generated persons (in weeks and in months)
+    # -- When expanding their vaccine episodes
+    # --- It should match VaccineStatusExpression on every alive person-period of the cross join
+    def test_expand_should_match_vaccine_status_expression(self) -> None:
+        for time_periods, is_using_months in [(self.__weeks, False), (self.__months, True)]:
+            with self.subTest(is_using_months=is_using_months):
+                persons_df = self.__create_random_persons_df(len(time_periods))
+
+                result = self.__builder.expand(self.__builder.build(persons_df, len(time_periods), is_using_months))
+
+                expected = (
+                    PersonPeriodTemplateExpander.expand(persons_df, time_periods)
+                    .filter(col(TempColumn.TIME_PERIOD_INDEX) <= col(TempColumn.DEATH_INDEX))
+                    .select(
+                        NewColumn.PERSON_ID,
+                        TempColumn.TIME_PERIOD_INDEX,
+                        VaccineStatusExpression.get_expr(1 if is_using_months else 4).alias(NewColumn.VACCINE_STATUS),
+                    )
+                )
+                self.assertTrue(result.sort("*").equals(expected.sort("*")))
+
+    # - Given the vaccine episodes of randomly generated persons
+    # -- When aggregating their person-time
+    # --- It should count the same person-periods as the expanded episodes
+    def test_aggregations_should_match_expanded_episodes(self) -> None:
+        persons_df = self.__create_random_persons_df(len(self.__weeks))
+        episodes_df = self.__builder.build(persons_df, len(self.__weeks))
+        expanded_df = self.__builder.expand(episodes_df).join(
+            PersonPeriodTemplateExpander.get_time_periods_df(self.__weeks), on=TempColumn.TIME_PERIOD_INDEX
+        )
+
+        per_time_period = self.__builder.count_person_periods(episodes_df, self.__weeks)
+        total = self.__builder.sum_person_periods(episodes_df)
+
+        dimensions = [NewColumn.TIME_PERIOD, NewColumn.VACCINE_STATUS]
+        self.assertEqual(
+            per_time_period.sort(dimensions).rows(),
+            expanded_df.group_by(dimensions).agg(polars_len().alias(AggregatedColumn.PERSON_PERIODS)).sort(dimensions).rows(),
+        )
+        self.assertEqual(
+            total.rows(),
+            expanded_df.group_by(NewColumn.VACCINE_STATUS)
+            .agg(polars_len().alias(AggregatedColumn.PERSON_PERIODS))
+            .sort(NewColumn.VACCINE_STATUS)
+            .rows(),
+        )
+
+    def __create_random_persons_df(self, num_of_time_periods: int) -> DataFrame:
+        rng = random.Random(11)
+        num_of_persons = 300
+
+        def random_dose() -> int | None:
+            return rng.randrange(-10, num_of_time_periods) if rng.random() < 0.7 else None
+
+        return self.__create_persons_df(
+            doses=[[random_dose() for _ in range(num_of_persons)] for _ in DOSE_COLUMNS],
+            death_indices=[
+                rng.choice([-1, MAX_TIME_PERIOD_VALUE, rng.randrange(num_of_time_periods)]) for _ in range(num_of_persons)
+            ],
+        )
+
+    def __create_persons_df(self, doses: list[list[int | None]], death_indices: list[int]) -> DataFrame:
+        num_of_persons = len(death_indices)
+
+        return DataFrame(
+            {
+                TempColumn.PERSON_ID: list(range(1, num_of_persons + 1)),
+                TempColumn.BIRTHDATE: ["1950W01"] * num_of_persons,
+                **dict(zip(DOSE_COLUMNS, doses, strict=True)),
+                TempColumn.DEATH_INDEX: death_indices,
+            },
+            schema=PersonDfSchema,
+        )
@@ -1,38 +1,423 @@
+from collections.abc import Mapping
+from dataclasses import dataclass
 from datetime import datetime
+from os import environ
 
-from polars import read_csv
+from polars import DataFrame, LazyFrame, Schema, Series, col, concat
 
-from common.file_storage.dataframe_storage import ArrowPolarsDataframeStorage
-from common.file_storage.file_storage import LocalFileStorage
+from common.acm_calculator.acm_index import ACMIndex
+from common.artifact_cache.artifact_cache import ARTIFACT_CACHE_DIRECTORY, MAX_ARTIFACT_CACHE_SIZE_BYTES, ArtifactCache
+from common.file_storage.dataframe_storage import ArrowPolarsDataframeStorage, DataframeFormat
+from common.file_storage.file_storage import LocalFileStorage, StoredFile
+from common.incremental_update.person_change_detector import PersonChangeColumn, PersonChangeDetector
 from common.person_period_processor.person_period_template_processor import PersonPeriodTemplateProcessor
-from common.person_period_template_generator.cpzp_person_period_template_generator import CpzpPersonPeriodTemplateGenerator
-from common.person_period_template_generator.ozp_person_period_template_generator import OzpPersonPeriodTemplateGenerator
-from common.time_tracker import TimeTracker
+from common.person_period_template_generator.cpzp_person_period_template_generator import (
+    CpzpPersonPeriodTemplateGenerator,
+    CpzpUsedDfSchema,
+)
+from common.person_period_template_generator.ozp_person_period_template_generator import (
+    OzpPersonPeriodTemplateGenerator,
+    OzpUsedDfSchema,
+)
+from common.person_period_template_generator.person_period_template_generator import (
+    PersonPeriodTemplateExpander,
+    PersonPeriodTemplateGenerator,
+    TempColumn,
+)
+from common.person_sharding.person_shard_planner import DEFAULT_BYTES_PER_PERSON_PERIOD, PersonShard, PersonShardPlanner
+from common.person_time_engine.interval_person_time_engine import IntervalPersonTimeEngine
+from common.polars_expressions.age_group_expression import AgeGroupExpression
+from common.polars_expressions.death_status_expression import DeathStatusExpression
+from common.polars_expressions.vaccine_status_expression import VaccineStatusExpression
+from common.query_profiler.query_profiler import QueryProfiler
+from common.raw_data_loader.cached_csv_loader import CachedCsvLoader
+from common.time_period.time_period_helper import TimePartitionColumn, TimePeriodHelper
+from common.time_tracker import SpanRecorder, TimeTracker
+from common.typings import NewColumn
+from common.vaccine_episode.vaccine_episode_builder import VaccineEpisodeBuilder
 
 FROM_DATE = datetime(2020, 1, 1)
 TO_DATE = datetime(2022, 12, 30)
+STREAMING_CHUNK_SIZE = 100_000  # rows per streamed batch (polars morsel size), bounds the peak memory instead of the dataset size
 
+IS_USING_PERSON_SHARDS = True  # process persons in shards (one part file per shard in each time partition)
+MEMORY_BUDGET_BYTES: int | None = None  # None = half of the currently available RAM
+BYTES_PER_PERSON_PERIOD = DEFAULT_BYTES_PER_PERSON_PERIOD  # peak memory per template row used to size the shards
+DATAFRAME_FORMAT = DataframeFormat.PARQUET  # IPC: larger uncompressed files, but memory mapped and near-instant to reopen
+IS_USING_COMPACT_SCHEMA = False  # enum/UInt8/UInt16 columns and a separate "<name>_time_periods" dictionary file
+IS_GENERATING_ELIGIBLE_PERIODS_ONLY = False  # only the rows from turning 60 through death (no <60 or after_death rows)
+IS_APPENDING_NEW_PERIODS = False  # extend the stored output with the new periods of a new delivery instead of rebuilding it
+QUERY_PROFILE_DIRECTORY: str | None = None  # e.g. "./out/query_profiles/": profile the queries of the first shard instead
+TRACE_DIRECTORY: str | None = None  # e.g. "./out/traces/": nested TimeTracker spans as JSON lines and as a Chrome trace
 
-def main() -> None:
-    cpzp_person_week_generator = CpzpPersonPeriodTemplateGenerator(FROM_DATE, TO_DATE)
-    ozp_person_month_generator = OzpPersonPeriodTemplateGenerator(FROM_DATE, TO_DATE)
-    processor = PersonPeriodTemplateProcessor()
-    file_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), "./data/")
 
-    cpzp_df = read_csv("./data/raw/CPZP.csv", separator=";")
-    ozp_df = read_csv("./data/raw/OZP.csv", separator=";")
+# Part file of the persons recomputed by DataPreprocessor.append, sorted after the part files of the shards
+DELTA_PARTITION_INDEX = 99_999
+
+
+@dataclass(frozen=True)
+class ProcessedDataset:
+    file_name: str
+    time_periods: list[str]
+    is_using_months: bool
+
+
+class DataPreprocessor:
+    def __init__(
+        self,
+        processor: PersonPeriodTemplateProcessor,
+        file_storage: ArrowPolarsDataframeStorage,
+        shard_planner: PersonShardPlanner | None = None,
+        is_compact: bool = False,
+        is_eligible_only: bool = False,
+    ) -> None:
+        self.__processor = processor
+        self.__file_storage = file_storage
+        self.__shard_planner = shard_planner
+        self.__is_compact = is_compact
+        self.__is_eligible_only = is_eligible_only
+        self.__person_time_engine = IntervalPersonTimeEngine()
+        self.__person_change_detector = PersonChangeDetector()
+        self.__vaccine_episode_builder = VaccineEpisodeBuilder()
+
+    def preprocess(
+        self, generator: PersonPeriodTemplateGenerator, base_lf: LazyFrame, file_name: str, is_using_months: bool
+    ) -> list[StoredFile]:
+        # Stale part files of a previous run would otherwise be read together with (or instead of) the new output, and
+        # without the persons snapshot an incomplete output cannot be appended to
+        self.__file_storage.delete(f"{file_name}_persons")
+        self.__file_storage.clear_partitions(file_name)
+        dataset = ProcessedDataset(file_name, generator.time_periods, is_using_months)
+
+        # The per-person frame is small (one row per person), so the input is parsed only once and reused for the
+        # person-time cube and for the (sharded) person-period rows
+        with TimeTracker(f"Generating persons of {file_name}"):
+            persons_df = generator.generate_persons_lazy(base_lf).collect()
+
+        return [
+            *self.__write_cube(dataset, persons_df),
+            *self.__sink_time_partitions(dataset, persons_df, TimePeriodHelper.group_by_time_partition(dataset.time_periods)),
+            *self.__write_snapshots(dataset, persons_df),
+        ]
+
+    def is_appendable(self, file_name: str) -> bool:
+        return self.__file_storage.exists(f"{file_name}_persons") and self.__file_storage.exists(f"{file_name}_time_periods")
+
+    # Extends a dataset written by preprocess() (or append()) from the same start date with the time periods up to the end
+    # date of the generator. Person IDs are row indices, so the new input has to keep the row order of the previous one
+    # (new persons at the end). Partitions with new time periods are generated for all persons, in the other partitions
+    # only the rows of the persons whose data changed within them are replaced.
+    def append(
+        self, generator: PersonPeriodTemplateGenerator, base_lf: LazyFrame, file_name: str, is_using_months: bool
+    ) -> list[StoredFile]:
+        previous_time_periods = self.__file_storage.read(f"{file_name}_time_periods")[TempColumn.TIME_PERIOD].to_list()
+        assert generator.time_periods[: len(previous_time_periods)] == previous_time_periods, (
+            "The appended time periods have to extend the previous ones"
+        )
+        dataset = ProcessedDataset(file_name, generator.time_periods, is_using_months)
+
+        with TimeTracker(f"Generating persons of {file_name}"):
+            persons_df = generator.generate_persons_lazy(base_lf).collect()
+        with TimeTracker(f"Detecting changed persons of {file_name}"):
+            changed_persons_df = self.__person_change_detector.detect(
+                self.__file_storage.read(f"{file_name}_persons"), persons_df, len(previous_time_periods)
+            )
+        first_changed_index = changed_persons_df[PersonChangeColumn.FIRST_CHANGED_INDEX].min()
+
+        time_partitions = TimePeriodHelper.group_by_time_partition(dataset.time_periods)
+        # Including the last previous partition, if it was not complete yet
+        new_time_partitions = {
+            time_partition: time_period_indices
+            for time_partition, time_period_indices in time_partitions.items()
+            if time_period_indices[-1] >= len(previous_time_periods)
+        }
+        changed_time_partitions = {
+            time_partition: time_period_indices
+            for time_partition, time_period_indices in time_partitions.items()
+            if time_partition not in new_time_partitions
+            and first_changed_index is not None
+            and time_period_indices[-1] >= first_changed_index
+        }
+
+        for year, quarter in new_time_partitions:
+            self.__file_storage.clear_partitions(file_name, self.__get_hive_keys(year, quarter))
+
+        cube_files = self.__write_cube(dataset, persons_df)
+        self.__sink_time_partitions(dataset, persons_df, new_time_partitions)
+        self.__replace_changed_persons(dataset, persons_df, changed_persons_df[TempColumn.PERSON_ID], changed_time_partitions)
+
+        return [
+            *cube_files,
+            *(StoredFile(file_path) for file_path in self.__file_storage.get_file_paths(file_name)),
+            *self.__write_snapshots(dataset, persons_df),
+        ]
+
+    # Runs the queries of the first shard with the query profiler instead of writing the dataset: the persons, the template
+    # and the processed rows are collected one after another (so the timings of each stage only cover its own nodes),
+    # then each status expression is profiled on its own and the processed rows are aggregated to the cube
+    def profile(
+        self,
+        generator: PersonPeriodTemplateGenerator,
+        base_lf: LazyFrame,
+        file_name: str,
+        is_using_months: bool,
+        query_profiler: QueryProfiler,
+    ) -> None:
+        dataset = ProcessedDataset(file_name, generator.time_periods, is_using_months)
+        persons_df = query_profiler.collect(f"{file_name}_generate_persons", generator.generate_persons_lazy(base_lf))
+        shard = self.__get_shards(dataset, persons_df)[0]
+
+        template_df = query_profiler.collect(
+            f"{file_name}_generate",
+            PersonPeriodTemplateExpander.expand_lazy(
+                self.__slice_shard(persons_df, shard).lazy(), dataset.time_periods, self.__is_compact, self.__is_eligible_only
+            ),
+        )
+        processed_df = query_profiler.collect(
+            f"{file_name}_process", self.__processor.process_lazy(template_df.lazy(), is_using_months, self.__is_compact)
+        )
+
+        for status_expr in self.__processor.get_status_exprs(is_using_months):
+            query_profiler.collect(f"{file_name}_process_{status_expr.meta.output_name()}", template_df.lazy().select(status_expr))
+
+        query_profiler.collect(f"{file_name}_aggregate", self.__processor.aggregate_lazy(processed_df.lazy()))
+
+    # The vaccine episodes (one row per person and run of time periods with the same vaccine status), the cube computed
+    # from them and its ACM index (the sums per stratum up to each time period, for the ACM of any date window)
+    def __write_cube(self, dataset: ProcessedDataset, persons_df: DataFrame) -> list[StoredFile]:
+        with TimeTracker(f"Building vaccine episodes of {dataset.file_name}"):
+            episodes_df = self.__vaccine_episode_builder.build(persons_df, len(dataset.time_periods), dataset.is_using_months)
+
+        with TimeTracker(f"Computing person-time cube of {dataset.file_name}"):
+            cube_df = self.__person_time_engine.compute_from_episodes(episodes_df, persons_df, dataset.time_periods)
+
+        with TimeTracker(f"Building ACM index of {dataset.file_name}"):
+            acm_index = ACMIndex.from_cube(cube_df, dataset.time_periods)
+
+        return [
+            self.__file_storage.write(f"{dataset.file_name}_vaccine_episodes", episodes_df),
+            self.__file_storage.write(f"{dataset.file_name}_cube", cube_df),
+            self.__file_storage.write(f"{dataset.file_name}_acm_index", acm_index.index_df),
+        ]
+
+    def __sink_time_partitions(
+        self, dataset: ProcessedDataset, persons_df: DataFrame, time_partitions: dict[tuple[int, int], list[int]]
+    ) -> list[StoredFile]:
+        stored_files: list[StoredFile] = []
+
+        shards = self.__get_shards(dataset, persons_df)
+
+        for shard in shards:
+            with TimeTracker(f"Processing shard {shard.index + 1}/{len(shards)} of {dataset.file_name}"):
+                persons_lf = self.__slice_shard(persons_df, shard).lazy()
+
+                # One part file per shard and quarter (<name>/year=YYYY/quarter=Q/part-XXXXX). Generating, processing and
+                # writing a partition is one streamed query, so they are all measured by the span of the shard
+                for (year, quarter), time_period_indices in time_partitions.items():
+                    stored_files.append(
+                        self.__file_storage.sink_partition(
+                            dataset.file_name,
+                            shard.index,
+                            self.__process_time_periods(dataset, persons_lf, time_period_indices),
+                            self.__get_hive_keys(year, quarter),
+                        )
+                    )
+
+        return stored_files
+
+    # Without a planner all persons are processed as one shard
+    def __get_shards(self, dataset: ProcessedDataset, persons_df: DataFrame) -> list[PersonShard]:
+        if self.__shard_planner is None:
+            return [PersonShard(0, 1, persons_df.height)]
+
+        return self.__shard_planner.plan(persons_df.height, len(dataset.time_periods))
+
+    # Person IDs are 1-based row indices, so a shard is a contiguous slice of the persons
+    def __slice_shard(self, persons_df: DataFrame, shard: PersonShard) -> DataFrame:
+        return persons_df.slice(shard.first_person_id - 1, shard.last_person_id - shard.first_person_id + 1)
+
+    # The changed persons are first removed from all part files of a partition and then (re)added to its delta part file,
+    # so an interrupted run can simply be repeated (the snapshots of the previous run are only replaced at the end)
+    def __replace_changed_persons(
+        self,
+        dataset: ProcessedDataset,
+        persons_df: DataFrame,
+        changed_person_ids: Series,
+        time_partitions: dict[tuple[int, int], list[int]],
+    ) -> None:
+        changed_persons_lf = persons_df.filter(col(TempColumn.PERSON_ID).is_in(changed_person_ids.implode())).lazy()
+
+        for (year, quarter), time_period_indices in time_partitions.items():
+            with TimeTracker(f"Replacing {changed_person_ids.len()} changed persons in {year}Q{quarter} of {dataset.file_name}"):
+                hive_keys = self.__get_hive_keys(year, quarter)
+                self.__file_storage.filter_partitions(
+                    dataset.file_name, ~col(NewColumn.PERSON_ID).is_in(changed_person_ids.implode()), hive_keys
+                )
+
+                delta_name = self.__file_storage.get_partition_name(dataset.file_name, DELTA_PARTITION_INDEX, hive_keys)
+                delta_lfs = [self.__file_storage.read(delta_name).lazy()] if self.__file_storage.exists(delta_name) else []
+                self.__file_storage.sink(
+                    delta_name, concat([*delta_lfs, self.__process_time_periods(dataset, changed_persons_lf, time_period_indices)])
+                )
+
+    # Only the given time periods are generated
+    def __process_time_periods(
+        self, dataset: ProcessedDataset, persons_lf: LazyFrame, time_period_indices: list[int]
+    ) -> LazyFrame:
+        template_lf = PersonPeriodTemplateExpander.expand_lazy(
+            persons_lf, dataset.time_periods, self.__is_compact, self.__is_eligible_only, time_period_indices
+        )
+
+        return self.__processor.process_lazy(template_lf, dataset.is_using_months, self.__is_compact)
+
+    # Written last, so append() only ever compares against the persons of a completely written dataset
+    def __write_snapshots(self, dataset: ProcessedDataset, persons_df: DataFrame) -> list[StoredFile]:
+        with TimeTracker(f"Writing snapshots of {dataset.file_name}"):
+            return [
+                self.__file_storage.write(
+                    f"{dataset.file_name}_time_periods", PersonPeriodTemplateExpander.get_time_periods_df(dataset.time_periods)
+                ),
+                self.__file_storage.write(f"{dataset.file_name}_persons", persons_df),
+            ]
+
+    def __get_hive_keys(self, year: int, quarter: int) -> dict[str, int]:
+        return {TimePartitionColumn.YEAR: year, TimePartitionColumn.QUARTER: quarter}
+
+
+@dataclass(frozen=True)
+class RawDataset:
+    name: str
+    generator: PersonPeriodTemplateGenerator
+    used_schema: Schema
+    is_using_months: bool
+
+
+# Skips the preprocessing when the stored output was created from the same CSV content, parameters and code
+def preprocess_dataset(data_preprocessor: DataPreprocessor, artifact_cache: ArtifactCache, raw_dataset: RawDataset) -> None:
+    csv_path = f"./data/raw/{raw_dataset.name}.csv"
+    # An appendable output is named by its start only, so a delivery reaching into a new year still extends the same output
+    file_name = (
+        f"{raw_dataset.name}_from_{FROM_DATE.year}"
+        if IS_APPENDING_NEW_PERIODS
+        else f"{raw_dataset.name}_from_{FROM_DATE.year}_to_{TO_DATE.year}"
+    )
+
+    # Profiles the queries instead of preprocessing, so the stored output (and its cache entry) stays as it is
+    if QUERY_PROFILE_DIRECTORY is not None:
+        with TimeTracker(f"Profiling {raw_dataset.name} queries"):
+            data_preprocessor.profile(
+                raw_dataset.generator,
+                CachedCsvLoader(raw_dataset.used_schema).scan(csv_path),
+                file_name,
+                raw_dataset.is_using_months,
+                QueryProfiler(LocalFileStorage(), QUERY_PROFILE_DIRECTORY),
+            )
+        return
+
+    parameters = {
+        "from_date": FROM_DATE,
+        "to_date": TO_DATE,
+        "is_using_months": raw_dataset.is_using_months,
+        "is_compact": IS_USING_COMPACT_SCHEMA,
+        "is_eligible_only": IS_GENERATING_ELIGIBLE_PERIODS_ONLY,
+        "dataframe_format": DATAFRAME_FORMAT,
+    }
+    key = ArtifactCache.create_key(
+        "preprocessing",
+        ArtifactCache.get_code_version(
+            [
+                DataPreprocessor,
+                type(raw_dataset.generator),
+                PersonPeriodTemplateExpander,
+                PersonPeriodTemplateProcessor,
+                AgeGroupExpression,
+                DeathStatusExpression,
+                VaccineStatusExpression,
+                IntervalPersonTimeEngine,
+                ACMIndex,
+                VaccineEpisodeBuilder,
+                CachedCsvLoader,
+            ]
+        ),
+        parameters,
+        [ArtifactCache.get_files_fingerprint(LocalFileStorage(), [csv_path])],
+    )
+
+    if not IS_APPENDING_NEW_PERIODS:
+        preprocess = data_preprocessor.preprocess
+    elif is_appendable_output(data_preprocessor, artifact_cache, file_name, parameters):
+        preprocess = data_preprocessor.append
+    else:
+        print(f"There is no {file_name} output built with the same parameters to append to, preprocessing it from scratch")
+        preprocess = data_preprocessor.preprocess
+
+    with TimeTracker(f"Preprocessing {raw_dataset.name} dataframe"):
+        is_reused = artifact_cache.get_or_create(
+            file_name,
+            key,
+            lambda: preprocess(
+                raw_dataset.generator,
+                # Typed scan of the used columns only, cached as parquet next to the CSV until the CSV changes
+                CachedCsvLoader(raw_dataset.used_schema).scan(csv_path),
+                file_name,
+                raw_dataset.is_using_months,
+            ),
+            parameters,
+        )
+
+    if is_reused:
+        print(f"{file_name} is up to date, reusing the stored output")
+
+
+# Appended rows are only consistent with the stored ones when the output was built with the same parameters (schema,
+# eligible-only rows, file format, ...), only the end date may differ
+def is_appendable_output(
+    data_preprocessor: DataPreprocessor, artifact_cache: ArtifactCache, file_name: str, parameters: Mapping[str, object]
+) -> bool:
+    manifest = artifact_cache.get_manifest(file_name)
+    if manifest is None or not data_preprocessor.is_appendable(file_name):
+        return False
+
+    stored_parameters = {name: value for name, value in manifest.parameters.items() if name != "to_date"}
+    current_parameters = {
+        name: value for name, value in ArtifactCache.serialize_parameters(parameters).items() if name != "to_date"
+    }
+
+    return stored_parameters == current_parameters
+
+
+def main() -> None:
+    data_preprocessor = DataPreprocessor(
+        PersonPeriodTemplateProcessor(),
+        ArrowPolarsDataframeStorage(LocalFileStorage(), "./data/", DATAFRAME_FORMAT),
+        PersonShardPlanner(MEMORY_BUDGET_BYTES, BYTES_PER_PERSON_PERIOD) if IS_USING_PERSON_SHARDS else None,
+        IS_USING_COMPACT_SCHEMA,
+        IS_GENERATING_ELIGIBLE_PERIODS_ONLY,
+    )
+    artifact_cache = ArtifactCache(LocalFileStorage(), ARTIFACT_CACHE_DIRECTORY, MAX_ARTIFACT_CACHE_SIZE_BYTES)
 
-    with TimeTracker("Preprocessing CPZP dataframe"):
-        cpzp_df = cpzp_person_week_generator.generate(cpzp_df)
-        cpzp_processed_df = processor.process(cpzp_df, is_using_months=False)
+    # Without a trace directory the spans are only printed
+    span_recorder = (
+        SpanRecorder(f"{TRACE_DIRECTORY}data_preprocessor_spans.jsonl", f"{TRACE_DIRECTORY}data_preprocessor_trace.json")
+        if TRACE_DIRECTORY is not None
+        else SpanRecorder()
+    )
 
-    with TimeTracker("Preprocessing OZP dataframe"):
-        ozp_df = ozp_person_month_generator.generate(ozp_df)
-        ozp_processed_df = processor.process(ozp_df, is_using_months=True)
+    # The streaming engine ignores Config(streaming_chunk_size=...) and reads its batch size from the environment, only once
+    # at the first streamed query of the process
+    environ["POLARS_IDEAL_MORSEL_SIZE"] = str(STREAMING_CHUNK_SIZE)
 
-    with TimeTracker("Writing both dataframes"):
-        file_storage.write(f"CPZP_from_{FROM_DATE.year}_to_{TO_DATE.year}", cpzp_processed_df)
-        file_storage.write(f"OZP_from_{FROM_DATE.year}_to_{TO_DATE.year}", ozp_processed_df)
+    with span_recorder:
+        preprocess_dataset(
+            data_preprocessor,
+            artifact_cache,
+            RawDataset("CPZP", CpzpPersonPeriodTemplateGenerator(FROM_DATE, TO_DATE), CpzpUsedDfSchema, is_using_months=False),
+        )
+        preprocess_dataset(
+            data_preprocessor,
+            artifact_cache,
+            RawDataset("OZP", OzpPersonPeriodTemplateGenerator(FROM_DATE, TO_DATE), OzpUsedDfSchema, is_using_months=True),
+        )
 
 
 if __name__ == "__main__":
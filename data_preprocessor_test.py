@@ -0,0 +1,212 @@
+import random
+from datetime import datetime
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from polars import DataFrame, col, lit, when
+
+from common.artifact_cache.artifact_cache import ArtifactCache
+from common.file_storage.dataframe_storage import ArrowPolarsDataframeStorage, DataframeFormat
+from common.file_storage.file_storage import LocalFileStorage, StoredFile
+from common.person_period_processor.person_period_template_processor import PersonPeriodTemplateProcessor
+from common.person_period_template_generator.cpzp_person_period_template_generator import (
+    CpzpBaseColumn,
+    CpzpPersonPeriodTemplateGenerator,
+)
+from common.person_sharding.person_shard_planner import DEFAULT_BYTES_PER_PERSON_PERIOD, PersonShardPlanner
+from common.query_profiler.query_profiler import ProfileColumn, QueryProfiler
+from common.time_period.time_period_helper import TimePartitionColumn
+from common.typings import AliveStatus, NewColumn
+from data_preprocessor import DataPreprocessor, is_appendable_output
+
+
+class TestDataPreprocessor(TestCase):
+    def setUp(self) -> None:
+        self.__generator = CpzpPersonPeriodTemplateGenerator(datetime(2021, 1, 1), datetime(2021, 12, 31))
+        self.__base_df = self.__create_random_cpzp_df(num_of_rows=500)
+
+    # - Given the same input
+    # -- When preprocessing it with and without person shards (default and compact schema)
+    # --- It should produce the same processed dataframe
+    def test_sharded_output_matches_single_file_output(self) -> None:
+        for is_compact in [False, True]:
+            with self.subTest(is_compact=is_compact), TemporaryDirectory() as tmp_dir:
+                file_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), f"{tmp_dir}/")
+                # Budget for ~100 persons per shard, so the 500 persons are split into several part files
+                shard_planner = PersonShardPlanner(
+                    memory_budget_bytes=100 * len(self.__generator.time_periods) * DEFAULT_BYTES_PER_PERSON_PERIOD
+                )
+
+                self.__preprocess(DataPreprocessor(PersonPeriodTemplateProcessor(), file_storage, None, is_compact), "single")
+                self.__preprocess(
+                    DataPreprocessor(PersonPeriodTemplateProcessor(), file_storage, shard_planner, is_compact), "sharded"
+                )
+
+                single_df = file_storage.read("single").sort("*")
+                sharded_df = file_storage.read("sharded").sort("*")
+
+                # 5 shards in each of the 5 quarters of the 2020W53-2021W52 time periods
+                self.assertEqual(len(LocalFileStorage().list_files(f"{tmp_dir}/sharded", is_recursive=True)), 25)
+                self.assertGreater(single_df.height, 0)
+                self.assertTrue(single_df.equals(sharded_df))
+
+    # - When preprocessing the input
+    # -- It should also write the person-time cube, equal to the aggregated processed rows
+    def test_cube_matches_aggregated_processed_rows(self) -> None:
+        processor = PersonPeriodTemplateProcessor()
+        with TemporaryDirectory() as tmp_dir:
+            file_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), f"{tmp_dir}/")
+
+            self.__preprocess(DataPreprocessor(processor, file_storage), "processed")
+
+            cube_df = file_storage.read("processed_cube").sort("*")
+            aggregated_df = processor.aggregate(file_storage.read("processed")).select(cube_df.columns).sort("*")
+
+            self.assertGreater(cube_df.height, 0)
+            self.assertTrue(cube_df.equals(aggregated_df))
+
+    # - Given the eligible-only generation
+    # -- When preprocessing the input
+    # --- It should write the same processed rows without the after_death ones and the same cube
+    def test_eligible_only_output_matches_output_without_after_death_rows(self) -> None:
+        for is_compact in [False, True]:
+            with self.subTest(is_compact=is_compact), TemporaryDirectory() as tmp_dir:
+                file_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), f"{tmp_dir}/")
+
+                self.__preprocess(DataPreprocessor(PersonPeriodTemplateProcessor(), file_storage, None, is_compact), "full")
+                self.__preprocess(
+                    DataPreprocessor(PersonPeriodTemplateProcessor(), file_storage, None, is_compact, is_eligible_only=True),
+                    "eligible",
+                )
+
+                full_df = file_storage.read("full").filter(col(NewColumn.DEATH_STATUS) != AliveStatus.AFTER_DEATH).sort("*")
+
+                self.assertLess(file_storage.read("eligible").height, file_storage.read("full").height)
+                self.assertTrue(file_storage.read("eligible").sort("*").equals(full_df))
+                self.assertTrue(file_storage.read("eligible_cube").equals(file_storage.read("full_cube")))
+
+    # - When preprocessing the input
+    # -- It should write the processed rows partitioned by year and quarter of their time period
+    def test_output_is_partitioned_by_time(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            file_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), f"{tmp_dir}/")
+            self.__preprocess(DataPreprocessor(PersonPeriodTemplateProcessor(), file_storage), "processed")
+
+            quarter_df = (
+                file_storage.scan("processed")
+                .filter((col(TimePartitionColumn.YEAR) == 2021) & (col(TimePartitionColumn.QUARTER) == 2))
+                .select(NewColumn.TIME_PERIOD)
+                .unique()
+                .collect()
+            )
+
+            self.assertEqual(sorted(quarter_df[NewColumn.TIME_PERIOD].to_list()), [f"2021W{week}" for week in range(14, 27)])
+
+    # - Given a dataset preprocessed from a previous delivery covering fewer weeks
+    # -- When appending the new delivery (more weeks, added persons, late reported doses and deaths)
+    # --- It should produce the same output as preprocessing the new delivery from scratch
+    def test_append_matches_full_preprocessing(self) -> None:
+        previous_generator = CpzpPersonPeriodTemplateGenerator(datetime(2021, 1, 1), datetime(2021, 8, 15))
+        previous_base_df = self.__base_df.head(480).with_columns(
+            when(col(CpzpBaseColumn.VACCINE_2_DATE).cum_count() <= 10)
+            .then(lit(""))
+            .otherwise(col(CpzpBaseColumn.VACCINE_2_DATE))
+            .alias(CpzpBaseColumn.VACCINE_2_DATE),
+            when(col(CpzpBaseColumn.DEATHDATE) < "2021W10")
+            .then(lit(""))
+            .otherwise(col(CpzpBaseColumn.DEATHDATE))
+            .alias(CpzpBaseColumn.DEATHDATE),
+        )
+
+        for is_compact, shard_planner in [(False, None), (True, PersonShardPlanner(memory_budget_bytes=10**6))]:
+            with self.subTest(is_compact=is_compact), TemporaryDirectory() as tmp_dir:
+                file_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), f"{tmp_dir}/")
+                data_preprocessor = DataPreprocessor(PersonPeriodTemplateProcessor(), file_storage, shard_planner, is_compact)
+
+                data_preprocessor.preprocess(previous_generator, previous_base_df.lazy(), "appended", is_using_months=False)
+                self.assertTrue(data_preprocessor.is_appendable("appended"))
+                data_preprocessor.append(self.__generator, self.__base_df.lazy(), "appended", is_using_months=False)
+                self.__preprocess(data_preprocessor, "full")
+
+                for suffix in ["", "_cube", "_acm_index", "_vaccine_episodes", "_persons", "_time_periods"]:
+                    self.assertTrue(
+                        file_storage.read(f"appended{suffix}").sort("*").equals(file_storage.read(f"full{suffix}").sort("*"))
+                    )
+
+    # - Given a dataset preprocessed through the artifact cache
+    # -- When checking whether it can be appended to with other parameters
+    # --- It should only be appendable with the same parameters (apart from the end date) and a manifest
+    def test_is_appendable_output_requires_same_parameters(self) -> None:
+        parameters = {
+            "from_date": datetime(2021, 1, 1),
+            "to_date": datetime(2021, 8, 15),
+            "is_using_months": False,
+            "is_compact": False,
+            "is_eligible_only": False,
+            "dataframe_format": DataframeFormat.PARQUET,
+        }
+
+        with TemporaryDirectory() as tmp_dir:
+            file_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), f"{tmp_dir}/")
+            artifact_cache = ArtifactCache(LocalFileStorage(), f"{tmp_dir}/cache/")
+            data_preprocessor = DataPreprocessor(PersonPeriodTemplateProcessor(), file_storage)
+            artifact_cache.get_or_create("output", "key", lambda: self.__preprocess(data_preprocessor, "output"), parameters)
+
+            for changed_parameters, is_appendable in [
+                ({"to_date": datetime(2022, 3, 31)}, True),
+                ({"is_compact": True}, False),
+                ({"is_eligible_only": True}, False),
+                ({"dataframe_format": DataframeFormat.IPC}, False),
+            ]:
+                with self.subTest(changed_parameters=changed_parameters):
+                    self.assertEqual(
+                        is_appendable_output(data_preprocessor, artifact_cache, "output", {**parameters, **changed_parameters}),
+                        is_appendable,
+                    )
+
+            self.__preprocess(data_preprocessor, "output_without_manifest")
+            self.assertFalse(is_appendable_output(data_preprocessor, artifact_cache, "output_without_manifest", parameters))
+
+    # - Given a query profiler
+    # -- When profiling the preprocessing
+    # --- It should profile the generator and processor stages without writing the dataset
+    def test_profile_saves_stage_profiles_without_writing_dataset(self) -> None:
+        with TemporaryDirectory() as tmp_dir:
+            file_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), f"{tmp_dir}/")
+            query_profiler = QueryProfiler(LocalFileStorage(), f"{tmp_dir}/profiles/")
+
+            DataPreprocessor(PersonPeriodTemplateProcessor(), file_storage).profile(
+                self.__generator, self.__base_df.lazy(), "profiled", False, query_profiler
+            )
+
+            self.assertFalse(file_storage.exists("profiled"))
+            self.assertEqual(
+                sorted(query_profiler.get_summary_df()[ProfileColumn.STAGE].unique()),
+                [
+                    "profiled_aggregate",
+                    "profiled_generate",
+                    "profiled_generate_persons",
+                    "profiled_process",
+                    "profiled_process_age",
+                    "profiled_process_death_status",
+                    "profiled_process_vaccine_status",
+                ],
+            )
+
+    def __preprocess(self, data_preprocessor: DataPreprocessor, file_name: str) -> list[StoredFile]:
+        return data_preprocessor.preprocess(self.__generator, self.__base_df.lazy(), file_name, is_using_months=False)
+
+    def __create_random_cpzp_df(self, num_of_rows: int) -> DataFrame:
+        rng = random.Random(7)
+        weeks = self.__generator.time_periods
+
+        def random_week() -> str:
+            return rng.choice(["", *weeks])
+
+        base_data: dict[str, list[str]] = {column.value: [""] * num_of_rows for column in CpzpBaseColumn}
+        base_data[CpzpBaseColumn.BIRTHDATE] = [f"{rng.randint(1920, 1965)}W{rng.randint(1, 52):02d}" for _ in range(num_of_rows)]
+        base_data[CpzpBaseColumn.VACCINE_1_DATE] = [random_week() for _ in range(num_of_rows)]
+        base_data[CpzpBaseColumn.VACCINE_2_DATE] = [random_week() for _ in range(num_of_rows)]
+        base_data[CpzpBaseColumn.DEATHDATE] = [random_week() for _ in range(num_of_rows)]
+
+        return DataFrame(base_data)
@@ -1,87 +1,19 @@
-import random
 from datetime import datetime
 
-from polars import DataFrame, UInt32, col
-
+from common.artifact_cache.artifact_cache import ARTIFACT_CACHE_DIRECTORY, MAX_ARTIFACT_CACHE_SIZE_BYTES, ArtifactCache
+from common.cohort_simulator.chunked_cohort_simulator import ChunkedCohortSimulator
+from common.cohort_simulator.cohort_simulator import CohortSimulator, SimulationParameters
 from common.file_storage.dataframe_storage import ArrowPolarsDataframeStorage
-from common.file_storage.file_storage import LocalFileStorage
+from common.file_storage.file_storage import LocalFileStorage, StoredFile
 from common.person_period_processor.person_period_template_processor import PersonPeriodTemplateProcessor
-from common.person_period_template_generator.person_period_template_generator import TempColumn
+from common.person_period_template_generator.person_period_template_generator import PersonPeriodTemplateExpander
+from common.polars_expressions.age_group_expression import AgeGroupExpression
+from common.polars_expressions.death_status_expression import DeathStatusExpression
+from common.polars_expressions.vaccine_status_expression import VaccineStatusExpression
+from common.random_streams.random_streams import RandomStreams
 from common.time_period.time_period_helper import TimePeriodHelper
 from common.time_tracker import TimeTracker
 
-
-class Individual:
-    def __init__(self, person_id: int) -> None:
-        self.__id = person_id
-        self.__death_index = self.__assign_death()
-        self.__dose_indexes: list[int] = []
-
-    def add_dose(self, week_index: int) -> bool:
-        if self.__should_receive_dose(week_index):
-            self.__dose_indexes.append(week_index)
-            return True
-
-        return False
-
-    def to_person_period_schema(self) -> dict[TempColumn, int | str | None]:
-        return {
-            TempColumn.PERSON_ID: self.__id,
-            TempColumn.BIRTHDATE: "1900-01-05",  # mocked birthdate for 80+ y.o. group
-            TempColumn.DOSE_1: (self.__dose_indexes[0] if len(self.__dose_indexes) > 0 else None),
-            TempColumn.DOSE_2: (self.__dose_indexes[1] if len(self.__dose_indexes) > 1 else None),
-            TempColumn.DOSE_3: (self.__dose_indexes[2] if len(self.__dose_indexes) > 2 else None),
-            TempColumn.DOSE_4: NUM_OF_WEEKS + 1,
-            TempColumn.DEATH_INDEX: self.__death_index,
-        }
-
-    def __assign_death(self) -> int:
-        if random.uniform(0, 1) <= DEATH_PROBABILITY:
-            return round(random.uniform(0, NUM_OF_WEEKS))
-        return NUM_OF_WEEKS + 1
-
-    def __should_receive_dose(self, week_index: int) -> bool:
-        if self.__death_index - week_index <= HVE_WINDOW:
-            return random.uniform(0, 1) > HVE_PROBABILITY
-        return True
-
-
-class CohortSimulator:
-    def __init__(self) -> None:
-        self.__population = self.__initialize_population()
-
-    def assign_doses(self) -> None:
-        for person in self.__population:
-            if random.uniform(0, 1) < 0.82:
-                dose1_week = round(random.gauss(20, 3))
-                can_recieve_next = person.add_dose(dose1_week)
-
-                if can_recieve_next and random.uniform(0, 1) < 0.96:
-                    dose2_week = dose1_week + round(random.gauss(20, 3))
-                    can_recieve_next = person.add_dose(dose2_week)
-
-                    if can_recieve_next and random.uniform(0, 1) < 0.82:
-                        dose3_week = dose2_week + round(random.gauss(20, 3))
-                        person.add_dose(dose3_week)
-
-    def to_polars_df(self) -> DataFrame:
-        persons_df = DataFrame(
-            [p.to_person_period_schema() for p in self.__population],
-        )
-
-        weeks_df = DataFrame(
-            {
-                TempColumn.TIME_PERIOD: TIME_SPAN,
-                TempColumn.TIME_PERIOD_INDEX: list(range(len(TIME_SPAN))),
-            }
-        )
-
-        return persons_df.with_columns(col(TempColumn.PERSON_ID).cast(UInt32)).join(weeks_df, how="cross")
-
-    def __initialize_population(self) -> list[Individual]:
-        return [Individual(i) for i in range(1, NUMBER_OF_INDIVIDUALS)]
-
-
 NUMBER_OF_INDIVIDUALS = 1_700_000
 DEATH_PROBABILITY = 1 / 10
 
@@ -90,24 +22,83 @@ TIME_SPAN = TimePeriodHelper.get_weeks_in_range(datetime.fromisoformat("2021-01-
 NUM_OF_WEEKS = len(TIME_SPAN)
 HVE_WINDOW = 26
 HVE_PROBABILITY = 0.0
+SEED: int | None = 42  # the same seed gives the same (bit-identical) simulation, None = a different one on every run
+# Simulate and process the cohort in chunks of this many persons (one part file each), so the number of individuals is
+# bounded by disk instead of RAM. The chunks are seeded independently, so a chunked cohort differs from an unchunked one
+CHUNK_SIZE: int | None = None
+MAX_WORKERS: int | None = 1  # processes simulating the chunks (None = one per CPU), does not change the results
 
 
-def main() -> None:
+def simulate() -> list[StoredFile]:
     file_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), "./data/")
-
-    cohort_simulator = CohortSimulator()
+    file_name = f"HVE-{HVE_PROBABILITY}-simulation"
+
+    parameters = SimulationParameters(
+        number_of_individuals=NUMBER_OF_INDIVIDUALS,
+        num_of_weeks=NUM_OF_WEEKS,
+        death_probability=DEATH_PROBABILITY,
+        hve_window=HVE_WINDOW,
+        hve_probability=HVE_PROBABILITY,
+    )
     person_period_template_processor = PersonPeriodTemplateProcessor()
 
+    # Part files of a previous chunked run would otherwise be read instead of the single file (and the other way around)
+    file_storage.delete(file_name)
+
+    if CHUNK_SIZE is not None:
+        return ChunkedCohortSimulator(parameters, CHUNK_SIZE, SEED, MAX_WORKERS).write(file_storage, file_name, TIME_SPAN)
+
+    cohort_simulator = CohortSimulator(parameters, RandomStreams(SEED).get_rng())
+
     with TimeTracker("Running simulation"):
-        cohort_simulator.assign_doses()
+        persons_df = cohort_simulator.simulate_persons()
 
     with TimeTracker("Convert simulation results to dataframe"):
-        person_period_template = cohort_simulator.to_polars_df()
+        person_period_template = PersonPeriodTemplateExpander.expand(persons_df, TIME_SPAN)
 
     with TimeTracker("Processing person period template"):
         processed_df = person_period_template_processor.process(person_period_template)
 
-    file_storage.write(f"HVE-{HVE_PROBABILITY}-simulation", processed_df)
+    return [
+        file_storage.write(file_name, processed_df),
+        file_storage.write(f"{file_name}_cube", person_period_template_processor.aggregate(processed_df)),
+    ]
+
+
+def main() -> None:
+    # Without a seed every run is a different simulation, so there is nothing to reuse
+    if SEED is None:
+        simulate()
+        return
+
+    key = ArtifactCache.create_key(
+        "simulation",
+        ArtifactCache.get_code_version(
+            [
+                CohortSimulator,
+                ChunkedCohortSimulator,
+                RandomStreams,
+                PersonPeriodTemplateExpander,
+                PersonPeriodTemplateProcessor,
+                AgeGroupExpression,
+                DeathStatusExpression,
+                VaccineStatusExpression,
+            ]
+        ),
+        {
+            "number_of_individuals": NUMBER_OF_INDIVIDUALS,
+            "death_probability": DEATH_PROBABILITY,
+            "time_span": TIME_SPAN,
+            "hve_window": HVE_WINDOW,
+            "hve_probability": HVE_PROBABILITY,
+            "seed": SEED,
+            "chunk_size": CHUNK_SIZE,
+        },
+    )
+    artifact_cache = ArtifactCache(LocalFileStorage(), ARTIFACT_CACHE_DIRECTORY, MAX_ARTIFACT_CACHE_SIZE_BYTES)
+
+    if artifact_cache.get_or_create(f"HVE-{HVE_PROBABILITY}-simulation", key, simulate):
+        print(f"HVE-{HVE_PROBABILITY}-simulation is up to date, reusing the stored output")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,28 @@
+from common.cohort_simulator.simulation_sweep import SimulationSweep, SweepGrid
+from common.file_storage.dataframe_storage import ArrowPolarsDataframeStorage
+from common.file_storage.file_storage import LocalFileStorage
+from common.time_tracker import TimeTracker
+from simulation import NUM_OF_WEEKS, TIME_SPAN
+
+SWEEP_GRID = SweepGrid(
+    numbers_of_individuals=[1_700_000],
+    death_probabilities=[1 / 10],
+    hve_windows=[26],
+    hve_probabilities=[0.0, 0.25, 0.5, 0.75],
+)
+SEED = 42  # results are reproducible for the same seed and grid, regardless of MAX_WORKERS
+MAX_WORKERS: int | None = None  # None = one worker per CPU
+
+
+def main() -> None:
+    file_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), "./data/")
+    scenarios = SWEEP_GRID.get_scenarios(NUM_OF_WEEKS)
+
+    with TimeTracker(f"Running {len(scenarios)} simulation scenarios"):
+        sweep_df = SimulationSweep(TIME_SPAN, SEED, MAX_WORKERS).run(scenarios)
+
+    file_storage.write("HVE-sweep-simulation", sweep_df)
+
+
+if __name__ == "__main__":
+    main()
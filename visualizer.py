@@ -1,14 +1,17 @@
 from datetime import datetime
 
 import matplotlib.pyplot as plt
-from polars import DataFrame, col
+from polars import DataFrame, Series, col
 
-from common.acm_calculator.acm_calculator import ACMCalculator
+from common.acm_calculator.acm_calculator import ACMCalculator, ACMColumn, ACMResult
+from common.acm_calculator.acm_index import ACMIndex
+from common.artifact_cache.artifact_cache import ARTIFACT_CACHE_DIRECTORY, MAX_ARTIFACT_CACHE_SIZE_BYTES, ArtifactCache
 from common.file_storage.dataframe_storage import ArrowPolarsDataframeStorage
-from common.file_storage.file_storage import LocalFileStorage
-from common.time_period.time_period_helper import TimePeriodHelper
+from common.file_storage.file_storage import LocalFileStorage, StoredFile
+from common.person_period_template_generator.person_period_template_generator import TempColumn
+from common.time_period.time_period_helper import TimePartitionColumn, TimePeriodHelper
 from common.time_tracker import TimeTracker
-from common.typings import COLORS, AgeStatus, VaccineStatus
+from common.typings import COLORS, CUBE_DIMENSIONS, AgeStatus, AggregatedColumn, NewColumn, VaccineStatus
 
 
 class GraphMaker:
@@ -19,8 +22,14 @@ class GraphMaker:
         self.__acms_by_age: dict[AgeStatus, list[float]] = {}
         self.__deaths_by_age: dict[AgeStatus, list[int]] = {}
 
-    def prepare_data(self, df: DataFrame, from_date: datetime, to_date: datetime) -> None:
-        is_using_months = self.__is_df_using_months(df)
+    def prepare_data(
+        self, df: DataFrame, from_date: datetime, to_date: datetime, time_periods_df: DataFrame | None = None
+    ) -> None:
+        # Compact dataframes only contain the time period index, the labels are in the separate time_periods_df
+        is_compact = NewColumn.TIME_PERIOD not in df.columns
+        assert not is_compact or time_periods_df is not None, "Compact dataframes require the time_periods_df"
+        time_period_labels = time_periods_df["time_period"] if is_compact else df["time_period"]
+        is_using_months = self.__is_using_months(time_period_labels)
 
         time_periods = (
             TimePeriodHelper.get_months_in_range(from_date, to_date)
@@ -28,18 +37,32 @@ class GraphMaker:
             else TimePeriodHelper.get_weeks_in_range(from_date, to_date)
         )
 
-        df = df.filter(col("time_period").is_in(time_periods))
+        if not is_compact:
+            df = df.filter(col("time_period").is_in(time_periods))
+        else:
+            time_period_indices = time_periods_df.filter(col("time_period").is_in(time_periods))["time_period_index"]
+            df = df.filter(col("time_period_index").is_in(time_period_indices.to_list()))
 
-        analysed_age_statuses = sorted(df["age"].unique().to_list())
-        analysed_vaccine_statuses = sorted(df["vaccine_status"].unique().to_list())
+        self.prepare_acm_data(self.__acm_calculator.compute_all(df, is_using_months))
+
+    # From the ACM per stratum of ACMCalculator.compute_all (or of ACMIndex.compute)
+    def prepare_acm_data(self, acm_df: DataFrame) -> None:
+        acm_results = {
+            (row[NewColumn.AGE], row[NewColumn.VACCINE_STATUS]): ACMResult(
+                acm=row[ACMColumn.ACM], total_deaths=row[ACMColumn.TOTAL_DEATHS]
+            )
+            for row in acm_df.iter_rows(named=True)
+        }
+
+        analysed_age_statuses = sorted(acm_df[NewColumn.AGE].unique().to_list())
+        analysed_vaccine_statuses = sorted(acm_df[NewColumn.VACCINE_STATUS].unique().to_list())
 
         for age_status in analysed_age_statuses:
             if age_status not in self.__acms_by_age or age_status not in self.__deaths_by_age:
                 self.__acms_by_age[age_status] = []
                 self.__deaths_by_age[age_status] = []
             for vac_status in analysed_vaccine_statuses:
-                print("Calculating:", age_status, vac_status)
-                result = self.__acm_calculator.compute_person_years_acm(df, age_status, vac_status, is_using_months)
+                result = acm_results.get((age_status, vac_status), ACMResult(acm=0, total_deaths=0))
                 if result.total_deaths < 3:
                     self.__acms_by_age[age_status].append(0)
                     self.__deaths_by_age[age_status].append(0)
@@ -48,7 +71,7 @@ class GraphMaker:
 
         self.__vaccine_labels = analysed_vaccine_statuses
 
-    def draw_simple_bar_chart(self, output_file: str) -> None:
+    def draw_simple_bar_chart(self, output_file: str) -> StoredFile:
         x_positions = range(len(self.__acms_by_age.keys()))
         bar_width = 0.06
         bar_gap = 0.02
@@ -94,8 +117,10 @@ class GraphMaker:
         plt.tight_layout()
         plt.savefig(output_file, dpi=300)
 
-    def __is_df_using_months(self, df: DataFrame) -> bool:
-        return all(df["time_period"].str.contains(r"^\d{4}M\d{2}$"))
+        return StoredFile(output_file)
+
+    def __is_using_months(self, time_period_labels: Series) -> bool:
+        return all(time_period_labels.str.contains(r"^\d{4}M\d{2}$"))
 
 
 FROM_DATE = datetime(2021, 10, 1)
@@ -106,15 +131,67 @@ FILE_NAME = "CPZP_from_2020_to_2022"
 OUTPUT_FILE_NAME = "CPZP_high_covid2"
 
 
-def main() -> None:
-    file_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), "./")
+def visualize(file_storage: ArrowPolarsDataframeStorage, dataset_name: str) -> list[StoredFile]:
+    graph_maker = GraphMaker(ACMCalculator())
+
+    # The ACM index has the sums up to each time period, so only the differences at the window edges are computed
+    if dataset_name == f"{FILE_NAME}_acm_index":
+        with TimeTracker("Computing ACM from the ACM index"):
+            graph_maker.prepare_acm_data(ACMIndex(file_storage.read(dataset_name)).compute(FROM_DATE, TO_DATE))
+        return [graph_maker.draw_simple_bar_chart(f"./out/{OUTPUT_FILE_NAME}.png")]
+
     with TimeTracker("FileStorage read cpzp_processed_df"):
-        df = file_storage.read(f"./data/{FILE_NAME}")
+        lf = file_storage.scan(dataset_name)
+        schema = lf.collect_schema()
+
+        # Of time-partitioned datasets only the quarters of the date window are read. The time unit is only known from
+        # the data, so the quarters of both the weeks and the months in the window are used.
+        if TimePartitionColumn.YEAR in schema:
+            lf = lf.filter(
+                TimePeriodHelper.get_time_partition_filter_expr(
+                    TimePeriodHelper.get_weeks_in_range(FROM_DATE, TO_DATE)
+                    + TimePeriodHelper.get_months_in_range(FROM_DATE, TO_DATE)
+                )
+            )
+
+        # Only the columns needed for the ACM are read
+        used_columns = [NewColumn.TIME_PERIOD, TempColumn.TIME_PERIOD_INDEX, *CUBE_DIMENSIONS, AggregatedColumn.PERSON_PERIODS]
+        df = lf.select(column for column in used_columns if column in schema).collect()
+
+        # The compact layout (see IS_USING_COMPACT_SCHEMA in data_preprocessor.py) has no time_period labels column
+        is_compact = NewColumn.TIME_PERIOD not in df.columns
+        time_periods_df = file_storage.read(f"{FILE_NAME}_time_periods") if is_compact else None
 
-    calculator = ACMCalculator()
-    graph_maker = GraphMaker(calculator)
-    graph_maker.prepare_data(df, FROM_DATE, TO_DATE)
-    graph_maker.draw_simple_bar_chart(f"./out/{OUTPUT_FILE_NAME}.png")
+    graph_maker.prepare_data(df, FROM_DATE, TO_DATE, time_periods_df)
+    return [graph_maker.draw_simple_bar_chart(f"./out/{OUTPUT_FILE_NAME}.png")]
+
+
+def main() -> None:
+    file_storage = ArrowPolarsDataframeStorage(LocalFileStorage(), "./data/")
+    artifact_cache = ArtifactCache(LocalFileStorage(), ARTIFACT_CACHE_DIRECTORY, MAX_ARTIFACT_CACHE_SIZE_BYTES)
+
+    # The ACM index and the person-time cube written by data_preprocessor.py are much smaller than the person-period
+    # rows, which are only read when both are missing
+    dataset_name = next(
+        (dataset_name for dataset_name in [f"{FILE_NAME}_acm_index", f"{FILE_NAME}_cube"] if file_storage.exists(dataset_name)),
+        FILE_NAME,
+    )
+    # The key of the preprocessing output identifies its content, the (bundled) data without one is hashed
+    dataset_manifest = artifact_cache.get_manifest(FILE_NAME)
+    dataset_fingerprint = (
+        dataset_manifest.key
+        if dataset_manifest is not None
+        else ArtifactCache.get_files_fingerprint(LocalFileStorage(), file_storage.get_file_paths(dataset_name))
+    )
+    key = ArtifactCache.create_key(
+        "visualization",
+        ArtifactCache.get_code_version([GraphMaker, ACMCalculator, ACMIndex]),
+        {"from_date": FROM_DATE, "to_date": TO_DATE, "dataset_name": dataset_name},
+        [dataset_fingerprint],
+    )
+
+    if artifact_cache.get_or_create(OUTPUT_FILE_NAME, key, lambda: visualize(file_storage, dataset_name)):
+        print(f"./out/{OUTPUT_FILE_NAME}.png is up to date, reusing the stored output")
 
 
 if __name__ == "__main__":